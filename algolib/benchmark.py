@@ -0,0 +1,455 @@
+"""
+Benchmarks of algolib on deterministic generated corpora.
+
+Every corpus is a function of its name and size only, so runs on different
+machines and commits measure the same inputs. Every benchmark runs in a forked
+process: its peak RSS is not affected by the previous ones and a crash or
+MemoryError is reported as a failed result instead of stopping the run.
+
+Results are dicts with benchmark, corpus, size, seconds (best of repeats),
+peak_rss_mb (growth of peak RSS over the RSS the benchmark started with, so
+neither the corpus nor memory the forked process shares with its parent is
+counted), throughput and unit (MB/s of corpus or millions of operations per
+second).
+"""
+
+import array
+import collections
+import functools
+import glob
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+import traceback
+
+from algolib import suffix_array as suffix_array_module
+from algolib import suffix_tree
+from algolib.bwt import bwt_block, ibwt_block
+from algolib.compression import HuffmanCoder, MoveToFront, MoveToFrontRunLength, ZeroRunLength
+from algolib.eertree import Eertree
+from algolib.fm_index import FMIndex
+from algolib.generalized_suffix_array import GeneralizedSuffixArray
+from algolib.lce import LCE, BlockSparseTable, SparseTable
+from algolib.lyndon import factorize_lyndon, lex_min_rotation, lyndon_factorization, rotation_hashes
+from algolib.manacher import find_all_palyndromes_manacher, palyndrome_radii
+from algolib.persistent_pointer_machine import Common, LinkedList, Node
+from algolib.suffix_array import inverse_suffix_array, lcp_kasai, suffix_array_ext, suffix_array_kmr, suffix_array_ks, suffix_array_numpy
+from algolib.text_index import TextIndex, find_all
+
+SIZE_SUFFIXES = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+DEFAULT_SIZES = ['1K', '10K', '100K', '1M']
+ALL_SIZES = ['1K', '10K', '100K', '1M', '10M', '100M']
+# Best of that many runs is reported, one run is too noisy to compare
+DEFAULT_REPEAT = 3
+
+def parse_size(size):
+	"""'10K' -> 10240, plain numbers are bytes"""
+	size = str(size).upper()
+	if size and size[-1] in SIZE_SUFFIXES:
+		return int(size[:-1]) * SIZE_SUFFIXES[size[-1]]
+	return int(size)
+
+def format_size(size):
+	for suffix in 'GMK':
+		if size >= SIZE_SUFFIXES[suffix] and size % SIZE_SUFFIXES[suffix] == 0:
+			return '%d%s' % (size // SIZE_SUFFIXES[suffix], suffix)
+	return str(size)
+
+def random_bytes(size, seed):
+	"""Deterministic pseudo-random bytes, independent of the random module version"""
+	chunks = []
+	for i in xrange((size + 31) // 32):
+		chunks.append(hashlib.sha256('%s:%d' % (seed, i)).digest())
+	return ''.join(chunks)[:size]
+
+def random_text(size, alphabet, seed='random'):
+	"""Uniform symbols of `alphabet` (up to 256 of them)"""
+	table = ''.join(alphabet[i % len(alphabet)] for i in xrange(256))
+	return random_bytes(size, '%s%d' % (seed, len(alphabet))).translate(table)
+
+def dna_text(size):
+	"""acgt text made of 4KB chunks, a third of them are mutated copies of earlier ones"""
+	rnd = random.Random('dna')
+	chunk_size = 4096
+	fresh = random_text(size, 'acgt', seed='dna')
+	chunks = []
+	total = 0
+	while total < size:
+		if chunks and rnd.random() < 0.3:
+			chunk = bytearray(rnd.choice(chunks))
+			for _ in xrange(chunk_size // 100):
+				chunk[rnd.randrange(len(chunk))] = rnd.choice('acgt')
+			chunk = str(chunk)
+		else:
+			chunk = fresh[total:total + chunk_size]
+		chunks.append(chunk)
+		total += len(chunk)
+	return ''.join(chunks)[:size]
+
+def repetitive_text(size):
+	"""Random 500 byte unit repeated over and over, one byte changed in every 64KB"""
+	rnd = random.Random('repetitive')
+	unit = random_text(500, 'abcdefghijklmnopqrstuvwxyz', seed='repetitive')
+	text = bytearray((unit * (size // len(unit) + 1))[:size])
+	for pos in xrange(0, size, 1 << 16):
+		text[rnd.randrange(pos, min(size, pos + (1 << 16)))] = 'z'
+	return str(text)
+
+def fibonacci_word(size):
+	"""Prefix of the infinite Fibonacci word abaababaabaab..."""
+	prev, current = 'a', 'ab'
+	while len(current) < size:
+		prev, current = current, current + prev
+	return current[:size]
+
+def repeat_to_size(data, size):
+	if not data:
+		raise ValueError("Empty corpus")
+	return (data * (size // len(data) + 1))[:size]
+
+def source_text(size):
+	"""Real text: algolib sources repeated up to `size`"""
+	paths = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')))
+	return repeat_to_size(''.join(open(path, 'rb').read() for path in paths), size)
+
+CORPORA = collections.OrderedDict([
+	('random2', functools.partial(random_text, alphabet='ab')),
+	('random4', functools.partial(random_text, alphabet='acgt')),
+	('random26', functools.partial(random_text, alphabet='abcdefghijklmnopqrstuvwxyz')),
+	('random256', functools.partial(random_text, alphabet=map(chr, xrange(256)))),
+	('dna', dna_text),
+	('repetitive', repetitive_text),
+	('fibonacci', fibonacci_word),
+	('source', source_text),
+])
+
+def file_corpus(path):
+	"""Corpus of a real text file, repeated or truncated to the requested size"""
+	data = open(path, 'rb').read()
+	return lambda size: repeat_to_size(data, size)
+
+# prepare(data) returns run() or (run, operations) when the unit counts operations
+# other than corpus bytes, e.g. pattern queries
+Benchmark = collections.namedtuple('Benchmark', 'name prepare max_size unit available uses_corpus')
+Benchmark.__new__.__defaults__ = (True,)
+
+# Patterns of search benchmarks are substrings of the corpus at random positions
+QUERY_COUNT = 10000
+PATTERN_LENGTH = 16
+
+# Corpus name of results of benchmarks which don't use corpora
+NO_CORPUS = '-'
+
+def consume(iterable):
+	collections.deque(iterable, maxlen=0)
+
+def prepare_lcp(data):
+	suf_arr = suffix_array_module.suffix_array(data)
+	return lambda: lcp_kasai(data, suf_arr)
+
+def prepare_inverse_suffix_array(data):
+	suf_arr = suffix_array_module.suffix_array(data)
+	return lambda: inverse_suffix_array(suf_arr)
+
+def prepare_rmq(rmq_class):
+	"""RMQ structure built over the lcp array of the corpus"""
+	def prepare(data):
+		lcp = lcp_kasai(data, suffix_array_module.suffix_array(data))
+		return lambda: rmq_class(lcp)
+	return prepare
+
+def random_pairs(size, count, seed='pairs'):
+	"""Flat array of `count` pairs of positions below `size`"""
+	rnd = random.Random(seed)
+	return array.array('L', (rnd.randrange(size) for _ in xrange(2 * count))) if size else array.array('L')
+
+def prepare_lce_many(data, block_size=None):
+	"""len(data) LCE queries of random pairs"""
+	index = LCE(data, block_size=block_size)
+	pairs = random_pairs(len(data), len(data))
+	return lambda: index.lce_many(pairs)
+
+def random_patterns(data, seed='patterns', length=PATTERN_LENGTH):
+	"""Endless deterministic sequence of substrings of `data`"""
+	rnd = random.Random(seed)
+	length = min(length, len(data))
+	while True:
+		pos = rnd.randrange(len(data) - length + 1)
+		yield data[pos:pos + length]
+
+def take(iterable, count):
+	return [item for (item, _) in zip(iterable, xrange(count))]
+
+def prepare_fm_index_count(data):
+	index = FMIndex(data)
+	patterns = take(random_patterns(data), QUERY_COUNT)
+	return (lambda: consume(index.count(pattern) for pattern in patterns)), len(patterns)
+
+def prepare_fm_index_locate(data):
+	"""
+	Operations are located positions. Patterns are taken until QUERY_COUNT positions,
+	a single pattern has about len(data) / PATTERN_LENGTH of them in the fibonacci corpus.
+	"""
+	index = FMIndex(data)
+	patterns = []
+	located = 0
+	for pattern in random_patterns(data):
+		if located >= QUERY_COUNT:
+			break
+		patterns.append(pattern)
+		located += index.count(pattern)
+	return (lambda: consume(index.locate(pattern) for pattern in patterns)), located
+
+def prepare_find_all(data):
+	index = TextIndex(data)
+	patterns = take(random_patterns(data), QUERY_COUNT)
+	return (lambda: find_all(index, patterns)), len(patterns)
+
+def prepare_generalized_suffix_array(data, item_size=1000):
+	"""Corpus cut into documents of item_size bytes"""
+	documents = [data[pos:pos + item_size] for pos in xrange(0, len(data), item_size)]
+	return lambda: GeneralizedSuffixArray(documents)
+
+def prepare_stage(stage, previous=()):
+	"""stage.encode of the corpus BWT passed through `previous` stages, the way BlockCompressor runs it"""
+	def prepare(data):
+		block = bwt_block(data)[0]
+		for other in previous:
+			block = other.encode(block)
+		return lambda: stage.encode(block)
+	return prepare
+
+def prepare_ibwt_block(data):
+	transformed, primary = bwt_block(data)
+	return lambda: ibwt_block(transformed, primary)
+
+def prepare_rotation_hashes(data, item_size=1000):
+	"""Corpus cut into circular sequences of item_size symbols"""
+	offsets = array.array('L', xrange(0, len(data), item_size))
+	offsets.append(len(data))
+	return lambda: rotation_hashes(data, offsets)
+
+def prepare_compact_tree(data):
+	return lambda: suffix_tree.CompactSuffixTree(data)
+
+def prepare_python_tree(data):
+	def run():
+		saved = suffix_tree.suffix_array_ext
+		suffix_tree.suffix_array_ext = None
+		try:
+			return suffix_tree.CompactSuffixTree(data)
+		finally:
+			suffix_tree.suffix_array_ext = saved
+	return run
+
+def prepare_linked_list(data):
+	"""len(data) operations: pushes of len(data) / 2 nodes, then pops of them. data itself is not used."""
+	count = len(data) // 2
+	def run():
+		linked_list = LinkedList(Common(max_links=2))
+		for i in xrange(count):
+			linked_list.push_back(Node(linked_list.common))
+		for i in xrange(count):
+			linked_list.pop_front()
+	return run
+
+has_ext = lambda: suffix_array_ext is not None
+has_numpy = lambda: suffix_array_module.numpy is not None
+always = lambda: True
+
+BENCHMARKS = collections.OrderedDict((benchmark.name, benchmark) for benchmark in [
+	Benchmark('suffix_array_kmr', lambda data: lambda: suffix_array_kmr(data), 100 << 10, 'MB', always),
+	Benchmark('suffix_array_ks', lambda data: lambda: suffix_array_ks(data), 1 << 20, 'MB', always),
+	Benchmark('suffix_array_numpy', lambda data: lambda: suffix_array_numpy(data), 10 << 20, 'MB', has_numpy),
+	Benchmark('suffix_array_ks_ext', lambda data: lambda: suffix_array_module.suffix_array_ks_ext(data), 100 << 20, 'MB', has_ext),
+	Benchmark('suffix_array_sais_ext', lambda data: lambda: suffix_array_module.suffix_array_sais_ext(data), 100 << 20, 'MB', has_ext),
+	Benchmark('lcp_kasai', prepare_lcp, 100 << 20, 'MB', has_ext),
+	Benchmark('inverse_suffix_array', prepare_inverse_suffix_array, 100 << 20, 'MB', has_ext),
+	Benchmark('sparse_table', prepare_rmq(SparseTable), 10 << 20, 'MB', has_ext),
+	Benchmark('block_sparse_table', prepare_rmq(BlockSparseTable), 100 << 20, 'MB', has_ext),
+	Benchmark('lce_many', prepare_lce_many, 10 << 20, 'Mops', has_ext),
+	Benchmark('lce_many_block', functools.partial(prepare_lce_many, block_size=32), 10 << 20, 'Mops', has_ext),
+	Benchmark('generalized_suffix_array', prepare_generalized_suffix_array, 10 << 20, 'MB', has_ext),
+	Benchmark('text_index', lambda data: lambda: TextIndex(data), 10 << 20, 'MB', has_ext),
+	Benchmark('text_index_find_all', prepare_find_all, 10 << 20, 'Mops', has_ext),
+	Benchmark('suffix_tree_build', lambda data: lambda: suffix_tree.build(data), 100 << 10, 'MB', always),
+	Benchmark('compact_suffix_tree', prepare_python_tree, 1 << 20, 'MB', always),
+	Benchmark('compact_suffix_tree_ext', prepare_compact_tree, 10 << 20, 'MB', has_ext),
+	Benchmark('bwt_block', lambda data: lambda: bwt_block(data), 100 << 20, 'MB', has_ext),
+	Benchmark('ibwt_block', prepare_ibwt_block, 100 << 20, 'MB', has_ext),
+	Benchmark('mtf', prepare_stage(MoveToFront()), 1 << 20, 'MB', has_ext),
+	Benchmark('rle0', prepare_stage(ZeroRunLength(), [MoveToFront()]), 1 << 20, 'MB', has_ext),
+	Benchmark('mtf_rle0', prepare_stage(MoveToFrontRunLength()), 100 << 20, 'MB', has_ext),
+	Benchmark('huffman', prepare_stage(HuffmanCoder(), [MoveToFrontRunLength()]), 10 << 20, 'MB', has_ext),
+	Benchmark('fm_index', lambda data: lambda: FMIndex(data), 10 << 20, 'MB', has_ext),
+	Benchmark('fm_index_count', prepare_fm_index_count, 10 << 20, 'Mops', has_ext),
+	Benchmark('fm_index_locate', prepare_fm_index_locate, 1 << 20, 'Mops', has_ext),
+	Benchmark('manacher', lambda data: lambda: consume(find_all_palyndromes_manacher(data)), 1 << 20, 'MB', always),
+	Benchmark('palyndrome_radii', lambda data: lambda: palyndrome_radii(data), 100 << 20, 'MB', has_ext),
+	Benchmark('eertree', lambda data: lambda: Eertree(data), 1 << 20, 'MB', always),
+	Benchmark('factorize_lyndon', lambda data: lambda: consume(factorize_lyndon(data)), 10 << 20, 'MB', always),
+	Benchmark('lyndon_factorization', lambda data: lambda: lyndon_factorization(data), 100 << 20, 'MB', has_ext),
+	Benchmark('lex_min_rotation', lambda data: lambda: lex_min_rotation(data), 100 << 20, 'MB', has_ext),
+	Benchmark('rotation_hashes', prepare_rotation_hashes, 100 << 20, 'MB', has_ext),
+	Benchmark('persistent_linked_list', prepare_linked_list, 100 << 10, 'Mops', always, uses_corpus=False),
+])
+
+def peak_rss_mb():
+	"""Peak resident set size of this process"""
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# Linux reports kilobytes, macOS bytes
+	return peak / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0)
+
+def current_rss_mb():
+	"""Current resident set size of this process, 0 where /proc is not available"""
+	try:
+		with open('/proc/self/statm') as f:
+			pages = int(f.read().split()[1])
+	except (IOError, IndexError, ValueError):
+		return 0.0
+	return pages * resource.getpagesize() / (1024.0 * 1024.0)
+
+def measure(benchmark, data, repeat):
+	"""
+	Runs benchmark on data in this process, returns result fields.
+	A forked child starts with the peak RSS equal to the parent's RSS, so the
+	RSS after prepare is subtracted from the peak. Without fork the
+	peak of earlier benchmarks may hide the growth.
+	"""
+	run = benchmark.prepare(data)
+	operations = len(data)
+	if isinstance(run, tuple):
+		run, operations = run
+	# Inputs made by prepare are not part of the measured peak
+	baseline = current_rss_mb()
+	seconds = None
+	for _ in xrange(repeat):
+		start = time.time()
+		run()
+		elapsed = time.time() - start
+		seconds = elapsed if seconds is None else min(seconds, elapsed)
+	result = {'seconds': seconds, 'peak_rss_mb': max(peak_rss_mb() - baseline, 0.0)}
+	result['throughput'] = operations / 1e6 / seconds if seconds else None
+	return result
+
+def measure_forked(benchmark, data, repeat):
+	"""measure() in a child process, errors are returned as {'error': message}"""
+	if not hasattr(os, 'fork'):
+		return measure(benchmark, data, repeat)
+	read_fd, write_fd = os.pipe()
+	pid = os.fork()
+	if not pid:
+		os.close(read_fd)
+		try:
+			result = measure(benchmark, data, repeat)
+		except BaseException:
+			result = {'error': traceback.format_exc().strip().splitlines()[-1]}
+		with os.fdopen(write_fd, 'wb') as f:
+			f.write(json.dumps(result))
+		os._exit(0)
+	os.close(write_fd)
+	with os.fdopen(read_fd, 'rb') as f:
+		output = f.read()
+	_, status = os.waitpid(pid, 0)
+	if not output:
+		return {'error': 'benchmark process died with status %d' % status}
+	return json.loads(output)
+
+def run_benchmarks(benchmarks, corpora, sizes, repeat=DEFAULT_REPEAT, fork=True, log=None):
+	"""
+	Runs every benchmark on every corpus of every size, skipping sizes over
+	benchmark's max_size and benchmarks whose dependencies are missing.
+	Benchmarks which don't use corpora run once per size.
+	`corpora` is a dict {name: function(size) -> str}. Returns list of results.
+	"""
+	results = []
+	for size in sizes:
+		selected = [
+			benchmark for benchmark in benchmarks
+			if benchmark.available() and size <= benchmark.max_size
+		]
+		runs = [(NO_CORPUS, None, [benchmark for benchmark in selected if not benchmark.uses_corpus])]
+		for corpus_name, make_corpus in corpora.iteritems():
+			runs.append((corpus_name, make_corpus, [benchmark for benchmark in selected if benchmark.uses_corpus]))
+		for corpus_name, make_corpus, corpus_benchmarks in runs:
+			if not corpus_benchmarks:
+				continue
+			data = make_corpus(size) if make_corpus is not None else '\x00' * size
+			for benchmark in corpus_benchmarks:
+				measured = (measure_forked if fork else measure)(benchmark, data, repeat)
+				result = {'benchmark': benchmark.name, 'corpus': corpus_name, 'size': size, 'unit': benchmark.unit}
+				result.update(measured)
+				results.append(result)
+				if log is not None:
+					log(format_result(result))
+	return results
+
+def format_result(result):
+	key = '%-24s %-12s %6s' % (result['benchmark'], result['corpus'], format_size(result['size']))
+	if 'error' in result:
+		return '%s  FAILED: %s' % (key, result['error'])
+	return '%s %10.4fs %9.1fMB %10.2f %s/s' % (
+		key, result['seconds'], result['peak_rss_mb'], result['throughput'] or 0, result['unit']
+	)
+
+def environment():
+	"""Description of the machine and build which produced results"""
+	numpy = suffix_array_module.numpy
+	return {
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'machine': platform.machine(),
+		'extension': suffix_array_ext is not None,
+		'numpy': numpy.__version__ if numpy is not None else None,
+		'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+	}
+
+def save_results(path, results):
+	with open(path, 'w') as f:
+		json.dump({'environment': environment(), 'results': results}, f, indent=1, sort_keys=True)
+
+def load_results(path):
+	with open(path) as f:
+		return json.load(f)['results']
+
+def compare_results(base, new, threshold=0.1):
+	"""
+	Matches results by (benchmark, corpus, size). Returns list of
+	(key, base result, new result, flags), flags is a list of 'time' and 'memory'
+	for metrics which got worse by more than `threshold` (a fraction).
+	"""
+	key = lambda result: (result['benchmark'], result['corpus'], result['size'])
+	base_by_key = {key(result): result for result in base}
+	comparison = []
+	for result in new:
+		old = base_by_key.get(key(result))
+		if old is None or 'error' in old:
+			continue
+		flags = []
+		if 'error' in result:
+			flags.append('error')
+		else:
+			if result['seconds'] > old['seconds'] * (1 + threshold):
+				flags.append('time')
+			if result['peak_rss_mb'] > old['peak_rss_mb'] * (1 + threshold):
+				flags.append('memory')
+		comparison.append((key(result), old, result, flags))
+	return comparison
+
+def format_comparison(item):
+	(benchmark, corpus, size), old, new, flags = item
+	key = '%-24s %-12s %6s' % (benchmark, corpus, format_size(size))
+	if 'error' in flags:
+		return '%s  FAILED: %s' % (key, new['error'])
+	line = '%s %10.4fs -> %10.4fs (%+6.1f%%) %9.1fMB -> %9.1fMB' % (
+		key, old['seconds'], new['seconds'], 100.0 * (new['seconds'] / old['seconds'] - 1) if old['seconds'] else 0,
+		old['peak_rss_mb'], new['peak_rss_mb'],
+	)
+	if flags:
+		line += '  REGRESSION: ' + ', '.join(flags)
+	return line
@@ -0,0 +1,282 @@
+"""
+Burrows-Wheeler transform and its block-oriented streaming format.
+
+Stream format (all integers are little-endian uint32):
+	MAGIC
+	number of compression stages (a byte), stage_id of every stage (a byte each)
+	for each block: payload size, primary index, payload bytes
+
+Each block is transformed as if it was followed by an end marker larger than
+all bytes. The marker is not stored, primary index records its position in
+the transform, so without compression stages a block of N bytes is stored
+as exactly N bytes. Otherwise payload is the transform encoded by the stages
+from algolib.compression one after another.
+"""
+
+import collections
+import multiprocessing
+import struct
+from multiprocessing.pool import ThreadPool
+
+from algolib.compression import decode_stages, encode_stages, stages_from_ids
+from algolib.suffix_array import is_buffer, suffix_array_ks, suffix_array_ks_ext, suffix_array_ext
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+def bwt_naive(arr):
+	arrays = sorted([arr[i:] + arr[:i] for i in xrange(len(arr))])
+	return [array[-1] for array in arrays]
+
+def bwt(arr):
+	suf_arr = suffix_array_ks_ext(arr)
+	result = [None] * len(arr)
+	for i, pos in enumerate(suf_arr):
+		result[i] = arr[(pos + len(arr) - 1) % len(arr)]
+	return result
+
+def bwt_string(s):
+	"""Same as bwt, but takes and returns a byte string without unpacking it"""
+	if suffix_array_ext is not None:
+		return suffix_array_ext.bwt_bytes(s)
+	return ''.join(s[pos - 1] for pos in suffix_array_ks(s))
+
+def ibwt_string(s, dollar_sign='\xff'):
+	if suffix_array_ext is not None and is_buffer(s):
+		return suffix_array_ext.ibwt_bytes(s, dollar_sign)
+	result = ibwt(map(ord, s), ord(dollar_sign))
+	return ''.join(map(chr, result))
+
+def ibwt(arr, dollar_marker):
+	if not arr:
+		return []
+
+	# occ[elem] - number of occurences of elem in arr thus far.
+	occ = [0]
+
+	# rank[i] = arr[:i].count(arr[i])
+	rank = [None] * len(arr)
+
+	dollar_marker_pos = None
+
+	for i, elem in enumerate(arr):
+		while len(occ) <= elem:
+			occ.extend([0] * len(occ))
+		rank[i] = occ[elem]
+		occ[elem] += 1
+
+		if elem == dollar_marker:
+			dollar_marker_pos = i
+
+	first_pos = [0] * len(occ)
+	for i in xrange(1, len(occ)):
+		first_pos[i] = first_pos[i - 1] + occ[i - 1]
+
+	if dollar_marker_pos is None:
+		raise ValueError("No dollar marker found")
+
+	result = [None] * len(arr)
+
+	current_pos = dollar_marker_pos
+
+	for writer_pos in xrange(len(arr) - 1, -1, -1):
+		result[writer_pos] = arr[current_pos]
+		current_pos = first_pos[arr[current_pos]] + rank[current_pos]
+
+	return result
+
+# Value of the end marker when a block is unpacked into a list of byte values
+END_MARKER = 256
+
+def bwt_block(block):
+	"""
+	BWT of byte string `block` followed by the end marker.
+	Returns (transformed block without end marker, primary index)
+	"""
+	if suffix_array_ext is not None:
+		return suffix_array_ext.bwt_block(block)
+	if not block:
+		return '', 0
+	suf_arr = suffix_array_ks(block)
+	primary = suf_arr.index(0)
+	result = [block[pos - 1] for pos in suf_arr if pos]
+	result.append(block[-1])
+	return ''.join(result), primary
+
+def ibwt_block(data, primary):
+	"""Inverse of bwt_block"""
+	if not 0 <= primary <= len(data):
+		raise ValueError("Primary index %d is out of range" % primary)
+	if suffix_array_ext is not None:
+		return suffix_array_ext.ibwt_block(data, primary)
+	if numpy is not None:
+		return ibwt_block_numpy(data, primary)
+	arr = map(ord, data)
+	arr.insert(primary, END_MARKER)
+	result = ibwt(arr, END_MARKER)
+	return ''.join(map(chr, result[:-1]))
+
+def ibwt_block_numpy(data, primary):
+	"""
+	Vectorized version of ibwt_block.
+	LF mapping is the inverse of stable sort permutation of the transform.
+	Instead of walking it step by step, we find distance from every position
+	to the end of the walk using pointer jumping in O(N*log(N)).
+	"""
+	size = len(data) + 1
+	data = numpy.frombuffer(data, dtype=numpy.uint8)
+	arr = numpy.empty(size, dtype=numpy.int16)
+	arr[:primary] = data[:primary]
+	arr[primary] = END_MARKER
+	arr[primary + 1:] = data[primary:]
+
+	order = numpy.argsort(arr, kind='mergesort')
+	lf = numpy.empty(size, dtype=numpy.intp)
+	lf[order] = numpy.arange(size)
+
+	# Walk starts at primary and ends at position which maps back to it
+	walk_end = order[primary]
+	dist = numpy.ones(size, dtype=numpy.intp)
+	dist[walk_end] = 0
+	lf[walk_end] = walk_end
+	jump = 1
+	while jump < size:
+		dist += dist[lf]
+		lf = lf[lf]
+		jump *= 2
+
+	# Walk restores text from its end, so symbol at position i is text[dist[i]]
+	result = numpy.empty(size, dtype=numpy.int16)
+	result[dist] = arr
+	return result[:-1].astype(numpy.uint8).tostring()
+
+MAGIC = 'BWT\x02'
+BLOCK_HEADER = struct.Struct('<II')
+# Same as bzip2 -9
+DEFAULT_BLOCK_SIZE = 900 * 1000
+
+def read_exactly(stream, size):
+	result = stream.read(size)
+	while len(result) < size:
+		chunk = stream.read(size - len(result))
+		if not chunk:
+			break
+		result += chunk
+	return result
+
+def read_blocks(stream, block_size=DEFAULT_BLOCK_SIZE):
+	"""Split `stream` into blocks of `block_size` bytes (the last one may be shorter)"""
+	while True:
+		block = read_exactly(stream, block_size)
+		if not block:
+			break
+		yield block
+		if len(block) < block_size:
+			break
+
+def write_stream_header(stream, stages=()):
+	stream.write(MAGIC + chr(len(stages)) + ''.join(chr(stage.stage_id) for stage in stages))
+
+def read_stream_header(stream):
+	"""Returns compression stages the stream was written with"""
+	if read_exactly(stream, len(MAGIC)) != MAGIC:
+		raise ValueError("Not a BWT block stream")
+	count = read_exactly(stream, 1)
+	stage_ids = read_exactly(stream, ord(count)) if count else ''
+	if not count or len(stage_ids) < ord(count):
+		raise ValueError("Truncated stream header")
+	return stages_from_ids(map(ord, stage_ids))
+
+def write_frame(stream, data, primary):
+	if not isinstance(data, str):
+		raise TypeError("Last compression stage must produce bytes")
+	stream.write(BLOCK_HEADER.pack(len(data), primary))
+	stream.write(data)
+
+def read_frames(stream):
+	"""Yield (payload, primary index) of blocks that follow the stream header"""
+	while True:
+		header = read_exactly(stream, BLOCK_HEADER.size)
+		if not header:
+			break
+		if len(header) < BLOCK_HEADER.size:
+			raise ValueError("Truncated block header")
+		size, primary = BLOCK_HEADER.unpack(header)
+		data = read_exactly(stream, size)
+		if len(data) < size:
+			raise ValueError("Truncated block: expected %d bytes, got %d" % (size, len(data)))
+		yield data, primary
+
+def encode_block(block, stages=()):
+	"""Returns (payload, primary index)"""
+	data, primary = bwt_block(block)
+	return encode_stages(data, stages), primary
+
+def decode_block(data, primary, stages=()):
+	return ibwt_block(decode_stages(data, stages), primary)
+
+def check_block_size(block_size):
+	if block_size <= 0 or block_size >= 1 << 32:
+		raise ValueError("Block size must be in range [1, 2^32)")
+
+def compress_stream(input_stream, output_stream, block_size=DEFAULT_BLOCK_SIZE, stages=()):
+	"""Apply BWT and `stages` to `input_stream` block by block, only one block is kept in memory"""
+	check_block_size(block_size)
+	write_stream_header(output_stream, stages)
+	for block in read_blocks(input_stream, block_size):
+		write_frame(output_stream, *encode_block(block, stages))
+
+def decompress_stream(input_stream, output_stream):
+	"""Inverse of compress_stream"""
+	stages = read_stream_header(input_stream)
+	for data, primary in read_frames(input_stream):
+		output_stream.write(decode_block(data, primary, stages))
+
+class BlockCompressor(object):
+	"""
+	Same as compress_stream / decompress_stream, but blocks are transformed
+	concurrently by a pool of `threads` threads. suffix_array_ext releases the
+	GIL, so native transforms run on all cores.
+
+	Output is written in the original block order. At most `max_pending`
+	blocks are read ahead of the writer, so memory stays bounded by
+	about max_pending * block_size plus the working memory of each thread.
+	"""
+	def __init__(self, block_size=DEFAULT_BLOCK_SIZE, threads=None, max_pending=None, stages=()):
+		check_block_size(block_size)
+		self.block_size = block_size
+		self.stages = stages
+		self.threads = threads or multiprocessing.cpu_count()
+		if max_pending is None:
+			max_pending = 2 * self.threads
+		self.max_pending = max(max_pending, 1)
+
+	def map_blocks(self, func, blocks):
+		"""Yield func(block) for each of `blocks` in order"""
+		pool = ThreadPool(self.threads)
+		try:
+			pending = collections.deque()
+			for block in blocks:
+				if len(pending) >= self.max_pending:
+					yield pending.popleft().get()
+				pending.append(pool.apply_async(func, (block,)))
+			while pending:
+				yield pending.popleft().get()
+		finally:
+			pool.terminate()
+			pool.join()
+
+	def compress(self, input_stream, output_stream):
+		write_stream_header(output_stream, self.stages)
+		blocks = read_blocks(input_stream, self.block_size)
+		for data, primary in self.map_blocks(lambda block: encode_block(block, self.stages), blocks):
+			write_frame(output_stream, data, primary)
+
+	def decompress(self, input_stream, output_stream):
+		"""Stages are taken from the stream header"""
+		stages = read_stream_header(input_stream)
+		frames = read_frames(input_stream)
+		for block in self.map_blocks(lambda frame: decode_block(frame[0], frame[1], stages), frames):
+			output_stream.write(block)
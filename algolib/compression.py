@@ -0,0 +1,237 @@
+"""
+Entropy coding stages that follow BWT in block-sorting compressors like bzip2:
+move-to-front, zero run length coding (RLE0) and canonical Huffman coding.
+
+Every stage has `encode(block)` and `decode(block)` methods which take and
+return sequences of symbols: byte strings or array.array('H') when the
+alphabet doesn't fit into a byte. Stages are applied one after another by
+encode_stages and undone in reverse order by decode_stages.
+"""
+
+import array
+import binascii
+import heapq
+import struct
+
+from algolib.suffix_array import suffix_array_ext
+
+def byte_values(block):
+	if isinstance(block, str):
+		return bytearray(block)
+	return block
+
+class MoveToFront(object):
+	"""Replace every byte with the number of distinct bytes met since its last occurrence"""
+	stage_id = 1
+
+	def encode(self, block):
+		order = range(256)
+		result = bytearray(len(block))
+		for i, c in enumerate(byte_values(block)):
+			index = order.index(c)
+			if index:
+				del order[index]
+				order.insert(0, c)
+			result[i] = index
+		return str(result)
+
+	def decode(self, block):
+		order = range(256)
+		result = bytearray(len(block))
+		for i, index in enumerate(byte_values(block)):
+			c = order[index]
+			if index:
+				del order[index]
+				order.insert(0, c)
+			result[i] = c
+		return str(result)
+
+class ZeroRunLength(object):
+	"""
+	bzip2 RLE0: MTF output of BWT is dominated by runs of zeros.
+	Run of r zeros is written as bijective base-2 digits of r, least significant
+	first, using RUNA for digit 1 and RUNB for digit 2.
+	Other bytes b are written as b + 1, so there are 257 output symbols.
+	"""
+	stage_id = 2
+
+	RUNA = 0
+	RUNB = 1
+	ALPHABET_SIZE = 257
+
+	@classmethod
+	def write_run(cls, run, result):
+		while run:
+			if run & 1:
+				result.append(cls.RUNA)
+				run = (run - 1) // 2
+			else:
+				result.append(cls.RUNB)
+				run = (run - 2) // 2
+
+	def encode(self, block):
+		result = array.array('H')
+		run = 0
+		for c in byte_values(block):
+			if not c:
+				run += 1
+				continue
+			self.write_run(run, result)
+			run = 0
+			result.append(c + 1)
+		self.write_run(run, result)
+		return result
+
+	def decode(self, block):
+		result = bytearray()
+		run = 0
+		weight = 1
+		for symbol in byte_values(block):
+			if symbol <= self.RUNB:
+				run += (symbol + 1) * weight
+				weight *= 2
+				continue
+			if symbol >= self.ALPHABET_SIZE:
+				raise ValueError("RLE0 symbol %d is out of range" % symbol)
+			result.extend(bytearray(run))
+			run = 0
+			weight = 1
+			result.append(symbol - 1)
+		result.extend(bytearray(run))
+		return str(result)
+
+class MoveToFrontRunLength(object):
+	"""MoveToFront followed by ZeroRunLength, uses suffix_array_ext when available"""
+	stage_id = 3
+
+	def encode(self, block):
+		if suffix_array_ext is not None:
+			return suffix_array_ext.mtf_rle0_encode(block)
+		return ZeroRunLength().encode(MoveToFront().encode(block))
+
+	def decode(self, block):
+		if suffix_array_ext is not None:
+			if not isinstance(block, (str, array.array)):
+				block = array.array('H', block)
+			return suffix_array_ext.mtf_rle0_decode(block)
+		return MoveToFront().decode(ZeroRunLength().decode(block))
+
+def huffman_code_lengths(freqs):
+	"""Code length for every symbol, 0 for symbols with zero frequency"""
+	lengths = [0] * len(freqs)
+	heap = [(freq, [symbol]) for symbol, freq in enumerate(freqs) if freq]
+	if len(heap) == 1:
+		lengths[heap[0][1][0]] = 1
+		return lengths
+	heapq.heapify(heap)
+	while len(heap) > 1:
+		freq1, symbols1 = heapq.heappop(heap)
+		freq2, symbols2 = heapq.heappop(heap)
+		for symbol in symbols1:
+			lengths[symbol] += 1
+		for symbol in symbols2:
+			lengths[symbol] += 1
+		heapq.heappush(heap, (freq1 + freq2, symbols1 + symbols2))
+	return lengths
+
+def canonical_huffman_codes(lengths):
+	"""Codes as strings of '0' and '1', codes of the same length are consecutive numbers"""
+	codes = [None] * len(lengths)
+	code = 0
+	prev_length = 0
+	for length, symbol in sorted((length, symbol) for symbol, length in enumerate(lengths) if length):
+		code <<= length - prev_length
+		codes[symbol] = format(code, '0%db' % length)
+		code += 1
+		prev_length = length
+	return codes
+
+def pack_bits(bits):
+	"""String of '0' and '1' into bytes, MSB first, padded with zeros"""
+	if not bits:
+		return ''
+	bits += '0' * (-len(bits) % 8)
+	return binascii.unhexlify('%0*x' % (len(bits) // 4, int(bits, 2)))
+
+def unpack_bits(data):
+	if not data:
+		return ''
+	return bin(int(binascii.hexlify(data), 16))[2:].zfill(len(data) * 8)
+
+class HuffmanCoder(object):
+	"""
+	Canonical Huffman coding, the code is built for every block separately.
+	Block format: symbol count (uint32), alphabet size (uint16),
+	code length of every symbol (a byte each), packed codes.
+	Decoded block is a byte string if alphabet fits into a byte.
+	"""
+	stage_id = 4
+
+	HEADER = struct.Struct('<IH')
+
+	def encode(self, block):
+		symbols = byte_values(block)
+		alphabet_size = max(symbols) + 1 if len(symbols) else 0
+		freqs = [0] * alphabet_size
+		for symbol in symbols:
+			freqs[symbol] += 1
+		lengths = huffman_code_lengths(freqs)
+		codes = canonical_huffman_codes(lengths)
+		bits = ''.join(map(codes.__getitem__, symbols))
+		return (
+			self.HEADER.pack(len(symbols), alphabet_size) +
+			str(bytearray(lengths)) +
+			pack_bits(bits)
+		)
+
+	def decode(self, block):
+		if len(block) < self.HEADER.size:
+			raise ValueError("Truncated Huffman block header")
+		count, alphabet_size = self.HEADER.unpack_from(block)
+		lengths_end = self.HEADER.size + alphabet_size
+		lengths = bytearray(block[self.HEADER.size:lengths_end])
+		if len(lengths) < alphabet_size:
+			raise ValueError("Truncated Huffman code lengths")
+		codes = canonical_huffman_codes(lengths)
+		decode_table = {code: symbol for symbol, code in enumerate(codes) if code is not None}
+		used_lengths = sorted(set(length for length in lengths if length))
+
+		bits = unpack_bits(block[lengths_end:])
+		result = array.array('B' if alphabet_size <= 256 else 'H', [0]) * count
+		pos = 0
+		for i in xrange(count):
+			for length in used_lengths:
+				symbol = decode_table.get(bits[pos:pos + length])
+				if symbol is not None:
+					break
+			else:
+				raise ValueError("Corrupted Huffman block")
+			result[i] = symbol
+			pos += length
+		if result.typecode == 'B':
+			return result.tostring()
+		return result
+
+STAGES = {
+	stage.stage_id: stage
+	for stage in (MoveToFront, ZeroRunLength, MoveToFrontRunLength, HuffmanCoder)
+}
+
+def default_stages():
+	return [MoveToFrontRunLength(), HuffmanCoder()]
+
+def stages_from_ids(stage_ids):
+	try:
+		return [STAGES[stage_id]() for stage_id in stage_ids]
+	except KeyError as e:
+		raise ValueError("Unknown compression stage %r" % e.args[0])
+
+def encode_stages(block, stages):
+	for stage in stages:
+		block = stage.encode(block)
+	return block
+
+def decode_stages(block, stages):
+	for stage in reversed(stages):
+		block = stage.decode(block)
+	return block
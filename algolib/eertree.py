@@ -0,0 +1,110 @@
+"""
+Palindromic tree (eertree, Rubinchik and Shur) of a growing text.
+
+Every distinct palyndromic substring is a node. An edge labelled c leads
+from palyndrome p to cpc, suffix link leads to the longest proper
+palyndromic suffix. Two roots of length -1 and 0 are parents of odd and
+even palyndromes, the link of the empty palyndrome leads to the -1 root,
+so "extend by c on both sides" also works for single symbols.
+
+Appending a symbol walks suffix links of the previous longest palyndromic
+suffix until it can be extended, each append adds at most one node and
+the depth of the walk is amortized O(1) per symbol, like in Manacher.
+"""
+
+import array
+
+# Roots: odd palyndromes hang from IMAGINARY (length -1), even ones from EMPTY
+IMAGINARY = 0
+EMPTY = 1
+
+class Eertree(object):
+	"""
+	Nodes are indexes into parallel arrays, node 2 + i is the i-th distinct palyndrome:
+	length[node] - its length
+	link[node] - node of its longest proper palyndromic suffix
+	end[node] - end of its first occurrence in text
+	suffix_count[node] - how many times it was the longest palyndromic suffix
+	Edges are kept in one dict {(node, symbol): child}.
+	"""
+	def __init__(self, text=()):
+		self.text = []
+		self.length = array.array('l', [-1, 0])
+		self.link = array.array('L', [IMAGINARY, IMAGINARY])
+		self.end = array.array('L', [0, 0])
+		self.suffix_count = array.array('L', [0, 0])
+		self.edges = {}
+		self.last = EMPTY
+		self.extend(text)
+
+	def __len__(self):
+		return len(self.text)
+
+	def extend(self, text):
+		for c in text:
+			self.append(c)
+
+	def _extendable(self, node, c):
+		"""Node whose palyndrome is followed by c and preceded by c, walking links from `node`"""
+		text = self.text
+		pos = len(text) - 1
+		while True:
+			start = pos - self.length[node] - 1
+			if start >= 0 and text[start] == c:
+				return node
+			node = self.link[node]
+
+	def append(self, c):
+		"""Appends a symbol, returns node of the longest palyndromic suffix of the text"""
+		self.text.append(c)
+		parent = self._extendable(self.last, c)
+		node = self.edges.get((parent, c))
+		if node is None:
+			node = len(self.length)
+			if parent == IMAGINARY:
+				link = EMPTY
+			else:
+				link = self.edges[(self._extendable(self.link[parent], c), c)]
+			self.length.append(self.length[parent] + 2)
+			self.link.append(link)
+			self.end.append(len(self.text))
+			self.suffix_count.append(0)
+			self.edges[(parent, c)] = node
+		self.suffix_count[node] += 1
+		self.last = node
+		return node
+
+	def distinct_count(self):
+		"""Number of distinct non-empty palyndromic substrings"""
+		return len(self.length) - 2
+
+	def longest_suffix(self):
+		"""Range [begin, end) of the longest palyndromic suffix of the text"""
+		return len(self.text) - max(self.length[self.last], 0), len(self.text)
+
+	def span(self, node):
+		"""Range [begin, end) of the first occurrence of node's palyndrome"""
+		return self.end[node] - self.length[node], self.end[node]
+
+	def palyndrome(self, node):
+		begin, end = self.span(node)
+		return self.text[begin:end]
+
+	def occurrences(self):
+		"""
+		occurrences[node] - number of occurrences of node's palyndrome in text.
+		Every occurrence of p is also an occurrence of its palyndromic suffixes,
+		links lead to earlier nodes, so counts are pushed along them in reverse order.
+		"""
+		counts = array.array('L', self.suffix_count)
+		for node in xrange(len(counts) - 1, EMPTY, -1):
+			counts[self.link[node]] += counts[node]
+		counts[IMAGINARY] = counts[EMPTY] = 0
+		return counts
+
+	def palyndromes(self):
+		"""(begin, end, occurrences) of every distinct palyndrome in order of first occurrence end"""
+		counts = self.occurrences()
+		for node in xrange(EMPTY + 1, len(self.length)):
+			begin, end = self.span(node)
+			yield begin, end, counts[node]
@@ -0,0 +1,178 @@
+"""
+FM-index: pattern search over the Burrows-Wheeler transform of a text.
+
+The text is indexed as if it was followed by an end marker larger than all
+of its symbols, the same convention suffix_array and bwt_block use.
+Occurrences of every symbol are counted at every `occ_sample_rate`-th row of
+the transform and suffix array positions are kept only for text positions
+divisible by `sa_sample_rate`, so both can be traded against query time.
+"""
+
+import array
+import bisect
+
+from algolib.bwt import bwt_block
+from algolib.suffix_array import numpy, numpy_symbols, suffix_array, suffix_array_ext
+
+class SortedSamples(object):
+	"""Sampled suffix positions as two parallel sequences sorted by row, looked up by bisection"""
+	def __init__(self, rows, positions):
+		self.rows = rows
+		self.positions = positions
+
+	def __len__(self):
+		return len(self.rows)
+
+	def get(self, row, default=None):
+		i = bisect.bisect_left(self.rows, row)
+		if i < len(self.rows) and self.rows[i] == row:
+			return self.positions[i]
+		return default
+
+	def iteritems(self):
+		return iter(zip(self.rows, self.positions))
+
+def transform(mapped, suf_arr, end_marker):
+	"""
+	BWT of `mapped` (str or array('I') of symbol codes) followed by `end_marker`,
+	one row per suffix and the last one for the end marker. Built natively by
+	bwt_block or from `suf_arr` with numpy, the loop is the last resort.
+	"""
+	size = len(mapped)
+	if isinstance(mapped, str) and suffix_array_ext is not None:
+		data, primary = bwt_block(mapped)
+		return data[:primary] + chr(end_marker) + data[primary:]
+	if isinstance(mapped, str):
+		codes = bytearray(mapped)
+		result = bytearray(size + 1)
+	else:
+		codes = mapped
+		result = array.array('I', [0]) * (size + 1)
+	if numpy is not None and size:
+		positions = numpy_symbols(suf_arr).astype(numpy.intp)
+		view = numpy_symbols(result)[:size]
+		# positions - 1 of the first suffix wraps to the last symbol, it's replaced below
+		view[:] = numpy_symbols(codes)[positions - 1]
+		view[positions == 0] = end_marker
+	else:
+		for row, pos in enumerate(suf_arr):
+			result[row] = codes[pos - 1] if pos else end_marker
+	result[size] = codes[size - 1] if size else end_marker
+	return str(result) if isinstance(result, bytearray) else result
+
+class FMIndex(object):
+	def __init__(self, text, sa_sample_rate=32, occ_sample_rate=64, suf_arr=None):
+		"""`suf_arr` is the suffix array of `text` if it was already computed"""
+		if sa_sample_rate < 1 or occ_sample_rate < 1:
+			raise ValueError("Sample rates must be positive")
+		self.sa_sample_rate = sa_sample_rate
+		self.occ_sample_rate = occ_sample_rate
+		self.size = len(text)
+
+		self.alphabet = sorted(set(text))
+		self.codes = {c: i for (i, c) in enumerate(self.alphabet)}
+		end_marker = len(self.alphabet)
+		if end_marker < 256:
+			self.symbols = map(chr, xrange(end_marker + 1))
+			if isinstance(text, str):
+				table = [chr(0)] * 256
+				for c, code in self.codes.iteritems():
+					table[ord(c)] = chr(code)
+				mapped = text.translate(''.join(table))
+			else:
+				mapped = str(bytearray(self.codes[c] for c in text))
+		else:
+			self.symbols = range(end_marker + 1)
+			mapped = array.array('I', (self.codes[c] for c in text))
+
+		if suf_arr is None:
+			suf_arr = suffix_array(text)
+		self.bwt = transform(mapped, suf_arr, end_marker)
+
+		# first[code] - the first row which starts with symbol `code`
+		self.first = [0]
+		for code in xrange(end_marker):
+			self.first.append(self.first[-1] + mapped.count(self.symbols[code]))
+
+		# occ[code][k] - occurrences of `code` in bwt[:k * occ_sample_rate]
+		rows = len(self.bwt)
+		self.occ = []
+		for code in xrange(end_marker):
+			checkpoints = array.array('L')
+			count = 0
+			for start in xrange(0, rows + 1, occ_sample_rate):
+				checkpoints.append(count)
+				count += self.count_in_bwt(code, start, start + occ_sample_rate)
+			self.occ.append(checkpoints)
+
+		# Rows of sampled suffixes in increasing order and their positions,
+		# the end marker is the largest suffix and takes the last row
+		sample_rows = array.array('L')
+		sample_positions = array.array('L')
+		for row, pos in enumerate(suf_arr):
+			if pos % sa_sample_rate == 0:
+				sample_rows.append(row)
+				sample_positions.append(pos)
+		if self.size % sa_sample_rate == 0:
+			sample_rows.append(self.size)
+			sample_positions.append(self.size)
+		self.samples = SortedSamples(sample_rows, sample_positions)
+
+	def __len__(self):
+		return self.size
+
+	def count_in_bwt(self, code, start, end):
+		"""Occurrences of `code` in bwt[start:end], bwt is a str, an array or a mapped one"""
+		if isinstance(self.bwt, str):
+			return self.bwt.count(self.symbols[code], start, end)
+		return self.bwt[start:end].count(self.symbols[code])
+
+	def rank(self, code, row):
+		"""Occurrences of `code` in bwt[:row], counts less than occ_sample_rate symbols natively"""
+		checkpoint = row // self.occ_sample_rate
+		start = checkpoint * self.occ_sample_rate
+		return self.occ[code][checkpoint] + self.count_in_bwt(code, start, row)
+
+	def code_at(self, row):
+		c = self.bwt[row]
+		return ord(c) if isinstance(c, str) else c
+
+	def rows(self, pattern):
+		"""Range [begin, end) of suffix array rows which start with `pattern`"""
+		begin, end = 0, len(self.bwt)
+		for c in reversed(pattern):
+			code = self.codes.get(c)
+			if code is None:
+				return 0, 0
+			begin = self.first[code] + self.rank(code, begin)
+			end = self.first[code] + self.rank(code, end)
+			if begin >= end:
+				return 0, 0
+		return begin, end
+
+	def count(self, pattern):
+		"""
+		Number of occurrences of `pattern`, 2 * len(pattern) ranks each counting
+		less than occ_sample_rate symbols with str.count or array.count
+		"""
+		begin, end = self.rows(pattern)
+		return end - begin
+
+	def suffix_position(self, row):
+		"""Suffix array value of the row, makes less than sa_sample_rate LF steps"""
+		steps = 0
+		pos = self.samples.get(row)
+		while pos is None:
+			code = self.code_at(row)
+			row = self.first[code] + self.rank(code, row)
+			steps += 1
+			pos = self.samples.get(row)
+		return pos + steps
+
+	def locate(self, pattern):
+		"""
+		Sorted positions of all occurrences of `pattern`.
+		Empty pattern occurs at every position from 0 to len(text).
+		"""
+		begin, end = self.rows(pattern)
+		return sorted(self.suffix_position(row) for row in xrange(begin, end))
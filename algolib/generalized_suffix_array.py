@@ -0,0 +1,174 @@
+"""
+Generalized suffix array over many documents.
+
+Documents are concatenated into one integer text, every document is followed
+by its own terminator. Terminators are larger than all symbols, so suffixes
+of every document are ordered the same way suffix_array orders them alone,
+and common prefixes never run across a document boundary.
+"""
+
+import array
+import bisect
+import collections
+
+from algolib.suffix_array import lcp_kasai, suffix_array, suffix_array_ext
+
+# Terminator of document i in byte documents is BYTE_TERMINATOR + i
+BYTE_TERMINATOR = 256
+
+def concatenate_documents(documents, codes=None):
+	"""
+	Returns (text, starts) where document i is text[starts[i]:starts[i + 1] - 1].
+	Symbols are remapped with `codes` dict, bytes are kept as is when it's None.
+	"""
+	terminator = BYTE_TERMINATOR if codes is None else len(codes)
+	text = array.array('L')
+	starts = array.array('L', [0])
+	for i, document in enumerate(documents):
+		if codes is None:
+			text.extend(bytearray(document))
+		else:
+			text.extend(codes[c] for c in document)
+		text.append(terminator + i)
+		starts.append(len(text))
+	return text, starts
+
+class GeneralizedSuffixArray(object):
+	"""
+	documents - list of byte strings or of sequences of comparable symbols
+	text, starts - concatenation of documents, see concatenate_documents
+	suffix_array - suffix array of text
+	document_array[rank] - document which suffix_array[rank] belongs to
+	Byte documents are processed by suffix_array_ext in one call when it's available.
+	"""
+	def __init__(self, documents):
+		self.documents = documents
+		self.lcp_cache = None
+		if all(isinstance(document, str) for document in documents):
+			self.codes = None
+			if suffix_array_ext is not None:
+				(
+					self.text, self.starts, self.suffix_array, self.document_array
+				) = suffix_array_ext.generalized_suffix_array(documents)
+				return
+		else:
+			alphabet = sorted(set(c for document in documents for c in document))
+			self.codes = {c: i for (i, c) in enumerate(alphabet)}
+		self.text, self.starts = concatenate_documents(documents, self.codes)
+		self.suffix_array = suffix_array(self.text)
+		document_of = array.array('L')
+		for i in xrange(len(documents)):
+			document_of.extend(array.array('L', [i]) * (self.starts[i + 1] - self.starts[i]))
+		self.document_array = array.array('L', (document_of[pos] for pos in self.suffix_array))
+
+	def __len__(self):
+		return len(self.documents)
+
+	def lcp(self):
+		"""lcp of the text in lcp_kasai layout, computed on first use"""
+		if self.lcp_cache is None:
+			self.lcp_cache = lcp_kasai(self.text, self.suffix_array)
+		return self.lcp_cache
+
+	def document_position(self, pos):
+		"""(document, offset in it) of text position"""
+		document = bisect.bisect_right(self.starts, pos) - 1
+		return document, pos - self.starts[document]
+
+	def encode(self, pattern):
+		"""Pattern as an array of text symbols or None if some symbol is not met in documents"""
+		if self.codes is None:
+			return array.array(self.text.typecode, bytearray(pattern))
+		try:
+			return array.array(self.text.typecode, (self.codes[c] for c in pattern))
+		except KeyError:
+			return None
+
+	def rows(self, pattern):
+		"""Range [begin, end) of suffix array ranks which start with `pattern`"""
+		encoded = self.encode(pattern)
+		if encoded is None:
+			return 0, 0
+		size = len(encoded)
+		text = self.text
+		suf_arr = self.suffix_array
+		lo, hi = 0, len(suf_arr)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if text[suf_arr[mid]:suf_arr[mid] + size] < encoded:
+				lo = mid + 1
+			else:
+				hi = mid
+		begin = lo
+		hi = len(suf_arr)
+		while lo < hi:
+			mid = (lo + hi) // 2
+			if text[suf_arr[mid]:suf_arr[mid] + size] == encoded:
+				lo = mid + 1
+			else:
+				hi = mid
+		return begin, lo
+
+	def locate(self, pattern):
+		"""Sorted (document, offset) pairs of all occurrences of `pattern`"""
+		begin, end = self.rows(pattern)
+		return sorted(self.document_position(self.suffix_array[rank]) for rank in xrange(begin, end))
+
+	def count_by_document(self, pattern):
+		"""{document: number of occurrences of `pattern` in it}"""
+		begin, end = self.rows(pattern)
+		return dict(collections.Counter(self.document_array[begin:end]))
+
+	def documents_containing(self, pattern):
+		begin, end = self.rows(pattern)
+		return sorted(set(self.document_array[begin:end]))
+
+	def longest_common_substring(self, min_documents=None):
+		"""
+		Longest substring which occurs in at least `min_documents` documents
+		(all of them by default), lexicographically smallest one on ties.
+		Sliding window over suffix array ranks, O(total length).
+		"""
+		if min_documents is None:
+			min_documents = len(self.documents)
+		if not self.documents or not 1 <= min_documents <= len(self.documents):
+			raise ValueError("min_documents must be in range [1, %d]" % len(self.documents))
+		lcp = self.lcp()
+		document_array = self.document_array
+		# Suffixes which start with terminators are the last ones
+		suffixes = len(self.text) - len(self.documents)
+
+		best_length, best_rank = 0, None
+		counts = collections.defaultdict(int)
+		distinct = 0
+		# Ranks in the window with increasing lcp[rank]
+		min_lcp = collections.deque()
+		lo = 0
+		for hi in xrange(suffixes):
+			if not counts[document_array[hi]]:
+				distinct += 1
+			counts[document_array[hi]] += 1
+			if hi > lo:
+				while min_lcp and lcp[min_lcp[-1]] >= lcp[hi - 1]:
+					min_lcp.pop()
+				min_lcp.append(hi - 1)
+			while distinct >= min_documents:
+				if hi > lo:
+					length = lcp[min_lcp[0]]
+				else:
+					# Whole suffix up to the terminator
+					length = self.starts[document_array[lo] + 1] - 1 - self.suffix_array[lo]
+				if length > best_length:
+					best_length, best_rank = length, lo
+				document = document_array[lo]
+				counts[document] -= 1
+				if not counts[document]:
+					distinct -= 1
+				if min_lcp and min_lcp[0] == lo:
+					min_lcp.popleft()
+				lo += 1
+
+		if best_rank is None:
+			return self.documents[0][:0]
+		document, offset = self.document_position(self.suffix_array[best_rank])
+		return self.documents[document][offset:offset + best_length]
@@ -0,0 +1,249 @@
+"""
+Versioned binary file format for suffix arrays, LCP arrays, BWT and FM-index.
+
+File layout (all integers are little-endian):
+	header: MAGIC, format version (uint32), kind (8 bytes), section count (uint32)
+	section table: name (16 bytes), typecode (a byte), offset and item count (uint64)
+	section data, every section is aligned to 8 bytes
+
+Files are opened with mmap, so loading doesn't read the file and processes
+which load the same file share one copy of it through the page cache.
+Sections are returned as MappedArray views over the mapping. Their buffer()
+is a zero-copy typed view which algolib passes to suffix_array_ext as is.
+"""
+
+import array
+import mmap
+import struct
+import sys
+
+from algolib.fm_index import FMIndex, SortedSamples
+from algolib.suffix_array import numpy
+
+MAGIC = 'ALGOIDX\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sI8sI')
+SECTION = struct.Struct('<16scQQ')
+ALIGNMENT = 8
+
+# Section typecode -> struct format of one item. 'c' sections are raw bytes.
+ITEM_FORMATS = {'c': 'c', 'B': 'B', 'H': 'H', 'I': 'I', 'Q': 'Q', 'q': 'q'}
+UNSIGNED_BY_SIZE = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+class MappedArray(object):
+	"""Read-only sequence of integers stored in a memory mapped file"""
+	def __init__(self, data, offset, typecode, count):
+		self.data = data
+		self.offset = offset
+		self.typecode = typecode
+		self.item = struct.Struct('<' + ITEM_FORMATS[typecode])
+		self.itemsize = self.item.size
+		self.count = count
+
+	def __len__(self):
+		return self.count
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			start, stop, step = index.indices(self.count)
+			if step != 1:
+				return self.tolist()[index]
+			return self.slice(start, max(start, stop))
+		if index < 0:
+			index += self.count
+		if not 0 <= index < self.count:
+			raise IndexError("MappedArray index out of range")
+		return self.item.unpack_from(self.data, self.offset + index * self.itemsize)[0]
+
+	def slice(self, start, stop):
+		"""Copy of items [start, stop) as a byte string or array.array"""
+		raw = self.data[self.offset + start * self.itemsize:self.offset + stop * self.itemsize]
+		if self.typecode == 'c':
+			return raw
+		result = array.array(array_typecode(self.typecode))
+		result.fromstring(raw)
+		if sys.byteorder == 'big':
+			result.byteswap()
+		return result
+
+	def __iter__(self):
+		chunk = 1 << 16
+		for start in xrange(0, self.count, chunk):
+			for value in self.slice(start, min(start + chunk, self.count)):
+				yield value
+
+	def tolist(self):
+		return list(self.slice(0, self.count))
+
+	def buffer(self):
+		"""
+		Zero-copy view of the items for suffix_array_ext: a buffer of bytes for 'c'
+		sections, a read-only numpy array of little-endian integers for the others,
+		None if numpy is not available.
+		"""
+		if self.typecode == 'c':
+			return buffer(self.data, self.offset, self.count)
+		if numpy is None:
+			return None
+		dtype = numpy.dtype('<' + ITEM_FORMATS[self.typecode])
+		if not self.count:
+			return numpy.empty(0, dtype=dtype)
+		return numpy.frombuffer(self.data, dtype=dtype, count=self.count, offset=self.offset)
+
+def array_typecode(typecode):
+	"""array.array typecode with the same item size as section typecode"""
+	size = struct.calcsize('<' + ITEM_FORMATS[typecode])
+	for code in ('BHILQ' if typecode != 'q' else 'bhilq'):
+		try:
+			if array.array(code).itemsize == size:
+				return code
+		except ValueError:
+			pass
+	raise ValueError("No array typecode for %d byte items" % size)
+
+def pack_section(values):
+	"""Returns (typecode, count, raw little-endian bytes)"""
+	if isinstance(values, str):
+		return 'c', len(values), values
+	if isinstance(values, MappedArray):
+		return values.typecode, len(values), values.data[values.offset:values.offset + len(values) * values.itemsize]
+	if not isinstance(values, array.array) or values.typecode not in 'BHILQ':
+		if len(values) and min(values) < 0:
+			typecode = 'q'
+		else:
+			max_value = max(values) if len(values) else 0
+			typecode = next(code for code in 'BHIQ' if max_value < 1 << (8 * struct.calcsize(code)))
+		values = array.array(array_typecode(typecode), values)
+	else:
+		typecode = UNSIGNED_BY_SIZE[values.itemsize]
+	if sys.byteorder == 'big':
+		values = array.array(values.typecode, values)
+		values.byteswap()
+	return typecode, len(values), values.tostring()
+
+def write_index_file(path, kind, sections):
+	"""Write `sections`: list of (name, byte string or sequence of integers)"""
+	packed = [(name,) + pack_section(values) for (name, values) in sections]
+	offset = HEADER.size + SECTION.size * len(packed)
+	table = []
+	for name, typecode, count, raw in packed:
+		offset += -offset % ALIGNMENT
+		table.append(SECTION.pack(name, typecode, offset, count))
+		offset += len(raw)
+	with open(path, 'wb') as f:
+		f.write(HEADER.pack(MAGIC, VERSION, kind, len(packed)))
+		f.write(''.join(table))
+		for name, typecode, count, raw in packed:
+			f.write('\x00' * (-f.tell() % ALIGNMENT))
+			f.write(raw)
+
+class IndexFile(object):
+	"""Memory mapped file written by write_index_file"""
+	def __init__(self, path, kind=None):
+		with open(path, 'rb') as f:
+			self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		if len(self.data) < HEADER.size:
+			raise ValueError("%s is not an index file" % path)
+		magic, version, file_kind, count = HEADER.unpack_from(self.data)
+		if magic != MAGIC:
+			raise ValueError("%s is not an index file" % path)
+		if version != VERSION:
+			raise ValueError("Unsupported index file version %d" % version)
+		self.kind = file_kind.rstrip('\x00')
+		if kind is not None and self.kind != kind:
+			raise ValueError("Expected %r index file, got %r" % (kind, self.kind))
+		if len(self.data) < HEADER.size + SECTION.size * count:
+			raise ValueError("Truncated index file")
+		self.sections = {}
+		for i in xrange(count):
+			name, typecode, offset, size = SECTION.unpack_from(self.data, HEADER.size + SECTION.size * i)
+			if typecode not in ITEM_FORMATS:
+				raise ValueError("Unknown section typecode %r" % typecode)
+			section = MappedArray(self.data, offset, typecode, size)
+			if offset + size * section.itemsize > len(self.data):
+				raise ValueError("Truncated index file")
+			self.sections[name.rstrip('\x00')] = section
+
+	def __getitem__(self, name):
+		return self.sections[name]
+
+	def close(self):
+		"""Arrays returned from the file must not be used after it is closed"""
+		self.data.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+def save_suffix_array(path, suf_arr):
+	write_index_file(path, 'sa', [('sa', suf_arr)])
+
+def load_suffix_array(path):
+	return IndexFile(path, 'sa')['sa']
+
+def save_lcp(path, lcp):
+	write_index_file(path, 'lcp', [('lcp', lcp)])
+
+def load_lcp(path):
+	return IndexFile(path, 'lcp')['lcp']
+
+def save_bwt(path, data, primary):
+	"""Save result of bwt_block"""
+	write_index_file(path, 'bwt', [('bwt', data), ('primary', [primary])])
+
+def load_bwt(path):
+	"""Returns (data, primary), data is a copy, the file is closed"""
+	with IndexFile(path, 'bwt') as index_file:
+		return index_file['bwt'][:], index_file['primary'][0]
+
+def save_fm_index(path, index):
+	"""Only indices of byte strings and integer sequences can be saved"""
+	if all(isinstance(c, str) for c in index.alphabet):
+		alphabet = ''.join(index.alphabet)
+	elif all(isinstance(c, (int, long)) for c in index.alphabet):
+		alphabet = index.alphabet
+	else:
+		raise TypeError("Only FM-index of byte string or integers can be saved")
+	samples = sorted(index.samples.iteritems())
+	occ = array.array('L')
+	for checkpoints in index.occ:
+		occ.extend(checkpoints)
+	write_index_file(path, 'fm', [
+		('params', [index.size, index.sa_sample_rate, index.occ_sample_rate]),
+		('alphabet', alphabet),
+		('bwt', index.bwt),
+		('first', index.first),
+		('occ', occ),
+		('sample_rows', [row for (row, pos) in samples]),
+		('sample_positions', [pos for (row, pos) in samples]),
+	])
+
+def load_fm_index(path):
+	"""
+	FMIndex over the mapped file, the transform, occurrence checkpoints and
+	samples are read from the mapping on demand. The file stays open while
+	the index is used.
+	"""
+	index_file = IndexFile(path, 'fm')
+	index = FMIndex.__new__(FMIndex)
+	index.size, index.sa_sample_rate, index.occ_sample_rate = index_file['params']
+	alphabet = index_file['alphabet']
+	index.alphabet = list(alphabet.slice(0, len(alphabet)))
+	index.codes = {c: i for (i, c) in enumerate(index.alphabet)}
+	end_marker = len(index.alphabet)
+	index.bwt = index_file['bwt']
+	if index.bwt.typecode == 'c':
+		index.symbols = map(chr, xrange(end_marker + 1))
+	else:
+		index.symbols = range(end_marker + 1)
+	index.first = index_file['first'].tolist()
+	occ = index_file['occ']
+	checkpoints = len(occ) // end_marker if end_marker else 0
+	index.occ = [
+		MappedArray(occ.data, occ.offset + code * checkpoints * occ.itemsize, occ.typecode, checkpoints)
+		for code in xrange(end_marker)
+	]
+	index.samples = SortedSamples(index_file['sample_rows'], index_file['sample_positions'])
+	return index
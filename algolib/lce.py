@@ -0,0 +1,193 @@
+"""
+Range minimum queries (RMQ) over lcp arrays and longest common extension (LCE) queries.
+
+lce(i, j) is the length of the longest common prefix of suffixes i and j.
+With rank = inverse suffix array it equals the minimum of lcp over ranks
+[min(rank[i], rank[j]), max(rank[i], rank[j])), so an O(1) RMQ gives O(1) LCE.
+
+Both RMQ structures keep a sparse table over minima of blocks of values:
+level k has one item per block, item i is the minimum of blocks [i, i + 2 ** k).
+A query takes the minimum of two overlapping power-of-two ranges of full blocks
+and the minima of the partial blocks at the ends.
+	SparseTable: blocks of one value by default, n * (log2(n) + 1) items,
+		O(n log n) build. With block_size b partial blocks are scanned: O(b) query.
+	BlockSparseTable: (n / b) * (log2(n / b) + 1) items plus a 32-bit mask per
+		value, O(n) build, O(1) query. Masks are the stacks of minima of a
+		left to right scan of every block (b <= 32), so the minimum of any
+		range inside a block is the lowest set bit of one mask.
+Items have the size of lcp items (4 bytes for lcp from suffix_array_ext).
+LCE also keeps the rank array of n items. For a random 10MB text with the
+extension, LCE (rank array included) is built in 2.1s with a 960MB sparse
+table or in 0.6s with a 64MB BlockSparseTable (b = 32, 24MB table and 40MB
+masks), lce_many answers a million queries in 0.2s and 0.3s respectively.
+`benchmark.py run -b sparse_table -b block_sparse_table -b lce_many` measures them.
+"""
+
+import array
+import itertools
+
+from algolib.suffix_array import buffer_view, inverse_suffix_array, is_buffer, lcp_kasai, suffix_array, suffix_array_ext
+
+# Masks of BlockSparseTable have one bit per value of a block
+MAX_MASKED_BLOCK_SIZE = 32
+
+def sparse_table(values, block_size=1):
+	"""Flat sparse table over minima of blocks of `block_size` values, see module docstring"""
+	if block_size < 1:
+		raise ValueError("block_size must be positive")
+	if suffix_array_ext is not None and is_buffer(values):
+		return suffix_array_ext.sparse_table(values, block_size)
+	size = len(values)
+	level = [min(values[i:i + block_size]) for i in xrange(0, size, block_size)]
+	blocks = len(level)
+	table = array.array(values.typecode if isinstance(values, array.array) else 'L', level)
+	half = 1
+	while 2 * half <= blocks:
+		count = blocks - 2 * half + 1
+		level = map(min, level[:count], level[half:half + count])
+		table.extend(level)
+		table.extend(itertools.repeat(0, blocks - count))
+		half *= 2
+	return table
+
+def block_masks(values, block_size):
+	"""
+	array('I') of in-block minima stacks: bit s of masks[j] is set if values[start + s]
+	is less than all values after it up to j, start is the beginning of the block of j.
+	The lowest bit of masks[j] >> (i - start) is the offset of min(values[i:j + 1]) from i.
+	"""
+	if not 1 <= block_size <= MAX_MASKED_BLOCK_SIZE:
+		raise ValueError("block_size must be from 1 to %d" % MAX_MASKED_BLOCK_SIZE)
+	if suffix_array_ext is not None and is_buffer(values):
+		return suffix_array_ext.block_masks(values, block_size)
+	size = len(values)
+	masks = array.array('I', [0]) * size
+	for start in xrange(0, size, block_size):
+		stack = 0
+		for j in xrange(start, min(start + block_size, size)):
+			value = values[j]
+			while stack:
+				top = stack.bit_length() - 1
+				if values[start + top] < value:
+					break
+				stack ^= 1 << top
+			stack |= 1 << (j - start)
+			masks[j] = stack
+	return masks
+
+class SparseTable(object):
+	"""
+	min(values[begin:end]) in O(1).
+	values - list or buffer of integers, it's kept and must not be modified
+	block_size - the table is built over minima of blocks of that many values,
+	it's block_size times smaller, but queries scan up to 2 * block_size values
+	"""
+	masks = None
+
+	def __init__(self, values, block_size=1):
+		if suffix_array_ext is not None:
+			values = buffer_view(values)
+		self.values = values
+		self.block_size = block_size
+		self.blocks = (len(values) + block_size - 1) // block_size
+		self.table = sparse_table(values, block_size)
+
+	def __len__(self):
+		return len(self.values)
+
+	def query(self, begin, end):
+		"""min(values[begin:end]), begin < end"""
+		if not 0 <= begin < end <= len(self.values):
+			raise IndexError("Invalid range [%d, %d)" % (begin, end))
+		block_size = self.block_size
+		first = (begin + block_size - 1) // block_size
+		last = end // block_size
+		if first >= last:
+			return min(self.values[begin:end])
+		k = (last - first).bit_length() - 1
+		offset = k * self.blocks
+		result = min(self.table[offset + first], self.table[offset + last - (1 << k)])
+		if begin < first * block_size:
+			result = min(result, min(self.values[begin:first * block_size]))
+		if last * block_size < end:
+			result = min(result, min(self.values[last * block_size:end]))
+		return result
+
+class BlockSparseTable(SparseTable):
+	"""
+	Succinct SparseTable: the table over block minima plus block_masks of values,
+	queries are O(1) for block_size up to 32.
+	"""
+	def __init__(self, values, block_size=MAX_MASKED_BLOCK_SIZE):
+		super(BlockSparseTable, self).__init__(values, block_size)
+		self.masks = block_masks(self.values, block_size)
+
+	def in_block(self, i, j):
+		"""min(values[i:j + 1]) for i and j in the same block"""
+		mask = self.masks[j] >> (i % self.block_size)
+		return self.values[i + (mask & -mask).bit_length() - 1]
+
+	def query(self, begin, end):
+		"""min(values[begin:end]), begin < end"""
+		if not 0 <= begin < end <= len(self.values):
+			raise IndexError("Invalid range [%d, %d)" % (begin, end))
+		block_size = self.block_size
+		first = begin // block_size
+		last = (end - 1) // block_size
+		if first == last:
+			return self.in_block(begin, end - 1)
+		result = min(self.in_block(begin, first * block_size + block_size - 1), self.in_block(last * block_size, end - 1))
+		if last - first > 1:
+			k = (last - first - 1).bit_length() - 1
+			offset = k * self.blocks
+			result = min(result, self.table[offset + first + 1], self.table[offset + last - (1 << k)])
+		return result
+
+class LCE(object):
+	"""
+	Longest common extension queries over `text`.
+	suf_arr, lcp - precomputed suffix array and lcp_kasai of text
+	block_size - None for SparseTable, otherwise size of BlockSparseTable blocks, up to 32
+	"""
+	def __init__(self, text, suf_arr=None, lcp=None, block_size=None):
+		self.size = len(text)
+		if suf_arr is None:
+			suf_arr = suffix_array(text)
+		if lcp is None:
+			lcp = lcp_kasai(text, suf_arr)
+		self.rank = inverse_suffix_array(suf_arr)
+		if block_size is None:
+			self.rmq = SparseTable(lcp)
+		else:
+			self.rmq = BlockSparseTable(lcp, block_size)
+
+	def __len__(self):
+		return self.size
+
+	def lce(self, i, j):
+		"""Length of the longest common prefix of suffixes i and j"""
+		if not (0 <= i < self.size and 0 <= j < self.size):
+			raise IndexError("position out of range")
+		if i == j:
+			return self.size - i
+		r1, r2 = self.rank[i], self.rank[j]
+		return self.rmq.query(min(r1, r2), max(r1, r2))
+
+	def lce_many(self, pairs):
+		"""
+		lce of every (i, j) pair as array.array('L').
+		pairs - sequence of pairs or a flat buffer of positions i0, j0, i1, j1, ...
+		One call to suffix_array_ext when it's available.
+		"""
+		if not is_buffer(pairs):
+			pairs = array.array('L', itertools.chain.from_iterable(pairs))
+		if len(pairs) % 2:
+			raise ValueError("pairs must have even number of positions")
+		rmq = self.rmq
+		if (
+			suffix_array_ext is not None and is_buffer(self.rank) and self.rank.itemsize >= 4
+			and is_buffer(rmq.values) and is_buffer(rmq.table) and rmq.values.itemsize == rmq.table.itemsize
+			and (rmq.masks is None or is_buffer(rmq.masks))
+		):
+			return suffix_array_ext.lce_many(self.rank, rmq.values, rmq.table, rmq.block_size, pairs, rmq.masks)
+		return array.array('L', (self.lce(pairs[k], pairs[k + 1]) for k in xrange(0, len(pairs), 2)))
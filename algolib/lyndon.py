@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from algolib.suffix_array import suffix_array_ks
+import array
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from algolib.suffix_array import has_negative_symbols, is_buffer, suffix_array_ext, suffix_array_ks
 
 """
 Convention: suppose a and b are strings (indexing from 0) of length len(a) <= len(b)
@@ -168,6 +172,19 @@ def factorize_lyndon(arr):
             next_candidate_idx += 1
             current_lyndon_r = next_candidate_idx
 
+def _native_batch(data):
+    """Whether suffix_array_ext can process data as is: it reads signed symbols as unsigned"""
+    return suffix_array_ext is not None and is_buffer(data) and not has_negative_symbols(data)
+
+def lyndon_factorization(arr):
+    """
+    Starts of all Lyndon factors of arr as an array.
+    Byte strings and integer buffers are factorized by suffix_array_ext in one call.
+    """
+    if _native_batch(arr):
+        return suffix_array_ext.lyndon_factorization(arr)
+    return array.array('L', factorize_lyndon(arr))
+
 
 """
 How would we find lexicographically minimum rotation?
@@ -178,9 +195,10 @@ ddddddaaaaaada
 We could also do it in O(1) space
 Since in Lyndon factorization words are decreasing lexicographically,
 we can simply take that last Lyndon word.
-Though if input string ends with multiple same Lyndon words, we need
-to output the first one. So we need to factorize s + "special infinity sign"
-so that the last group of Lyndon words gets merged into a single Lyndon word.
+Though the last word of s alone is not enough: for baababa it's a,
+and the minimal rotation aababab starts with a longer word that wraps around.
+So factorize s + s and take the last word which starts in the first half.
+If s + s ends with multiple same Lyndon words, we need to output the first one.
 E.g. abcaabaab: abc aab aab, minimal rotation is aabaababc, not aababcaab
 """
 
@@ -195,32 +213,28 @@ def lex_min_rotation_naive(arr):
 def lex_min_rotation(arr):
     """
     Find position i such that arr[i:] + arr[:i] is lexicographically
-    smaller or equal than all other rotations
+    smaller or equal than all other rotations (the smallest such i).
+    Byte strings and integer buffers are processed by suffix_array_ext.
     """
-    if not arr:
-        return 0
-    lyndon_l = 0
-    lyndon_r = 1
-    next_i = 1
-    while lyndon_l < len(arr):
-        lyndon_size = lyndon_r - lyndon_l
-        compare_i = lyndon_l + (next_i - lyndon_r) % lyndon_size
-        if next_i == len(arr) or arr[next_i] < arr[compare_i]:
-            prev_lyndon_l = lyndon_l
-            while lyndon_l + lyndon_size <= next_i:
-                lyndon_l += lyndon_size
-                lyndon_r += lyndon_size
-            lyndon_r = lyndon_l + 1
-            next_i = lyndon_r
-            # We've processed the last group of same Lyndon words
-            if lyndon_l == len(arr):
-                return prev_lyndon_l
-        elif arr[next_i] == arr[compare_i]:
-            next_i += 1
-        elif arr[next_i] > arr[compare_i]:
+    if _native_batch(arr):
+        return suffix_array_ext.min_rotation(arr)
+    size = len(arr)
+    result = lyndon_l = 0
+    while lyndon_l < size:
+        result = lyndon_l
+        # Factorize arr + arr like factorize_lyndon does
+        next_i = lyndon_l + 1
+        compare_i = lyndon_l
+        while next_i < 2 * size and arr[compare_i % size] <= arr[next_i % size]:
+            if arr[compare_i % size] < arr[next_i % size]:
+                compare_i = lyndon_l
+            else:
+                compare_i += 1
             next_i += 1
-            lyndon_r = next_i
-    assert False
+        # Skip the group of same Lyndon words of size next_i - compare_i
+        while lyndon_l <= compare_i:
+            lyndon_l += next_i - compare_i
+    return result
 
 """
 We could also compute minimum rotation by findinf suffix array of S+S
@@ -235,6 +249,121 @@ def lex_min_rotation_suf_arr(arr):
     suf_arr = suffix_array_ks(arr + arr)
     return suf_arr[0]
 
+"""
+Circular sequences (e.g. plasmids) are equal up to rotation iff their
+minimal rotations are equal, so the minimal rotation (or its hash) is a
+deduplication key. Batches are packed into one buffer with offsets, then
+suffix_array_ext processes chunks of items per call without the GIL and
+chunks run on a thread pool.
+"""
+
+# Rotation hash of c_1 .. c_n is n * B ** n + sum((c_i + 1) * B ** (n - i)) modulo 2 ** 64
+ROTATION_HASH_BASE = 1099511628211
+ROTATION_HASH_MASK = (1 << 64) - 1
+
+def pack_sequences(sequences):
+    """
+    (data, offsets): sequence i is data[offsets[i]:offsets[i + 1]].
+    Byte strings are joined into a str, integer sequences into array.array('L').
+    """
+    sequences = list(sequences)
+    offsets = array.array('L', [0])
+    for sequence in sequences:
+        offsets.append(offsets[-1] + len(sequence))
+    if all(isinstance(sequence, str) for sequence in sequences):
+        return ''.join(sequences), offsets
+    data = array.array('L')
+    for sequence in sequences:
+        data.extend(sequence)
+    return data, offsets
+
+def rotation_hash(arr):
+    """Hash of arr itself (not of its minimal rotation), see ROTATION_HASH_BASE"""
+    result = len(arr)
+    for c in (bytearray(arr) if isinstance(arr, str) else arr):
+        result = (result * ROTATION_HASH_BASE + c + 1) & ROTATION_HASH_MASK
+    return result
+
+def _as_batch(data, offsets):
+    if offsets is None:
+        return pack_sequences(data)
+    if not is_buffer(offsets):
+        offsets = array.array('L', offsets)
+    return data, offsets
+
+# Smaller batches (in symbols) are processed in the calling thread:
+# starting threads costs more than the work itself
+MIN_PARALLEL_SIZE = 1 << 20
+
+def _map_chunks(func, data, offsets, threads):
+    """Concatenation of func(data, offsets of a chunk of items) over chunks, run on a thread pool of this call"""
+    items = len(offsets) - 1
+    threads = threads or multiprocessing.cpu_count()
+    if threads == 1 or items < 2 or offsets[-1] - offsets[0] < MIN_PARALLEL_SIZE:
+        return func(data, offsets)
+    chunks = min(items, 4 * threads)
+    bounds = [items * k // chunks for k in xrange(chunks + 1)]
+    pool = ThreadPool(threads)
+    try:
+        parts = pool.map(
+            lambda chunk: func(data, offsets[bounds[chunk]:bounds[chunk + 1] + 1]), xrange(chunks)
+        )
+    finally:
+        pool.terminate()
+        pool.join()
+    result = parts[0]
+    for part in parts[1:]:
+        result.extend(part)
+    return result
+
+
+def _items(data, offsets):
+    return (data[offsets[i]:offsets[i + 1]] for i in xrange(len(offsets) - 1))
+
+def min_rotations(data, offsets=None, threads=None):
+    """
+    lex_min_rotation of every sequence as array.array('L').
+    data, offsets - packed batch, see pack_sequences, or a list of sequences and None.
+    threads - size of the thread pool for suffix_array_ext, all cores by default
+    """
+    data, offsets = _as_batch(data, offsets)
+    if _native_batch(data):
+        return _map_chunks(suffix_array_ext.min_rotations, data, offsets, threads)
+    return array.array('L', (lex_min_rotation(item) for item in _items(data, offsets)))
+
+def canonical_rotations(data, offsets=None, threads=None):
+    """
+    (rotated, offsets): minimal rotations of all sequences packed the same way,
+    rotated is a str for byte strings, otherwise an array.
+    """
+    data, offsets = _as_batch(data, offsets)
+    first = offsets[0] if len(offsets) else 0
+    rebased = array.array('L', (offset - first for offset in offsets))
+    if _native_batch(data):
+        rotated = _map_chunks(suffix_array_ext.canonical_rotations, data, offsets, threads)
+        return (rotated.tostring() if isinstance(data, str) else rotated), rebased
+    rotated = []
+    for item in _items(data, offsets):
+        start = lex_min_rotation(item)
+        rotated.append(item[start:] + item[:start])
+    if isinstance(data, str):
+        return ''.join(rotated), rebased
+    return array.array('L', (c for item in rotated for c in item)), rebased
+
+def rotation_hashes(data, offsets=None, threads=None):
+    """
+    rotation_hash of the minimal rotation of every sequence as array.array('L'):
+    equal for all rotations of a sequence, a key for deduplication.
+    """
+    data, offsets = _as_batch(data, offsets)
+    if _native_batch(data):
+        return _map_chunks(suffix_array_ext.rotation_hashes, data, offsets, threads)
+    result = array.array('L')
+    for item in _items(data, offsets):
+        start = lex_min_rotation(item)
+        result.append(rotation_hash(item[start:] + item[:start]))
+    return result
+
 """TODO: Why this function generated next Lyndon word?"""
 
 def next_lyndon_word(arr, n, max_symbol):
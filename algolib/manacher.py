@@ -15,6 +15,12 @@ We will focus only on odd palyndromes and then extend the algorithm to all
 kinds of palyndromes using a simple hack.
 """
 
+import array
+import itertools
+
+from algolib.lce import BlockSparseTable, SparseTable
+from algolib.suffix_array import as_symbol_buffer, is_buffer, suffix_array_ext
+
 def find_odd_palyndromes_simple(s):
     """
     Brute-force - expand palyndrome bounds at each location till it's possible
@@ -131,7 +137,7 @@ all we get will be just worse asymptotics.
 
 """
 
-def find_odd_palyndromes_manacher(s):
+def find_odd_palyndromes_rightmost(s):
     prev_radius = [0] * len(s)
     rightmost_palyndrome_l = rightmost_palyndrome_r = 0
     for center in xrange(len(s)):
@@ -186,7 +192,7 @@ and take care of a special case : $o$ must be reported as 'o', not as '$'
 
 def generic_find_all_palyndromes(s, odd_palyndrome_finder):
     mangled_s = '$'.join(s)
-    for center, radius in find_odd_palyndromes_manacher(mangled_s):
+    for center, radius in odd_palyndrome_finder(mangled_s):
         l = center - radius
         r = center + radius
         if mangled_s[l] == '$' and mangled_s[r] == '$':
@@ -201,5 +207,177 @@ def generic_find_all_palyndromes(s, odd_palyndrome_finder):
 def find_all_palyndromes_slow(s):
     return generic_find_all_palyndromes(s, odd_palyndrome_finder=find_odd_palyndromes_simple)
 
+"""
+The hack doubles the input (and breaks if `s` contains '$') and both
+generators create a tuple per center, which is a lot for a genome.
+Instead run the same loop twice over `s` itself: once over symbols
+and once over gaps between them, keeping radii in two arrays:
+odd[i] - radius of maximal palyndrome s[i - odd[i]:i + odd[i] + 1]
+even[i] - radius of maximal palyndrome s[i - even[i]:i + even[i]],
+          centered between i - 1 and i (so even[0] == 0)
+"""
+
+def palyndrome_radii_py(s):
+    odd = [0] * len(s)
+    # Rightmost palyndrome found so far is s[l:r + 1]
+    l, r = 0, -1
+    for center in xrange(len(s)):
+        radius = 0 if center > r else min(odd[l + r - center], r - center)
+        while center - radius > 0 and center + radius + 1 < len(s) and s[center - radius - 1] == s[center + radius + 1]:
+            radius += 1
+        odd[center] = radius
+        if center + radius > r:
+            l, r = center - radius, center + radius
+
+    even = [0] * len(s)
+    l, r = 0, -1
+    for center in xrange(len(s)):
+        radius = 0 if center > r else min(even[l + r - center + 1], r - center + 1)
+        while center - radius > 0 and center + radius < len(s) and s[center - radius - 1] == s[center + radius]:
+            radius += 1
+        even[center] = radius
+        if center + radius - 1 > r:
+            l, r = center - radius, center + radius - 1
+    return odd, even
+
+def palyndrome_radii(s):
+    """
+    (odd, even) radius arrays, see above. Computed by suffix_array_ext
+    when it is available, then they are array.array('I') or ('L').
+    """
+    if suffix_array_ext is not None:
+        return suffix_array_ext.palindrome_radii(as_symbol_buffer(s))
+    return palyndrome_radii_py(s)
+
+def find_odd_palyndromes_manacher(s):
+    odd, _ = palyndrome_radii(s)
+    for center, radius in enumerate(odd):
+        yield center, radius
+
 def find_all_palyndromes_manacher(s):
-    return generic_find_all_palyndromes(s, odd_palyndrome_finder=find_odd_palyndromes_manacher)
\ No newline at end of file
+    """Same (l, r) pairs in the same order as find_all_palyndromes_slow"""
+    odd, even = palyndrome_radii(s)
+    for center in xrange(len(s)):
+        yield center - odd[center], center + odd[center]
+        if center + 1 < len(s) and even[center + 1]:
+            yield center + 1 - even[center + 1], center + even[center + 1]
+
+"""
+Queries over a fixed string after one run of Manacher algorithm.
+
+s[l:r] is a palyndrome iff the maximal palyndrome centered at its center
+covers it: one lookup in odd or even radii.
+
+Longest palyndrome inside s[l:r]: a palyndrome of radius k fits if some
+center in [l + k, r - k) (for odd ones) has radius >= k, and if radius k
+fits, so does k - 1. So binary search k with range maximum queries over
+radii. Maximum is taken with SparseTable (minimum) over keys
+(n - radius) * (n + 1) + center, which also tells where the maximum is:
+the leftmost center with the largest radius.
+"""
+
+class PalyndromeQueries(object):
+    """
+    is_palyndrome(l, r) in O(1), longest_palyndrome(l, r) in O(log(r - l)).
+    block_size - None for SparseTable, otherwise size of BlockSparseTable blocks,
+    see algolib.lce for the memory and time trade-off.
+    """
+    def __init__(self, s, block_size=None):
+        self.size = len(s)
+        self.block_size = block_size
+        self.odd, self.even = palyndrome_radii(s)
+        self.odd_rmq = self._range_max(self.odd)
+        self.even_rmq = self._range_max(self.even)
+
+    def _range_max(self, radii):
+        size = self.size
+        keys = array.array('L', ((size - radius) * (size + 1) + center for center, radius in enumerate(radii)))
+        if self.block_size is None:
+            return SparseTable(keys)
+        return BlockSparseTable(keys, self.block_size)
+
+    def __len__(self):
+        return self.size
+
+    def _check_range(self, l, r):
+        if not 0 <= l <= r <= self.size:
+            raise IndexError("Invalid range [%d, %d)" % (l, r))
+
+    def is_palyndrome(self, l, r):
+        """Whether s[l:r] is a palyndrome"""
+        self._check_range(l, r)
+        length = r - l
+        if length % 2:
+            return self.odd[(l + r) // 2] >= length // 2
+        return length == 0 or self.even[(l + r) // 2] >= length // 2
+
+    def _widest(self, rmq, l, r, min_radius, max_radius, last_center_offset):
+        """(center, radius) with the largest radius k in [min_radius, max_radius] which fits"""
+        size = self.size
+        best = None
+        while min_radius <= max_radius:
+            k = (min_radius + max_radius) // 2
+            key = rmq.query(l + k, r - k + last_center_offset)
+            if size - key // (size + 1) >= k:
+                best = key % (size + 1), k
+                min_radius = k + 1
+            else:
+                max_radius = k - 1
+        return best
+
+    def longest_palyndrome(self, l, r):
+        """Range [begin, end) of a longest palyndrome inside s[l:r]"""
+        self._check_range(l, r)
+        length = r - l
+        if not length:
+            return l, l
+        center, radius = self._widest(self.odd_rmq, l, r, 0, (length - 1) // 2, 0)
+        best = center - radius, center + radius + 1
+        # Even palyndrome centered between center - 1 and center
+        even = self._widest(self.even_rmq, l, r, radius + 1, length // 2, 1)
+        if even is not None:
+            center, radius = even
+            best = center - radius, center + radius
+        return best
+
+    def _native_args(self):
+        odd_rmq, even_rmq = self.odd_rmq, self.even_rmq
+        if suffix_array_ext is None or not all(is_buffer(arr) for arr in (self.odd, self.even)):
+            return None
+        return (
+            self.odd, self.even, odd_rmq.values, odd_rmq.table,
+            even_rmq.values, even_rmq.table, odd_rmq.block_size
+        )
+
+    def is_palyndrome_many(self, ranges):
+        """
+        is_palyndrome of every (l, r) range as array.array('B') of 0 and 1.
+        ranges - sequence of pairs or a flat buffer l0, r0, l1, r1, ...
+        One call to suffix_array_ext when it's available.
+        """
+        ranges = self._flat_ranges(ranges)
+        args = self._native_args()
+        if args is not None:
+            return suffix_array_ext.palindrome_many(self.odd, self.even, ranges)
+        return array.array('B', (self.is_palyndrome(ranges[k], ranges[k + 1]) for k in xrange(0, len(ranges), 2)))
+
+    def longest_palyndrome_many(self, ranges):
+        """
+        longest_palyndrome of every (l, r) range as a flat array.array('L')
+        begin0, end0, begin1, end1, ...
+        """
+        ranges = self._flat_ranges(ranges)
+        args = self._native_args()
+        if args is not None:
+            return suffix_array_ext.longest_palindrome_many(*(args + (ranges,)))
+        return array.array('L', itertools.chain.from_iterable(
+            self.longest_palyndrome(ranges[k], ranges[k + 1]) for k in xrange(0, len(ranges), 2)
+        ))
+
+    @staticmethod
+    def _flat_ranges(ranges):
+        if not is_buffer(ranges):
+            ranges = array.array('L', itertools.chain.from_iterable(ranges))
+        if len(ranges) % 2:
+            raise ValueError("ranges must have even number of positions")
+        return ranges
@@ -1,6 +1,17 @@
 # -*- coding: utf-8 -*-
 
-#import suffix_array_ext
+import array
+import itertools
+
+try:
+	import suffix_array_ext
+except ImportError:
+	suffix_array_ext = None
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 def suffix_array_naive(s):
 	"""Naive n^2 log(n)"""
@@ -12,18 +23,15 @@ def suffix_array_naive(s):
 
 def counting_sort(arr, key_func, max_key):
 	"""Stable counting sort, works in O(max(len(arr), max_key))"""
-	max_key += 1
-	occ = [0] * max_key
-	for elem in arr:
-		occ[key_func(elem)] += 1
-	for i in xrange(1, max_key):
-		occ[i] += occ[i - 1]
-	pos = [0] * max_key
-	for i in xrange(1, max_key):
-		pos[i] = occ[i - 1]
+	keys = map(key_func, arr)
+	pos = [0] * (max_key + 1)
+	for k in keys:
+		pos[k] += 1
+	total = 0
+	for k in xrange(max_key + 1):
+		total, pos[k] = total + pos[k], total
 	result = [None] * len(arr)
-	for elem in arr:
-		k = key_func(elem)
+	for elem, k in itertools.izip(arr, keys):
 		result[pos[k]] = elem
 		pos[k] += 1
 	return result
@@ -48,7 +56,6 @@ def suffix_array_kmr(s):
 
 	prefix_size = 1
 	while True:
-		strings = [s[i:i + prefix_size] for i in xrange(len(s))]
 		table = []
 		max_rank = max(position_to_rank)
 		for i in xrange(len(s)):
@@ -59,8 +66,6 @@ def suffix_array_kmr(s):
 		table = counting_sort(table, lambda x: x[0][1], max_rank + 1)
 		table = counting_sort(table, lambda x: x[0][0], max_rank + 1)
 
-		assert sorted(table) == table
-
 		new_position_to_rank = [0] * len(s)
 		prev_rank_pair = None
 		rank = 0
@@ -84,103 +89,162 @@ def suffix_array_kmr(s):
 
 	return result
 
-def suffix_array_ks_helper(arr, max_elem):
-	def get_elem(ind):
-		if ind < len(arr):
-			return arr[ind]
-		return max_elem + 1
+def numpy_symbols(s):
+	"""Symbols of `s` as a numpy array, buffers are not copied"""
+	if isinstance(s, (str, bytearray, buffer)):
+		return numpy.frombuffer(s, dtype=numpy.uint8)
+	if isinstance(s, array.array):
+		return numpy.frombuffer(s, dtype=s.typecode)
+	return numpy.asarray(s)
+
+def suffix_array_numpy(s):
+	"""
+	Vectorized prefix doubling, O(N*log(N)) per round.
+	Every round sorts suffixes by (rank of the first half, rank of the second half)
+	packed into one int64 key, and it stops as soon as all ranks are distinct,
+	so only log2 of the longest repeat length rounds are needed.
+	"""
+	if numpy is None:
+		raise ImportError('numpy is required for suffix_array_numpy')
+	size = len(s)
+	if not size:
+		return []
+	symbols = numpy_symbols(as_symbol_buffer(s))
+	if symbols.dtype == numpy.uint8:
+		rank = symbols.astype(numpy.int64)
+	else:
+		rank = numpy.unique(symbols, return_inverse=True)[1].astype(numpy.int64)
+	second = numpy.empty(size, dtype=numpy.int64)
+	prefix_size = 1
+	while True:
+		# Missing second half is the end of string, which is larger than all ranks
+		end_rank = int(rank.max()) + 1
+		second[:size - prefix_size] = rank[prefix_size:]
+		second[size - prefix_size:] = end_rank
+		key = rank * (end_rank + 1) + second
+		order = numpy.argsort(key)
+		key = key[order]
+		new_rank = numpy.empty(size, dtype=numpy.int64)
+		new_rank[0] = 0
+		numpy.cumsum(key[1:] != key[:-1], out=new_rank[1:])
+		if new_rank[-1] == size - 1:
+			return order.tolist()
+		rank[order] = new_rank
+		prefix_size *= 2
+
+def radix_pass(src, dst, keys, offset, max_key, count):
+	"""
+	Stable counting sort of positions `src` into `dst` by keys[pos + offset].
+	`count` is a work list of at least max_key + 1 items, reused between calls.
+	"""
+	src_keys = map((keys[offset:] if offset else keys).__getitem__, src)
+	count[:max_key + 1] = itertools.repeat(0, max_key + 1)
+	for key in src_keys:
+		count[key] += 1
+	total = 0
+	for key in xrange(max_key + 1):
+		total, count[key] = total + count[key], total
+	for pos, key in itertools.izip(src, src_keys):
+		dst[count[key]] = pos
+		count[key] += 1
+
+def suffix_array_ks_helper(arr, max_elem, count=None):
+	"""
+	arr - list of integers in range [0, max_elem].
+	count - work list for radix_pass shared by all recursion levels.
+	"""
+	size = len(arr)
+	end = max_elem + 1
+	if count is None:
+		count = [0] * (max(end, size) + 2)
+	# Three end symbols let keys at pos + 2 be read without bounds checks
+	arr = arr + [end] * 3
 
 	# Suppose s is abacaba then it will be split into
 	# bac aba - remainder 1
 	# aca ba$ - remainder 2
 
-	# sort only by first 3 symbols
-	rem12 = range(1, len(arr), 3) + range(2, len(arr), 3)
-	rem12 = counting_sort(rem12, key_func=lambda pos: get_elem(pos + 2), max_key=max_elem + 1)
-	rem12 = counting_sort(rem12, key_func=lambda pos: get_elem(pos + 1), max_key=max_elem + 1)
-	rem12 = counting_sort(rem12, key_func=lambda pos: get_elem(pos + 0), max_key=max_elem + 1)
+	# sort only by first 3 symbols, packed into one integer
+	symbol_base = end + 1
+	pairs = [a * symbol_base + b for (a, b) in itertools.izip(arr, itertools.islice(arr, 1, size + 1))]
+	triples = [p * symbol_base + c for (p, c) in itertools.izip(pairs, itertools.islice(arr, 2, size + 2))]
+	rem12 = range(1, size, 3) + range(2, size, 3)
+	work = rem12[:]
+	if symbol_base ** 3 <= len(count):
+		# Small alphabets are sorted by all 3 symbols in one pass
+		radix_pass(rem12, work, triples, 0, symbol_base ** 3 - 1, count)
+	else:
+		radix_pass(rem12, work, arr, 2, end, count)
+		radix_pass(work, rem12, arr, 1, end, count)
+		radix_pass(rem12, work, arr, 0, end, count)
+	rem12, work = work, rem12
 
 	# Assign rank to each position from rem12. If multiple positions
 	# have same rank, this means that we need to make a recursive call to solve those collisions.
-	position_to_rank = [None] * len(arr)
-	prev_t = None
-	rank = 0
+	position_to_rank = [0] * (size + 3)
+	rank = -1
+	prev = None
 	for pos in rem12:
-		t = (get_elem(pos), get_elem(pos + 1), get_elem(pos + 2))
-		if prev_t is not None and prev_t != t:
+		if triples[pos] != prev:
 			rank += 1
-		prev_t = t
+			prev = triples[pos]
 		position_to_rank[pos] = rank
 	# Rank of $$$ symbol
 	dollar_rank = rank + 1
 
 	# So there were collisions
 	if dollar_rank < len(rem12):
-		new_arr = []
-		idx = []
-		# If string was abacaba, construct 
+		# If string was abacaba, construct
 		# bac + aba + $$$ + aca + ba$
 		# Note that this will give us ordering for positions with remained 1 and 2
-		for i in xrange(1, len(arr), 3):
-			new_arr.append(position_to_rank[i])
-			idx.append(i)
-		new_arr.append(dollar_rank)
-		idx.append(None)
-		for i in xrange(2, len(arr), 3):
-			new_arr.append(position_to_rank[i])
-			idx.append(i)
-		result = suffix_array_ks_helper(new_arr, dollar_rank)
-
-		# Now deduce rank for original positions from computed ordering
-		rem12 = []
-		for rank, pos in enumerate(result):
-			if idx[pos] is not None:
-				position_to_rank[idx[pos]] = rank
-				rem12.append(idx[pos])
-
-		# $$$ rank may have changed
-		dollar_rank = len(result)
-
-	def get_rank(pos):
-		if pos < len(position_to_rank):
-			return position_to_rank[pos]
-		return dollar_rank
+		rem1_count = len(xrange(1, size, 3))
+		new_arr = position_to_rank[1:size:3] + [dollar_rank] + position_to_rank[2:size:3]
+		result = suffix_array_ks_helper(new_arr, dollar_rank, count)
 
-	# rem0 can be sorted by (first_char, corresponding rem1 rank) 
-	rem0 = range(0, len(arr), 3)
-	rem0 = counting_sort(rem0, key_func=lambda pos: get_rank(pos + 1), max_key=dollar_rank)
-	rem0 = counting_sort(rem0, key_func=lambda pos: arr[pos], max_key=max_elem)
+		# Now deduce rank for original positions from computed ordering.
+		# $$$ is the only largest symbol, so its suffix is the last one.
+		rem12 = [3 * k + 1 if k < rem1_count else 3 * (k - rem1_count) - 1 for k in result[:-1]]
+		for rank, pos in enumerate(rem12):
+			position_to_rank[pos] = rank
 
-	# Merge phase
+		# $$$ rank may have changed
+		dollar_rank = len(rem12)
+
+	position_to_rank[size:] = [dollar_rank] * 3
+
+	# rem0 can be sorted by (first_char, corresponding rem1 rank)
+	rem0 = range(0, size, 3)
+	work = rem0[:]
+	radix_pass(rem0, work, position_to_rank, 1, dollar_rank, count)
+	radix_pass(work, rem0, arr, 0, end, count)
+
+	# Merge phase, keys are tuples of symbols and ranks packed into integers
+	rank_base = dollar_rank + 1
+	# Case 1: compare rem0 with rem1
+	# key is (first_char, corresponding rem1) and (first_char, corresponding rem2)
+	keys1 = [a * rank_base + r for (a, r) in itertools.izip(arr, itertools.islice(position_to_rank, 1, size + 1))]
+	# Case 2: compare rem0 with rem2
+	# key is (first_char, second_char, corresponding_rem2)
+	# and (first_char, second_char, corresponding_rem1)
+	keys2 = [p * rank_base + r for (p, r) in itertools.izip(pairs, itertools.islice(position_to_rank, 2, size + 2))]
 	result = []
+	append = result.append
+	rem0_count, rem12_count = len(rem0), len(rem12)
 	i = j = 0
-	while i < len(rem0) and j < len(rem12):
+	while i < rem0_count and j < rem12_count:
 		pos0 = rem0[i]
 		pos12 = rem12[j]
-		if rem12[j] % 3 == 1:
-			# Case 1: compare rem0 with rem1
-			# key is (first_char, corresponding rem1) and (first_char, corresponding rem2)
-			key0 = get_elem(pos0), get_rank(pos0 + 1)
-			key12 = get_elem(pos12), get_rank(pos12 + 1)
-		elif rem12[j] % 3 == 2:
-			# Case 2: compare rem0 with rem2
-			# key is (first_char, second_char, corresponding_rem2)
-			# and (first_char, second_char, corresponding_rem1)
-			key0 = get_elem(pos0), get_elem(pos0 + 1), get_rank(pos0 + 2)
-			key12 = get_elem(pos12), get_elem(pos12 + 1), get_rank(pos12 + 2)
-		else:
-			assert False
-		if key0 <= key12:
-			result.append(pos0)
+		keys = keys1 if pos12 % 3 == 1 else keys2
+		if keys[pos0] <= keys[pos12]:
+			append(pos0)
 			i += 1
 		else:
-			result.append(pos12)
+			append(pos12)
 			j += 1
 	result.extend(rem0[i:])
 	result.extend(rem12[j:])
 
 	return result
-	
 
 def suffix_array_ks(s):
 	"""Kärkkäinen, Sanders suffix array construction, O(N) runtime"""
@@ -192,18 +256,142 @@ def suffix_array_ks(s):
 	result = suffix_array_ks_helper(arr, max_elem)
 	return result
 
-def suffix_array_ks_ext(s):
-	"""C++ implementation of the above"""
-	if not s:
-		return []
+# array.array and numpy typecodes of signed integers
+SIGNED_TYPECODES = 'bhilq'
+
+def is_buffer(s):
+	"""Whether `s` exposes its elements as a contiguous array of integers"""
+	if isinstance(s, (str, bytearray, buffer, array.array)):
+		return True
+	try:
+		memoryview(s)
+	except TypeError:
+		return False
+	return True
+
+def buffer_view(s):
+	"""
+	Zero-copy buffer of a sequence which provides one with buffer(), like MappedArray
+	of index_file, `s` itself otherwise. Views are meant for suffix_array_ext only.
+	"""
+	view = s.buffer() if not is_buffer(s) and hasattr(s, 'buffer') else None
+	return s if view is None else view
+
+def remap_alphabet(s):
+	"""Ranks of symbols of `s` among its distinct symbols as array of integers"""
 	alphabet = {c: i for (i, c) in enumerate(sorted(set(s)))}
-	arr = [alphabet[c] for c in s]
-	result = suffix_array_ext.suffix_array_ks_helper(arr)
-	return result
+	return array.array('I', (alphabet[c] for c in s))
+
+def as_buffer(s):
+	"""Returns `s` if it is a buffer, otherwise remaps its alphabet into array of integers"""
+	if is_buffer(s):
+		return s
+	return remap_alphabet(s)
+
+def has_negative_symbols(s):
+	"""Whether buffer `s` of signed integers (array.array or numpy array) has negative ones"""
+	typecode = getattr(s, 'typecode', None) or getattr(getattr(s, 'dtype', None), 'char', None)
+	if not typecode or typecode not in SIGNED_TYPECODES or not len(s):
+		return False
+	return (s.min() if hasattr(s, 'min') else min(s)) < 0
+
+def as_symbol_buffer(s):
+	"""
+	Like as_buffer, but sequences of non-negative integers (e.g. word ids) are only
+	packed into array.array('L'): the extension compacts sparse alphabets itself.
+	The extension rejects negative symbols, signed buffers which have them are remapped.
+	"""
+	if is_buffer(s):
+		return remap_alphabet(s) if has_negative_symbols(s) else s
+	try:
+		return array.array('L', s)
+	except (TypeError, OverflowError):
+		return as_buffer(s)
+
+def suffix_array_ks_ext(s, out=None):
+	"""
+	C++ implementation of the above.
+	Byte strings and integer buffers (array.array, numpy arrays) are passed
+	to the extension without copying, integer sequences are packed into an array,
+	anything else is remapped to an array first. Symbols may be arbitrary
+	unsigned integers, sparse alphabets are compacted natively.
+	Returns array.array of positions or fills `out` buffer of 4 or 8 byte integers.
+	"""
+	return suffix_array_ext.suffix_array_ks_helper(as_symbol_buffer(s), out=out)
+
+def suffix_array_sais_ext(s, out=None):
+	"""
+	Nong, Zhang, Chan induced sorting (SA-IS) in C++, O(N) runtime.
+	Faster than KS and needs about 5N bytes for byte strings.
+	Arguments and result are the same as for suffix_array_ks_ext.
+	"""
+	return suffix_array_ext.suffix_array_sais_helper(as_symbol_buffer(s), out=out)
+
+# algorithm: (pure Python implementation, C++ implementation)
+SUFFIX_ARRAY_ALGORITHMS = {
+	'naive': (suffix_array_naive, None),
+	'kmr': (suffix_array_kmr, None),
+	'numpy': (suffix_array_numpy, None),
+	'ks': (suffix_array_ks, suffix_array_ks_ext),
+	'sais': (None, suffix_array_sais_ext),
+}
+
+def suffix_array(s, algorithm='auto'):
+	"""
+	Compute suffix array of `s` with one of SUFFIX_ARRAY_ALGORITHMS.
+	C++ implementation is preferred when suffix_array_ext is available,
+	'auto' picks the fastest available algorithm: SA-IS with the extension,
+	numpy prefix doubling without it, KS when numpy is missing too.
+	C++ implementations return array.array, Python ones return list.
+	"""
+	if algorithm == 'auto':
+		if suffix_array_ext is not None:
+			algorithm = 'sais'
+		elif numpy is not None:
+			algorithm = 'numpy'
+		else:
+			algorithm = 'ks'
+	if algorithm not in SUFFIX_ARRAY_ALGORITHMS:
+		raise ValueError('Unknown suffix array algorithm %r' % (algorithm,))
+	python_impl, ext_impl = SUFFIX_ARRAY_ALGORITHMS[algorithm]
+	if ext_impl is not None and suffix_array_ext is not None:
+		return ext_impl(s)
+	if python_impl is None:
+		raise ImportError('suffix_array_ext is required for %r algorithm' % (algorithm,))
+	return python_impl(s)
 
 
 def lcp_kasai(arr, suf_arr):
-	"""Kasai algorithm to compute lcp"""
+	"""
+	Kasai algorithm to compute lcp, lcp[rank] is the length of the
+	longest common prefix of suffixes suf_arr[rank] and suf_arr[rank + 1].
+	Uses C++ implementation when suffix_array_ext is available.
+	"""
+	if suffix_array_ext is not None:
+		return lcp_kasai_ext(arr, suf_arr)
+	return lcp_kasai_py(arr, suf_arr)
+
+def lcp_ext_args(arr, suf_arr):
+	suf_arr = buffer_view(suf_arr)
+	if not is_buffer(suf_arr):
+		suf_arr = array.array('L', suf_arr)
+	return as_symbol_buffer(arr), suf_arr
+
+def lcp_kasai_ext(arr, suf_arr, out=None):
+	"""C++ implementation of Kasai algorithm, returns array.array or fills `out` buffer"""
+	arr, suf_arr = lcp_ext_args(arr, suf_arr)
+	return suffix_array_ext.lcp_kasai(arr, suf_arr, out=out)
+
+def lcp_phi_ext(arr, suf_arr, out=None):
+	"""
+	Same as lcp_kasai_ext, but computes permuted lcp (PLCP) first.
+	Besides the result needs only len(arr) / 8 bytes of memory.
+	"""
+	arr, suf_arr = lcp_ext_args(arr, suf_arr)
+	return suffix_array_ext.lcp_phi(arr, suf_arr, out=out)
+
+def lcp_kasai_py(arr, suf_arr):
+	"""Pure Python implementation of Kasai algorithm"""
 	if len(arr) < 1:
 		return []
 	rank_to_pos = suf_arr
@@ -239,3 +427,18 @@ def lcp_kasai(arr, suf_arr):
 
 			result[rank] = lcp
 	return result
+
+def inverse_suffix_array(suf_arr):
+	"""
+	Rank array: rank[suf_arr[i]] = i.
+	Uses C++ implementation when suffix_array_ext is available and suf_arr is a buffer
+	or has a buffer_view.
+	"""
+	if suffix_array_ext is not None:
+		view = buffer_view(suf_arr)
+		if is_buffer(view):
+			return suffix_array_ext.inverse_suffix_array(view)
+	rank = array.array('L', [0]) * len(suf_arr)
+	for i, pos in enumerate(suf_arr):
+		rank[pos] = i
+	return rank
@@ -4,7 +4,11 @@ Ukkonen linear time suffix tree building algorithm
 and various applications
 """
 
+import array
 import collections
+import heapq
+
+from algolib.suffix_array import as_symbol_buffer, suffix_array_ext
 
 
 """
@@ -140,7 +144,10 @@ def grow_edge(position, new_edge):
     return middle_node
 
 
-def build(s):
+def build(s, compact=False):
+    """Returns root Node or CompactSuffixTree if `compact` is set"""
+    if compact:
+        return CompactSuffixTree(s)
     root = Node()
     position = Position(root)
     ask_for_successor = None
@@ -190,6 +197,8 @@ def build(s):
 
 def traverse(position, s):
     """Find if string `s` is contained in suffix tree `node`"""
+    if isinstance(position, CompactPosition):
+        return position.tree.traverse(position, s)
     runner = Position(position.node, position.edge, position.offset)
     for c in s:
         if runner.edge is None:
@@ -225,33 +234,46 @@ def build_naive(s):
     return root
 
 
-def find_longest_repeating_substring(s):
+def terminated_tree(s):
+    """CompactSuffixTree of `s` followed by a unique terminator, as SuffixTreeStats needs"""
+    forbidden_symbol = '\x00'
+    assert forbidden_symbol not in s
+    return CompactSuffixTree(s + forbidden_symbol)
+
+def find_longest_repeating_substring(s, compact=True):
+    if compact:
+        return SuffixTreeStats(terminated_tree(s)).longest_repeated_substring()
     forbidden_symbol = '\x00'
     assert forbidden_symbol not in s
     suffix_tree = build(s + forbidden_symbol)
 
-    def dfs(node, total_len):
+    # Nodes with multiple children - thus string is met multiple times
+    best = (0, suffix_tree)
+    stack = [(suffix_tree, 0)]
+    while stack:
+        node, total_len = stack.pop()
         assert len(node.edges) != 1
-        if not len(node.edges):
-            return None
-
-        # This node has multiple children - thus string is met multiple times
-        best = (total_len, node)
-
+        if not node.edges:
+            continue
+        best = max(best, (total_len, node))
         for c, edge in node.edges.iteritems():
-            total_len += edge.label.length()
-            res = dfs(edge.node, total_len)
-            if res is not None:
-                best = max(best, res)
-            total_len -= edge.label.length()
-
-        return best
+            stack.append((edge.node, total_len + edge.label.length()))
 
-    max_len, node = dfs(suffix_tree, 0)
+    max_len, node = best
     result = get_path(node)
     return ''.join(str(v) for v in result)
 
+def most_frequent_substrings(s, k, min_length=1):
+    """See SuffixTreeStats.most_frequent_substrings"""
+    return SuffixTreeStats(terminated_tree(s)).most_frequent_substrings(k, min_length)
+
+def count_distinct_substrings(s):
+    """Number of distinct non-empty substrings of `s`"""
+    return SuffixTreeStats(terminated_tree(s)).distinct_substrings()
+
 def convert_to_suffix_array(tree, dollar_sign):
+    if isinstance(tree, CompactSuffixTree):
+        return list(SuffixTreeStats(tree).suffix_array)
     stack = collections.deque([(tree, 0)])
     result = []
     while stack:
@@ -266,4 +288,457 @@ def convert_to_suffix_array(tree, dollar_sign):
     for i, depth in enumerate(result):
         result[i] = max_depth - depth
 
-    return result
\ No newline at end of file
+    return result
+
+class CompactPosition(object):
+    """Same as Position, but `edge` is the child node of CompactSuffixTree"""
+    __slots__ = ('tree', 'node', 'edge', 'offset')
+
+    def __init__(self, tree, node, edge=None, offset=0):
+        self.tree = tree
+        self.node = node
+        self.edge = edge
+        self.offset = offset
+
+    def __repr__(self):
+        if self.edge is None:
+            return 'CompactPosition(%d)' % self.node
+        return 'CompactPosition(%d, %d, %d)' % (self.node, self.edge, self.offset)
+
+class CompactSuffixTree(object):
+    """
+    Ukkonen suffix tree stored in parallel arrays instead of Node objects.
+    Nodes are integers, root is 0. Edge coming into node `v` is labeled
+    with s[edge_start[v]:edge_end[v]], children of `v` form a linked list
+    first_child[v], next_sibling[first_child[v]], ... terminated by -1
+    and sorted by the first symbol of their edges.
+    The tree is built by suffix_array_ext when it is available.
+    """
+    __slots__ = (
+        's', 'node_count',
+        'edge_start', 'edge_end', 'first_child', 'next_sibling', 'link', 'parents',
+        'active_node', 'active_edge', 'active_length', 'remainder',
+    )
+
+    root = 0
+
+    def __init__(self, s):
+        self.s = s
+        if suffix_array_ext is not None:
+            (
+                self.edge_start, self.edge_end, self.first_child,
+                self.next_sibling, self.link, self.parents
+            ) = suffix_array_ext.suffix_tree_build(as_symbol_buffer(s))
+            self.node_count = len(self.edge_start)
+            return
+        n = len(s)
+        # Suffix tree has at most 2 * n nodes
+        self._init_arrays('i' if 2 * n + 1 < 1 << 31 else 'l')
+        self._reserve(2 * n + 1)
+        self._extend(0, n)
+        for arr in self._arrays():
+            del arr[self.node_count:]
+
+    def _arrays(self):
+        return self.edge_start, self.edge_end, self.first_child, self.next_sibling, self.link, self.parents
+
+    def _init_arrays(self, typecode):
+        for name in ('edge_start', 'edge_end', 'first_child', 'next_sibling', 'link', 'parents'):
+            setattr(self, name, array.array(typecode, [0]))
+        self.first_child[0] = self.next_sibling[0] = self.parents[0] = -1
+        self.node_count = 1
+        # Active point: node, position in s of the first symbol of active edge and
+        # how many symbols of the edge are matched; number of suffixes to insert
+        self.active_node = 0
+        self.active_edge = 0
+        self.active_length = 0
+        self.remainder = 0
+
+    def _reserve(self, capacity):
+        grow = capacity - len(self.edge_start)
+        if grow <= 0:
+            return
+        for arr, value in zip(self._arrays(), (0, 0, -1, -1, 0, -1)):
+            arr.extend(array.array(arr.typecode, [value]) * grow)
+
+    def _new_node(self, parent, start, end):
+        node = self.node_count
+        self.node_count += 1
+        self.edge_start[node] = start
+        self.edge_end[node] = end
+        self.parents[node] = parent
+        # Children are kept sorted by the first symbol of their edges
+        s = self.s
+        prev = -1
+        next_node = self.first_child[parent]
+        while next_node != -1 and s[self.edge_start[next_node]] < s[start]:
+            prev = next_node
+            next_node = self.next_sibling[next_node]
+        self.next_sibling[node] = next_node
+        if prev == -1:
+            self.first_child[parent] = node
+        else:
+            self.next_sibling[prev] = node
+        return node
+
+    def _extend(self, begin, end, leaf_end=None):
+        """Ukkonen phases for s[begin:end], leaves end at `leaf_end` (len(s) by default)"""
+        s = self.s
+        if leaf_end is None:
+            leaf_end = len(s)
+        edge_start = self.edge_start
+        edge_end = self.edge_end
+        first_child = self.first_child
+        next_sibling = self.next_sibling
+        link = self.link
+        parents = self.parents
+
+        active_node = self.active_node
+        active_edge = self.active_edge
+        active_length = self.active_length
+        remainder = self.remainder
+        for i in xrange(begin, end):
+            c = s[i]
+            remainder += 1
+            # Internal node which needs suffix link to the next node we stop at
+            waiting_for_link = -1
+            while remainder:
+                if not active_length:
+                    active_edge = i
+                first = s[active_edge]
+                child = first_child[active_node]
+                while child != -1 and s[edge_start[child]] != first:
+                    child = next_sibling[child]
+
+                if child == -1:
+                    self._new_node(active_node, i, leaf_end)
+                    if waiting_for_link > 0:
+                        link[waiting_for_link] = active_node
+                    waiting_for_link = active_node
+                else:
+                    edge_length = min(edge_end[child], i + 1) - edge_start[child]
+                    if active_length >= edge_length:
+                        # Skip/count trick
+                        active_edge += edge_length
+                        active_length -= edge_length
+                        active_node = child
+                        continue
+                    if s[edge_start[child] + active_length] == c:
+                        active_length += 1
+                        if waiting_for_link > 0:
+                            link[waiting_for_link] = active_node
+                        break
+
+                    # Split edge into active_node -> middle -> child
+                    split_at = edge_start[child] + active_length
+                    middle = self.node_count
+                    self.node_count += 1
+                    edge_start[middle] = edge_start[child]
+                    edge_end[middle] = split_at
+                    parents[middle] = active_node
+                    next_sibling[middle] = next_sibling[child]
+                    if first_child[active_node] == child:
+                        first_child[active_node] = middle
+                    else:
+                        prev = first_child[active_node]
+                        while next_sibling[prev] != child:
+                            prev = next_sibling[prev]
+                        next_sibling[prev] = middle
+                    edge_start[child] = split_at
+                    parents[child] = middle
+                    next_sibling[child] = -1
+                    first_child[middle] = child
+                    self._new_node(middle, i, leaf_end)
+
+                    if waiting_for_link > 0:
+                        link[waiting_for_link] = middle
+                    waiting_for_link = middle
+
+                remainder -= 1
+                if active_node == 0 and active_length:
+                    active_length -= 1
+                    active_edge = i - remainder + 1
+                else:
+                    active_node = link[active_node]
+
+        self.active_node = active_node
+        self.active_edge = active_edge
+        self.active_length = active_length
+        self.remainder = remainder
+
+    def __len__(self):
+        return self.node_count
+
+    def children(self, node):
+        child = self.first_child[node]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+
+    def child(self, node, c):
+        """Child whose edge label starts with `c` or None"""
+        child = self.first_child[node]
+        while child != -1:
+            if self.s[self.edge_start[child]] == c:
+                return child
+            child = self.next_sibling[child]
+        return None
+
+    def is_leaf(self, node):
+        return self.first_child[node] == -1
+
+    def parent(self, node):
+        """Parent of the node, None for root"""
+        parent = self.parents[node]
+        return parent if parent != -1 else None
+
+    def suffix_link(self, node):
+        """If node represents string x, suffix link points to node representing x[1:]"""
+        return self.link[node]
+
+    def edge_label_range(self, node):
+        return self.edge_start[node], self.edge_end[node]
+
+    def edge_label(self, node):
+        start, end = self.edge_label_range(node)
+        return self.s[start:end]
+
+    def edge_length(self, node):
+        start, end = self.edge_label_range(node)
+        return end - start
+
+    def path_labels(self, node):
+        """Edge labels from root to the node"""
+        result = []
+        while node != self.root:
+            result.append(self.edge_label(node))
+            node = self.parents[node]
+        return list(reversed(result))
+
+    def cursor(self, node=root):
+        return SuffixTreeCursor(self, node)
+
+    def root_position(self):
+        return CompactPosition(self, self.root)
+
+    def traverse(self, position, s):
+        """Same as traverse, returns new CompactPosition or None"""
+        node, edge, offset = position.node, position.edge, position.offset
+        text = self.s
+        for c in s:
+            if edge is None:
+                edge = self.child(node, c)
+                if edge is None:
+                    return None
+                offset = 0
+            if c != text[self.edge_start[edge] + offset]:
+                return None
+            offset += 1
+            if offset == self.edge_length(edge):
+                node, edge = edge, None
+        return CompactPosition(self, node, edge, offset)
+
+    def snapshot(self):
+        """Tree with final edge_end of every node, this one is never changed"""
+        return self
+
+class IncrementalSuffixTree(CompactSuffixTree):
+    """
+    CompactSuffixTree which grows with extend() without rebuilding.
+    Ukkonen state (active point, remainder) is kept between calls, leaves are
+    open: their edge_end is OPEN_END and the actual end, len(s), is substituted
+    by edge_label_range. Until a unique symbol is appended, suffixes which occur
+    elsewhere are implicit and don't end in leaves, but traverse works at any moment.
+    Symbols are stored in a list, so edge labels are lists as well.
+    """
+    __slots__ = ()
+
+    # Largest value of array('l'), C long is 32-bit on Windows and 32-bit builds,
+    # array has no 'q' typecode in Python 2
+    OPEN_END = (1 << (8 * array.array('l').itemsize - 1)) - 1
+
+    def __init__(self, chars=()):
+        self.s = []
+        self._init_arrays('l')
+        self.extend(chars)
+
+    def extend(self, chars):
+        begin = len(self.s)
+        self.s.extend(chars)
+        if len(self.s) > begin:
+            self._reserve(2 * len(self.s) + 1)
+            self._extend(begin, len(self.s), self.OPEN_END)
+
+    def append(self, c):
+        self.extend((c,))
+
+    def edge_label_range(self, node):
+        return self.edge_start[node], min(self.edge_end[node], len(self.s))
+
+    def snapshot(self):
+        """Copy of the current tree as CompactSuffixTree with closed leaves"""
+        tree = CompactSuffixTree.__new__(CompactSuffixTree)
+        tree.s = list(self.s)
+        tree.node_count = self.node_count
+        for name in ('edge_start', 'edge_end', 'first_child', 'next_sibling', 'link', 'parents'):
+            setattr(tree, name, getattr(self, name)[:self.node_count])
+        n = len(self.s)
+        edge_end = tree.edge_end
+        for node in xrange(1, self.node_count):
+            if edge_end[node] > n:
+                edge_end[node] = n
+        return tree
+
+class SuffixTreeCursor(object):
+    """
+    Node of CompactSuffixTree with the navigation of Node/Edge objects:
+    the edge coming into the node is labeled with s[start:end] of edge_label_range()
+    """
+    __slots__ = ('tree', 'node')
+
+    def __init__(self, tree, node):
+        self.tree = tree
+        self.node = node
+
+    def __eq__(self, other):
+        return isinstance(other, SuffixTreeCursor) and self.tree is other.tree and self.node == other.node
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.node)
+
+    def __repr__(self):
+        return 'SuffixTreeCursor(%d)' % self.node
+
+    def root(self):
+        return SuffixTreeCursor(self.tree, self.tree.root)
+
+    def child(self, c):
+        """Cursor of the child whose edge starts with `c` or None"""
+        child = self.tree.child(self.node, c)
+        return SuffixTreeCursor(self.tree, child) if child is not None else None
+
+    def children(self):
+        return [SuffixTreeCursor(self.tree, child) for child in self.tree.children(self.node)]
+
+    def parent(self):
+        parent = self.tree.parent(self.node)
+        return SuffixTreeCursor(self.tree, parent) if parent is not None else None
+
+    def suffix_link(self):
+        return SuffixTreeCursor(self.tree, self.tree.suffix_link(self.node))
+
+    def edge_label_range(self):
+        return self.tree.edge_label_range(self.node)
+
+    def edge_label(self):
+        return self.tree.edge_label(self.node)
+
+    def is_leaf(self):
+        return self.tree.is_leaf(self.node)
+
+    def position(self):
+        """CompactPosition at the node, to be used with traverse"""
+        return CompactPosition(self.tree, self.node)
+
+class SuffixTreeStats(object):
+    """
+    Statistics of every node of CompactSuffixTree collected in one traversal
+    without recursion. The last symbol of the string must be unique, so that
+    every suffix ends in a leaf.
+    depth[v] - length of the string spelled on the path from root to v
+    leaf_count[v] - number of occurrences of that string
+    leftmost[v] - position of its first occurrence
+    suffix_array, lcp - suffix array and lcp (in lcp_kasai layout) of the string
+    """
+    def __init__(self, tree):
+        self.tree = tree = tree.snapshot()
+        n = len(tree.s)
+        typecode = tree.edge_start.typecode
+        edge_start = tree.edge_start
+        edge_end = tree.edge_end
+        first_child = tree.first_child
+        next_sibling = tree.next_sibling
+        parents = tree.parents
+
+        self.depth = depth = array.array(typecode, [0]) * len(tree)
+        self.leaf_count = leaf_count = array.array(typecode, [0]) * len(tree)
+        self.leftmost = leftmost = array.array(typecode, [n]) * len(tree)
+        self.suffix_array = array.array(typecode)
+        self.lcp = array.array(typecode)
+
+        # Top-down in lexicographic order: depths and leaves
+        order = array.array(typecode)
+        stack = [tree.root]
+        after_leaf = False
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if after_leaf:
+                # The previous leaf and the first leaf under `node` meet at its parent
+                self.lcp.append(depth[parents[node]])
+                after_leaf = False
+            child = first_child[node]
+            if child == -1:
+                if node != tree.root:
+                    leaf_count[node] = 1
+                    leftmost[node] = n - depth[node]
+                    self.suffix_array.append(leftmost[node])
+                    after_leaf = True
+                continue
+            children = []
+            while child != -1:
+                depth[child] = depth[node] + edge_end[child] - edge_start[child]
+                children.append(child)
+                child = next_sibling[child]
+            children.reverse()
+            stack.extend(children)
+
+        # Bottom-up: occurrences
+        for node in reversed(order):
+            parent = parents[node]
+            if parent != -1:
+                leaf_count[parent] += leaf_count[node]
+                if leftmost[node] < leftmost[parent]:
+                    leftmost[parent] = leftmost[node]
+
+    def substring(self, node):
+        start = self.leftmost[node]
+        return self.tree.s[start:start + self.depth[node]]
+
+    def repeated_nodes(self):
+        """Internal nodes except root: strings which occur at least twice"""
+        tree = self.tree
+        return (node for node in xrange(1, len(tree)) if not tree.is_leaf(node))
+
+    def longest_repeated_substring(self):
+        """The leftmost one if there are several"""
+        best = best_key = None
+        for node in self.repeated_nodes():
+            key = (self.depth[node], -self.leftmost[node])
+            if best_key is None or key > best_key:
+                best, best_key = node, key
+        if best is None:
+            return self.tree.s[:0]
+        return self.substring(best)
+
+    def most_frequent_substrings(self, k, min_length=1):
+        """
+        Up to `k` (substring, occurrences) pairs among substrings which occur at least
+        twice, most frequent first. Every substring is extended while it occurs the same
+        number of times, longer ones go first among equally frequent ones.
+        """
+        nodes = (node for node in self.repeated_nodes() if self.depth[node] >= min_length)
+        best = heapq.nlargest(
+            k, nodes,
+            key=lambda node: (self.leaf_count[node], self.depth[node], -self.leftmost[node])
+        )
+        return [(self.substring(node), self.leaf_count[node]) for node in best]
+
+    def distinct_substrings(self):
+        """Number of distinct non-empty substrings of the string without its last symbol"""
+        tree = self.tree
+        # Every edge contributes its length, leaf edges include the unique last symbol
+        return sum(tree.edge_end) - sum(tree.edge_start) - self.leaf_count[tree.root]
@@ -0,0 +1,192 @@
+"""
+Substring search over a suffix array with LCP-LR binary search (Manber, Myers).
+
+Binary search over suffix array ranks (l, r) starts from virtual ranks -1 and
+len(text) and always probes m = l + (r - l) // 2, so every rank m is probed
+with the same l and r. llcp[m] and rlcp[m] store common prefixes of suffix m
+with suffixes l and r, which lets the search compare every pattern symbol
+at most once: O(len(pattern) + log(len(text))) per pattern.
+"""
+
+import array
+
+from algolib.suffix_array import buffer_view, has_negative_symbols, is_buffer, lcp_kasai, remap_alphabet, suffix_array, suffix_array_ext
+
+def lcp_lr(lcp):
+	"""Returns (llcp, rlcp) of len(lcp) + 1 elements"""
+	if suffix_array_ext is not None and is_buffer(lcp):
+		return suffix_array_ext.lcp_lr(lcp)
+	size = len(lcp) + 1
+	llcp = array.array('L', [0]) * size
+	rlcp = array.array('L', [0]) * size
+	# Post-order walk over the search intervals
+	results = []
+	stack = [(-1, size, False)]
+	while stack:
+		l, r, children_done = stack.pop()
+		if r - l == 1:
+			results.append(lcp[l] if l >= 0 and r < size else 0)
+			continue
+		m = l + (r - l) // 2
+		if not children_done:
+			stack.append((l, r, True))
+			stack.append((m, r, False))
+			stack.append((l, m, False))
+			continue
+		right = results.pop()
+		left = results.pop()
+		llcp[m] = left
+		rlcp[m] = right
+		results.append(min(left, right))
+	return llcp, rlcp
+
+def search_lcp_lr(text, suf_arr, llcp, rlcp, pattern, upper, path=None, shared=0):
+	"""
+	The first rank whose suffix is not less than `pattern`. With `upper` set,
+	suffixes which start with `pattern` are considered less than it.
+	path - list of steps (l, r, lp, rp) of the previous search, it's replaced
+	with steps of this one. Steps whose lp and rp are less than `shared`, the common
+	prefix of both patterns, compare the same way with this pattern, so
+	the search resumes from the last of them (lp and rp never decrease).
+	"""
+	if path is None:
+		path = []
+	keep = 0
+	while keep < len(path) and max(path[keep][2], path[keep][3]) < shared:
+		keep += 1
+	l, r, lp, rp = path[keep - 1] if keep else (-1, len(text), 0, 0)
+	del path[max(keep - 1, 0):]
+	while r - l > 1:
+		path.append((l, r, lp, rp))
+		m = l + (r - l) // 2
+		if lp >= rp:
+			if llcp[m] > lp:
+				l = m
+				continue
+			if llcp[m] < lp:
+				r, rp = m, llcp[m]
+				continue
+			matched = lp
+		else:
+			if rlcp[m] > rp:
+				r = m
+				continue
+			if rlcp[m] < rp:
+				l, lp = m, rlcp[m]
+				continue
+			matched = rp
+		pos = suf_arr[m]
+		while matched < len(pattern) and pos + matched < len(text) and text[pos + matched] == pattern[matched]:
+			matched += 1
+		if matched == len(pattern):
+			less = upper
+		elif pos + matched == len(text):
+			# End of text is larger than all symbols
+			less = False
+		else:
+			less = text[pos + matched] < pattern[matched]
+		if less:
+			l, lp = m, matched
+		else:
+			r, rp = m, matched
+	return r
+
+class TextIndex(object):
+	"""
+	Text with its suffix array, lcp and LCP-LR arrays.
+	Byte strings and buffers of non-negative integers are searched as is, other sequences are
+	remapped to integers, patterns are remapped the same way.
+	"""
+	def __init__(self, text, suf_arr=None, lcp=None):
+		self.text = text
+		self.codes = None
+		if not is_buffer(text) or has_negative_symbols(text):
+			alphabet = sorted(set(text))
+			self.codes = {c: i for (i, c) in enumerate(alphabet)}
+			text = remap_alphabet(text)
+		self.symbols = text
+		self.suffix_array = suffix_array(text) if suf_arr is None else suf_arr
+		self.lcp = lcp_kasai(text, self.suffix_array) if lcp is None else lcp
+		if suffix_array_ext is not None:
+			# Arrays loaded by index_file are searched without copying
+			self.suffix_array, self.lcp = buffer_view(self.suffix_array), buffer_view(self.lcp)
+		if len(text):
+			self.llcp, self.rlcp = lcp_lr(self.lcp)
+		else:
+			self.llcp, self.rlcp = array.array('L'), array.array('L')
+		if suffix_array_ext is not None and is_buffer(self.suffix_array):
+			# Native search needs the same item size of 4 or 8 bytes
+			if not self.suffix_array.itemsize == self.llcp.itemsize in (4, 8):
+				self.suffix_array, self.llcp, self.rlcp = [
+					array.array('L', arr) for arr in (self.suffix_array, self.llcp, self.rlcp)
+				]
+
+	def __len__(self):
+		return len(self.text)
+
+	def encode(self, pattern):
+		"""Pattern in terms of self.symbols or None if it has symbols not met in text"""
+		if self.codes is None:
+			if not is_buffer(pattern) and not isinstance(self.text, str):
+				return array.array('L', pattern)
+			return pattern
+		try:
+			return array.array('L', (self.codes[c] for c in pattern))
+		except KeyError:
+			return None
+
+	def find(self, pattern):
+		"""Range [begin, end) of suffix array ranks which start with `pattern`"""
+		return find_all(self, [pattern])[0]
+
+	def locate(self, pattern):
+		"""Sorted positions of all occurrences of `pattern`"""
+		begin, end = self.find(pattern)
+		return sorted(map(int, self.suffix_array[begin:end]))
+
+def find_all(text_index, patterns):
+	"""
+	Ranges [begin, end) of suffix array ranks which start with every pattern,
+	in the order of `patterns`. Patterns are sorted and the search of every one
+	resumes from the steps of the previous one which only depend on their common
+	prefix, see search_lcp_lr. Equal patterns are searched once.
+	Uses suffix_array_ext when text and patterns are buffers.
+	"""
+	encoded = [text_index.encode(pattern) for pattern in patterns]
+	found = [pattern for pattern in encoded if pattern is not None]
+	if (
+		suffix_array_ext is not None and is_buffer(text_index.symbols)
+		and is_buffer(text_index.suffix_array)
+		and all(is_buffer(pattern) and not has_negative_symbols(pattern) for pattern in found)
+	):
+		bounds = suffix_array_ext.find_all(
+			text_index.symbols, text_index.suffix_array, text_index.llcp, text_index.rlcp, found
+		)
+		ranges = iter(zip(bounds[::2], bounds[1::2]))
+	else:
+		ranges = iter(find_all_py(text_index, found))
+	return [(0, 0) if pattern is None else next(ranges) for pattern in encoded]
+
+def find_all_py(text_index, patterns):
+	"""Pure Python version of find_all for already encoded patterns"""
+	args = (text_index.symbols, text_index.suffix_array, text_index.llcp, text_index.rlcp)
+	result = [None] * len(patterns)
+	lower_path = []
+	prev = None
+	for i in sorted(xrange(len(patterns)), key=patterns.__getitem__):
+		pattern = patterns[i]
+		if prev is not None and patterns[prev] == pattern:
+			result[i] = result[prev]
+			continue
+		shared = 0
+		if prev is not None:
+			prev_pattern = patterns[prev]
+			size = min(len(prev_pattern), len(pattern))
+			while shared < size and prev_pattern[shared] == pattern[shared]:
+				shared += 1
+		begin = search_lcp_lr(*(args + (pattern, False, lower_path, shared)))
+		# Both searches take the same steps until a suffix matches the whole pattern
+		end = search_lcp_lr(*(args + (pattern, True, lower_path[:], len(pattern))))
+		result[i] = begin, end
+		prev = i
+	return result
@@ -0,0 +1,67 @@
+
+import argparse
+import collections
+import os
+import sys
+
+from algolib.benchmark import *
+
+def run_command(args):
+	benchmarks = [BENCHMARKS[name] for name in (args.benchmark or BENCHMARKS)]
+	corpora = collections.OrderedDict((name, CORPORA[name]) for name in (args.corpus or CORPORA))
+	for path in args.file or ():
+		corpora[os.path.basename(path)] = file_corpus(path)
+	sizes = [parse_size(size) for size in (args.size or DEFAULT_SIZES)]
+	log = lambda line: sys.stderr.write(line + '\n')
+	results = run_benchmarks(benchmarks, corpora, sizes, repeat=args.repeat, fork=not args.no_fork, log=log)
+	if args.output:
+		save_results(args.output, results)
+	return 1 if any('error' in result for result in results) else 0
+
+def compare_command(args):
+	comparison = compare_results(load_results(args.base), load_results(args.new), threshold=args.threshold)
+	for item in comparison:
+		print format_comparison(item)
+	regressions = sum(1 for item in comparison if item[3])
+	print '%d of %d results regressed by more than %.0f%%' % (regressions, len(comparison), 100 * args.threshold)
+	return 1 if regressions else 0
+
+def list_command(args):
+	print 'Benchmarks (max size, available):'
+	for benchmark in BENCHMARKS.itervalues():
+		print '  %-24s %6s %s' % (benchmark.name, format_size(benchmark.max_size), 'yes' if benchmark.available() else 'no')
+	print 'Corpora:', ' '.join(CORPORA)
+	print 'Sizes:', ' '.join(ALL_SIZES), '(default: %s)' % ' '.join(DEFAULT_SIZES)
+	return 0
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Benchmarks of algolib on generated corpora')
+	subparsers = parser.add_subparsers()
+
+	run_parser = subparsers.add_parser('run', help='Run benchmarks, print results to stderr')
+	run_parser.add_argument('-b', '--benchmark', action='append', choices=list(BENCHMARKS), help='Benchmark to run, all by default')
+	run_parser.add_argument('-c', '--corpus', action='append', choices=list(CORPORA), help='Corpus to use, all by default')
+	run_parser.add_argument('-f', '--file', action='append', help='Use a text file as an extra corpus')
+	run_parser.add_argument('-s', '--size', action='append', help='Corpus size like 1K, 10M, 100M')
+	run_parser.add_argument(
+		'-r', '--repeat', type=int, default=DEFAULT_REPEAT,
+		help='Report the best time of that many runs, %d by default' % DEFAULT_REPEAT
+	)
+	run_parser.add_argument('-o', '--output', help='Write results to this JSON file')
+	run_parser.add_argument('--no-fork', action='store_true', help='Run all benchmarks in this process')
+	run_parser.set_defaults(command=run_command)
+
+	compare_parser = subparsers.add_parser('compare', help='Compare two JSON result files')
+	compare_parser.add_argument('base')
+	compare_parser.add_argument('new')
+	compare_parser.add_argument(
+		'-t', '--threshold', type=float, default=0.1,
+		help='Flag time or peak RSS which grew by more than this fraction, 0.1 by default'
+	)
+	compare_parser.set_defaults(command=compare_command)
+
+	list_parser = subparsers.add_parser('list', help='List benchmarks and corpora')
+	list_parser.set_defaults(command=list_command)
+
+	args = parser.parse_args()
+	sys.exit(args.command(args))
@@ -1,61 +1,46 @@
 
+import argparse
+import errno
 import sys
-from suffix_array import suffix_array_ks_ext
 
-def bwt_naive(arr):
-	arrays = sorted([arr[i:] + arr[:i] for i in xrange(len(arr))])
-	return [array[-1] for array in arrays]
-
-def bwt(arr):
-	suf_arr = suffix_array_ks_ext(arr)
-	result = [None] * len(arr)
-	for i, pos in enumerate(suf_arr):
-		result[i] = arr[(pos + len(arr) - 1) % len(arr)]
-	return result
-
-def ibwt_string(s, dollar_sign='\xff'):
-	result = ibwt(map(ord, s), ord(dollar_sign))
-	return ''.join(map(chr, result))
-
-def ibwt(arr, dollar_marker):
-	if not arr:
-		return []
-
-	# occ[elem] - number of occurences of elem in arr thus far.
-	occ = [0]
-
-	# rank[i] = arr[:i].count(arr[i])
-	rank = [None] * len(arr)
-
-	dollar_marker_pos = None
-
-	for i, elem in enumerate(arr):
-		while len(occ) <= elem:
-			occ.extend([0] * len(occ))
-		rank[i] = occ[elem]
-		occ[elem] += 1
-
-		if elem == dollar_marker:
-			dollar_marker_pos = i
-
-	first_pos = [0] * len(occ)
-	for i in xrange(1, len(occ)):
-		first_pos[i] = first_pos[i - 1] + occ[i - 1]
-
-	if dollar_marker_pos is None:
-		raise ValueError("No dollar marker found")
-
-	result = [None] * len(arr)
-
-	current_pos = dollar_marker_pos
-
-	for writer_pos in xrange(len(arr) - 1, -1, -1):
-		result[writer_pos] = arr[current_pos]
-		current_pos = first_pos[arr[current_pos]] + rank[current_pos]
-
-	return result
+from algolib.bwt import *
+from algolib.compression import default_stages
 
 if __name__ == '__main__':
-	data = sys.stdin.read()
-	bwt_data = bwt(data)
-	sys.stdout.write(''.join(bwt_data))
+	parser = argparse.ArgumentParser(description='Burrows-Wheeler transform of stdin')
+	parser.add_argument(
+		'-b', '--block-size', type=int,
+		help='Transform input in blocks of given size and write them in framed format. '
+		'By default the whole input is transformed at once.'
+	)
+	parser.add_argument('-i', '--inverse', action='store_true', help='Inverse BWT transform of framed input')
+	parser.add_argument(
+		'-z', '--compress', action='store_true',
+		help='Apply move-to-front, zero run length and Huffman coding to every block'
+	)
+	parser.add_argument(
+		'-j', '--jobs', type=int,
+		help='Number of blocks transformed concurrently, defaults to the number of CPUs'
+	)
+	args = parser.parse_args()
+	if args.compress and args.block_size is None:
+		parser.error('-z/--compress requires -b/--block-size')
+	if args.jobs is not None and args.block_size is None and not args.inverse:
+		parser.error('-j/--jobs requires -b/--block-size or -i/--inverse')
+
+	try:
+		if args.inverse:
+			BlockCompressor(threads=args.jobs).decompress(sys.stdin, sys.stdout)
+		elif args.block_size is not None:
+			stages = default_stages() if args.compress else ()
+			BlockCompressor(args.block_size, threads=args.jobs, stages=stages).compress(sys.stdin, sys.stdout)
+		else:
+			data = sys.stdin.read()
+			sys.stdout.write(bwt_string(data))
+		sys.stdout.flush()
+	except IOError as e:
+		# Reader has gone away, e.g. we are piped into `head`
+		if e.errno != errno.EPIPE:
+			raise
+	except ValueError as e:
+		sys.exit('bwt.py: %s' % e)
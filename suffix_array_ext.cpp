@@ -1,4 +1,3 @@
-
 #include <Python.h>
 
 #include <vector>
@@ -6,6 +5,8 @@
 #include <tuple>
 #include <limits>
 #include <algorithm>
+#include <cstring>
+#include <type_traits>
 
 template <class It, class OutIt, class KeyFunc>
 void CountingSort(It first, It last, OutIt out, size_t maxKey, KeyFunc&& keyFunc) {
@@ -24,26 +25,28 @@ void CountingSort(It first, It last, OutIt out, size_t maxKey, KeyFunc&& keyFunc
 	}
 }
 
-template <class T>
-std::vector<T> SuffixArrayKS(const std::vector<T>& arr, T maxElem) {
-	std::vector<T> rem0, rem12;
-	rem0.reserve(1 + arr.size() / 3);
-	rem12.reserve(2 * arr.size() / 3);
-	for (size_t i = 0; i < arr.size(); i += 3)
+// Computes suffix array of arr[0:size] into result[0:size].
+// Symbols must not exceed maxElem, TIndex must be able to hold maxElem + size + 2.
+template <class TIndex, class TSymbol>
+void SuffixArrayKS(const TSymbol* arr, size_t size, size_t maxElem, TIndex* result) {
+	std::vector<TIndex> rem0, rem12;
+	rem0.reserve(1 + size / 3);
+	rem12.reserve(2 * size / 3);
+	for (size_t i = 0; i < size; i += 3)
 		rem0.push_back(i);
-	for (size_t i = 1; i < arr.size(); i += 3)
+	for (size_t i = 1; i < size; i += 3)
 		rem12.push_back(i);
-	for (size_t i = 2; i < arr.size(); i += 3)
+	for (size_t i = 2; i < size; i += 3)
 		rem12.push_back(i);
 
-	auto getElem = [maxElem, &arr] (size_t pos) -> T {
-		if (pos < arr.size())
+	auto getElem = [maxElem, arr, size] (size_t pos) -> TIndex {
+		if (pos < size)
 			return arr[pos];
 		return maxElem + 1;
 	};
 
 	{
-		std::vector<T> tmp(rem12.size());
+		std::vector<TIndex> tmp(rem12.size());
 		for (ssize_t col = 2; col >= 0; --col) {
 			CountingSort(rem12.begin(), rem12.end(), tmp.begin(), maxElem + 1, [&getElem, col] (size_t pos) -> size_t {
 				return getElem(pos + col);
@@ -52,14 +55,14 @@ std::vector<T> SuffixArrayKS(const std::vector<T>& arr, T maxElem) {
 		}
 	}
 
-	using TTriple = std::array<T, 3>;
+	using TTriple = std::array<TIndex, 3>;
 	TTriple prevTriple;
-	std::vector<T> positionToRank(arr.size(), -1);
-	T dollarRank;
+	std::vector<TIndex> positionToRank(size, -1);
+	TIndex dollarRank;
 	{
 		size_t rank = 0;
 		bool first = true;
-		for (T pos : rem12) {
+		for (TIndex pos : rem12) {
 			TTriple triple{getElem(pos), getElem(pos + 1), getElem(pos + 2)};
 			if (!first && triple != prevTriple) {
 				++rank;
@@ -71,19 +74,20 @@ std::vector<T> SuffixArrayKS(const std::vector<T>& arr, T maxElem) {
 		dollarRank = rank + 1;
 
 		if (dollarRank < rem12.size()) {
-			std::vector<T> symbols;
+			std::vector<TIndex> symbols;
 			symbols.reserve(rem12.size() + 1);
-			for (T i = 1; i < arr.size(); i += 3)
+			for (TIndex i = 1; i < size; i += 3)
 				symbols.push_back(positionToRank[i]);
-			T dollarRankPos = symbols.size();
+			TIndex dollarRankPos = symbols.size();
 			symbols.push_back(dollarRank);
-			for (T i = 2; i < arr.size(); i += 3)
+			for (TIndex i = 2; i < size; i += 3)
 				symbols.push_back(positionToRank[i]);
-			auto rankToPos = SuffixArrayKS(symbols, dollarRank);
+			std::vector<TIndex> rankToPos(symbols.size());
+			SuffixArrayKS(symbols.data(), symbols.size(), dollarRank, rankToPos.data());
 
-			for(T rank = 0; rank < rankToPos.size(); ++rank) {
-				T pos = rankToPos[rank];
-				T arrPos;
+			for(TIndex rank = 0; rank < rankToPos.size(); ++rank) {
+				TIndex pos = rankToPos[rank];
+				TIndex arrPos;
 				if (pos < dollarRankPos)
 					arrPos = 1 + pos * 3;
 				else if (pos > dollarRankPos)
@@ -97,32 +101,29 @@ std::vector<T> SuffixArrayKS(const std::vector<T>& arr, T maxElem) {
 		}
 	}
 
-	auto getRank = [dollarRank, &positionToRank] (T pos) {
+	auto getRank = [dollarRank, &positionToRank] (TIndex pos) {
 		if (pos < positionToRank.size())
 			return positionToRank[pos];
 		return dollarRank;
 	};
 
 	{
-		std::vector<T> tmp(rem0.size());
-		CountingSort(rem0.begin(), rem0.end(), tmp.begin(), dollarRank, [&getRank] (T pos) {
+		std::vector<TIndex> tmp(rem0.size());
+		CountingSort(rem0.begin(), rem0.end(), tmp.begin(), dollarRank, [&getRank] (TIndex pos) {
 			return getRank(pos + 1);
 		});
 		std::swap(rem0, tmp);
-		CountingSort(rem0.begin(), rem0.end(), tmp.begin(), maxElem, [&getElem] (T pos) {
+		CountingSort(rem0.begin(), rem0.end(), tmp.begin(), maxElem, [&getElem] (TIndex pos) {
 			return getElem(pos);
 		});
 		std::swap(rem0, tmp);
 	}
 
-	std::vector<T> result;
-	result.reserve(arr.size());
-
 	{
-		size_t ind0 = 0, ind12 = 0;
+		size_t ind0 = 0, ind12 = 0, written = 0;
 		while (ind0 < rem0.size() && ind12 < rem12.size()) {
-			T pos0 = rem0[ind0];
-			T pos12 = rem12[ind12];
+			TIndex pos0 = rem0[ind0];
+			TIndex pos12 = rem12[ind12];
 			bool isLess;
 			if (pos12 % 3 == 1) {
 				isLess = (
@@ -136,23 +137,197 @@ std::vector<T> SuffixArrayKS(const std::vector<T>& arr, T maxElem) {
 				);
 			}
 			if (isLess) {
-				result.push_back(rem0[ind0++]);
+				result[written++] = rem0[ind0++];
 			} else {
-				result.push_back(rem12[ind12++]);
+				result[written++] = rem12[ind12++];
 			}
 		}
 
 		while (ind0 < rem0.size())
-			result.push_back(rem0[ind0++]);
+			result[written++] = rem0[ind0++];
 
 		while (ind12 < rem12.size())
-			result.push_back(rem12[ind12++]);
-
+			result[written++] = rem12[ind12++];
 	}
+}
 
+template <class T>
+std::vector<T> SuffixArrayKS(const std::vector<T>& arr, T maxElem) {
+	std::vector<T> result(arr.size());
+	SuffixArrayKS(arr.data(), arr.size(), maxElem, result.data());
 	return result;
 }
 
+/*
+SA-IS (Nong, Zhang, Chan) induced sorting suffix array construction.
+
+Classic SA-IS sorts suffixes as if the string ended with a unique smallest
+sentinel, while here the sentinel is the largest symbol (like in SuffixArrayKS).
+Complementing symbols (c -> maxElem - c) turns one order into exactly the
+reverse of the other, so we sort the complemented string and reverse the result.
+
+Besides the result array only the L/S type bitmap and the buckets are allocated:
+reduced strings and their suffix arrays of recursive calls live inside `sa`.
+*/
+template <class T>
+struct TArrayChar {
+	const T* Arr;
+
+	size_t operator()(size_t pos) const {
+		return Arr[pos];
+	}
+};
+
+template <class TIndex, class TGetChar>
+void GetBuckets(TGetChar&& getChar, size_t size, std::vector<TIndex>& buckets, bool bucketEnds) {
+	std::fill(buckets.begin(), buckets.end(), 0);
+	for (size_t i = 0; i < size; ++i)
+		++buckets[getChar(i)];
+	TIndex sum = 0;
+	for (size_t i = 0; i < buckets.size(); ++i) {
+		sum += buckets[i];
+		buckets[i] = bucketEnds ? sum : sum - buckets[i];
+	}
+}
+
+template <class TIndex, class TGetChar>
+void InduceSAIS(TGetChar&& getChar, const std::vector<bool>& isS, size_t size, std::vector<TIndex>& buckets, TIndex* sa) {
+	const TIndex empty = std::numeric_limits<TIndex>::max();
+	// Virtual sentinel is the smallest suffix, it induces the last position which is always L
+	GetBuckets(getChar, size, buckets, false);
+	sa[buckets[getChar(size - 1)]++] = size - 1;
+	for (size_t i = 0; i < size; ++i) {
+		if (sa[i] != empty && sa[i] > 0 && !isS[sa[i] - 1])
+			sa[buckets[getChar(sa[i] - 1)]++] = sa[i] - 1;
+	}
+	GetBuckets(getChar, size, buckets, true);
+	for (size_t i = size; i-- > 0;) {
+		if (sa[i] != empty && sa[i] > 0 && isS[sa[i] - 1])
+			sa[--buckets[getChar(sa[i] - 1)]] = sa[i] - 1;
+	}
+}
+
+template <class TIndex, class TGetChar>
+void SuffixArraySAISHelper(TGetChar&& getChar, size_t size, size_t alphabetSize, TIndex* sa) {
+	const TIndex empty = std::numeric_limits<TIndex>::max();
+	if (size == 1) {
+		sa[0] = 0;
+		return;
+	}
+
+	// Position before the sentinel is always L
+	std::vector<bool> isS(size, false);
+	for (size_t i = size - 1; i-- > 0;) {
+		auto c = getChar(i), next = getChar(i + 1);
+		isS[i] = c < next || (c == next && isS[i + 1]);
+	}
+	auto isLMS = [&isS] (size_t pos) {
+		return pos > 0 && isS[pos] && !isS[pos - 1];
+	};
+
+	// Stage 1: sort LMS substrings
+	std::vector<TIndex> buckets(alphabetSize);
+	GetBuckets(getChar, size, buckets, true);
+	std::fill(sa, sa + size, empty);
+	for (size_t i = 1; i < size; ++i) {
+		if (isLMS(i))
+			sa[--buckets[getChar(i)]] = i;
+	}
+	InduceSAIS(getChar, isS, size, buckets, sa);
+
+	size_t lmsCount = 0;
+	for (size_t i = 0; i < size; ++i) {
+		if (isLMS(sa[i]))
+			sa[lmsCount++] = sa[i];
+	}
+
+	// Name LMS substrings. LMS positions are at least 2 apart,
+	// so names fit into sa[lmsCount + pos / 2] without collisions.
+	std::fill(sa + lmsCount, sa + size, empty);
+	size_t names = 0;
+	size_t prev = empty;
+	for (size_t i = 0; i < lmsCount; ++i) {
+		size_t pos = sa[i];
+		bool diff = false;
+		for (size_t d = 0; ; ++d) {
+			// Substring that reaches the sentinel is unique
+			if (prev == empty || pos + d == size || prev + d == size ||
+				getChar(pos + d) != getChar(prev + d) || isS[pos + d] != isS[prev + d]) {
+				diff = true;
+				break;
+			}
+			if (d > 0 && (isLMS(pos + d) || isLMS(prev + d)))
+				break;
+		}
+		if (diff) {
+			++names;
+			prev = pos;
+		}
+		sa[lmsCount + pos / 2] = names - 1;
+	}
+	for (size_t i = size, j = size; i-- > lmsCount;) {
+		if (sa[i] != empty)
+			sa[--j] = sa[i];
+	}
+
+	// Stage 2: sort LMS suffixes by sorting the reduced string
+	TIndex* reduced = sa + size - lmsCount;
+	if (names < lmsCount) {
+		SuffixArraySAISHelper(TArrayChar<TIndex>{reduced}, lmsCount, names, sa);
+	} else {
+		for (size_t i = 0; i < lmsCount; ++i)
+			sa[reduced[i]] = i;
+	}
+
+	// Stage 3: induce all suffixes from sorted LMS suffixes
+	for (size_t i = 1, j = 0; i < size; ++i) {
+		if (isLMS(i))
+			reduced[j++] = i;
+	}
+	for (size_t i = 0; i < lmsCount; ++i)
+		sa[i] = reduced[sa[i]];
+	std::fill(sa + lmsCount, sa + size, empty);
+	GetBuckets(getChar, size, buckets, true);
+	for (size_t i = lmsCount; i-- > 0;) {
+		TIndex pos = sa[i];
+		sa[i] = empty;
+		sa[--buckets[getChar(pos)]] = pos;
+	}
+	InduceSAIS(getChar, isS, size, buckets, sa);
+}
+
+template <class TIndex, class TSymbol>
+void SuffixArraySAIS(const TSymbol* arr, size_t size, size_t maxElem, TIndex* result) {
+	if (!size)
+		return;
+	SuffixArraySAISHelper([arr, maxElem] (size_t pos) -> size_t {
+		return maxElem - arr[pos];
+	}, size, maxElem + 1, result);
+	std::reverse(result, result + size);
+}
+
+struct TKSAlgorithm {
+	template <class TIndex, class TSymbol>
+	static void Run(const TSymbol* arr, size_t size, size_t maxElem, TIndex* result) {
+		SuffixArrayKS(arr, size, maxElem, result);
+	}
+};
+
+struct TSAISAlgorithm {
+	template <class TIndex, class TSymbol>
+	static void Run(const TSymbol* arr, size_t size, size_t maxElem, TIndex* result) {
+		SuffixArraySAIS(arr, size, maxElem, result);
+	}
+};
+
+template <class TSymbol>
+size_t MaxElement(const TSymbol* arr, size_t size) {
+	TSymbol maxElem = 0;
+	for (size_t i = 0; i < size; ++i)
+		maxElem = std::max(maxElem, arr[i]);
+	return maxElem;
+}
+
 class TPyErr : public std::exception {};
 
 template <class NumT>
@@ -183,98 +358,2197 @@ PyObject* SequenceToPyList(size_t size, TSeqGen&& seqGen) {
 	return pyResult;
 }
 
+/*
+Contiguous array of unsigned integers exported by a Python object.
+
+New-style buffers (str, bytearray, memoryview, numpy arrays) are preferred.
+array.array on Python 2 only implements the old buffer protocol, so for it
+we fall back to PyObject_AsReadBuffer and take element size from `itemsize`.
+Note that the old protocol does not lock the object: it must not be resized
+while the view is alive.
+*/
+class TBufferView {
+public:
+	TBufferView() = default;
+	TBufferView(const TBufferView&) = delete;
+	TBufferView& operator=(const TBufferView&) = delete;
+
+	~TBufferView() {
+		Release();
+	}
+
+	void Release() {
+		if (HasView)
+			PyBuffer_Release(&View);
+		HasView = false;
+		Signed = false;
+		Py_CLEAR(Obj);
+		Data = nullptr;
+		Size = 0;
+	}
+
+	// Returns false and sets Python error on failure
+	bool Acquire(PyObject* obj, bool writable) {
+		if (PyUnicode_Check(obj)) {
+			PyErr_Format(PyExc_TypeError, "unicode objects must be encoded or remapped first");
+			return false;
+		}
+		int flags = PyBUF_ND | PyBUF_FORMAT | (writable ? PyBUF_WRITABLE : 0);
+		if (PyObject_CheckBuffer(obj) && PyObject_GetBuffer(obj, &View, flags) == 0) {
+			HasView = true;
+			Data = View.buf;
+			ItemSize = View.itemsize;
+			if (View.ndim > 1) {
+				PyErr_Format(PyExc_ValueError, "buffer must be one-dimensional");
+				return false;
+			}
+			if (!CheckFormat(View.format))
+				return false;
+			return SetSize(View.len) && (writable || CheckNonNegative());
+		}
+		if (PyErr_Occurred())
+			return false;
+
+		Py_ssize_t len;
+		if (writable) {
+			void* ptr;
+			if (PyObject_AsWriteBuffer(obj, &ptr, &len) != 0)
+				return false;
+			Data = ptr;
+		} else {
+			const void* ptr;
+			if (PyObject_AsReadBuffer(obj, &ptr, &len) != 0)
+				return false;
+			Data = const_cast<void*>(ptr);
+		}
+		Py_INCREF(obj);
+		Obj = obj;
+
+		PyObject* typeCode = PyObject_GetAttrString(obj, "typecode");
+		if (typeCode) {
+			bool ok = PyString_Check(typeCode) && CheckFormat(PyString_AS_STRING(typeCode));
+			Py_DECREF(typeCode);
+			if (!ok) {
+				if (!PyErr_Occurred())
+					PyErr_Format(PyExc_TypeError, "unsupported array typecode");
+				return false;
+			}
+		} else {
+			PyErr_Clear();
+		}
+		PyObject* itemSize = PyObject_GetAttrString(obj, "itemsize");
+		if (itemSize) {
+			ItemSize = PyInt_AsSsize_t(itemSize);
+			Py_DECREF(itemSize);
+			if (ItemSize == -1 && PyErr_Occurred())
+				return false;
+		} else {
+			PyErr_Clear();
+			ItemSize = 1;
+		}
+		return SetSize(len) && (writable || CheckNonNegative());
+	}
+
+	void* Data = nullptr;
+	size_t ItemSize = 1;
+	size_t Size = 0;
+
+private:
+	bool CheckFormat(const char* format) {
+		if (!format)
+			return true;
+		if (*format == '@' || *format == '=' || *format == '<')
+			++format;
+		if (!format[0] || format[1] || !strchr("cbBhHiIlLqQ", format[0])) {
+			PyErr_Format(PyExc_TypeError, "buffer must contain integers, got format '%s'", format);
+			return false;
+		}
+		Signed = strchr("bhilq", format[0]) != nullptr;
+		return true;
+	}
+
+	// Signed items are read as unsigned ones of the same size, which keeps
+	// the order of non-negative values only
+	bool CheckNonNegative() {
+		if (!Signed)
+			return true;
+		bool negative = false;
+		VisitSigned([&] (auto data) {
+			negative = std::any_of(data, data + Size, [] (auto value) {
+				return value < 0;
+			});
+		});
+		if (negative) {
+			PyErr_Format(PyExc_TypeError, "buffer contains negative integers, remap them to unsigned ones first");
+			return false;
+		}
+		return true;
+	}
+
+	template <class TFunc>
+	void VisitSigned(TFunc&& func) const {
+		switch (ItemSize) {
+		case 1:
+			func(static_cast<const int8_t*>(Data));
+			break;
+		case 2:
+			func(static_cast<const int16_t*>(Data));
+			break;
+		case 4:
+			func(static_cast<const int32_t*>(Data));
+			break;
+		default:
+			func(static_cast<const int64_t*>(Data));
+			break;
+		}
+	}
+
+	bool SetSize(Py_ssize_t len) {
+		if (ItemSize != 1 && ItemSize != 2 && ItemSize != 4 && ItemSize != 8) {
+			PyErr_Format(PyExc_TypeError, "unsupported item size %zu", ItemSize);
+			return false;
+		}
+		Size = len / ItemSize;
+		return true;
+	}
+
+	PyObject* Obj = nullptr;
+	Py_buffer View;
+	bool HasView = false;
+	bool Signed = false;
+};
+
+// Calls func with buffer data reinterpreted as a pointer to unsigned integers of buffer item size
+template <class TFunc>
+void VisitSymbols(const TBufferView& view, TFunc&& func) {
+	switch (view.ItemSize) {
+	case 1:
+		func(static_cast<const uint8_t*>(view.Data));
+		break;
+	case 2:
+		func(static_cast<const uint16_t*>(view.Data));
+		break;
+	case 4:
+		func(static_cast<const uint32_t*>(view.Data));
+		break;
+	default:
+		func(static_cast<const uint64_t*>(view.Data));
+		break;
+	}
+}
+
 template <class T>
-PyObject* py_suffix_array_ks_helper(PyObject* m, PyObject* pyArr) {
-	if (!PyList_Check(pyArr)) {
-		return PyErr_Format(PyExc_TypeError, "arr must be of type list");
+struct TTypeCode;
+
+template <>
+struct TTypeCode<uint8_t> {
+	static constexpr const char* Value = "B";
+};
+
+template <>
+struct TTypeCode<uint16_t> {
+	static constexpr const char* Value = "H";
+};
+
+template <>
+struct TTypeCode<uint32_t> {
+	static_assert(sizeof(unsigned int) == 4, "array typecode 'I' must be 32-bit");
+	static constexpr const char* Value = "I";
+};
+
+template <>
+struct TTypeCode<uint64_t> {
+	static_assert(sizeof(unsigned long) == 8, "array typecode 'L' must be 64-bit");
+	static constexpr const char* Value = "L";
+};
+
+// Creates array.array of `size` zeros, element type is T
+template <class T>
+PyObject* NewTypedArray(size_t size) {
+	PyObject* arrayModule = PyImport_ImportModule("array");
+	if (!arrayModule)
+		return nullptr;
+	PyObject* single = PyObject_CallMethod(arrayModule, const_cast<char*>("array"), const_cast<char*>("s[i]"), TTypeCode<T>::Value, 0);
+	Py_DECREF(arrayModule);
+	if (!single)
+		return nullptr;
+	PyObject* result = PySequence_Repeat(single, size);
+	Py_DECREF(single);
+	return result;
+}
+
+// Index type must hold both positions and the dollar symbol
+template <class TIndex>
+bool FitsIndex(size_t size, size_t maxElem) {
+	return size + 2 < std::numeric_limits<TIndex>::max() && maxElem + 2 < std::numeric_limits<TIndex>::max();
+}
+
+// Counting sorts allocate maxElem buckets and the index type must hold maxElem,
+// so sparse alphabets (e.g. word ids or hashes) are compacted first
+bool NeedsCompaction(size_t size, size_t maxElem) {
+	return maxElem > std::max<size_t>(size, std::numeric_limits<uint16_t>::max());
+}
+
+// Largest symbol the algorithm will see after compaction
+size_t CompactMaxElement(size_t size, size_t maxElem) {
+	return NeedsCompaction(size, maxElem) ? size - 1 : maxElem;
+}
+
+// Calls func(symbols, maxElem) with arr itself or, if its alphabet is sparse, with ranks of
+// its symbols among distinct ones, stored in 16, 32 or 64 bit integers, whichever holds them
+template <class TSymbol, class TFunc>
+void WithCompactAlphabet(const TSymbol* arr, size_t size, size_t maxElem, TFunc&& func) {
+	if (!NeedsCompaction(size, maxElem)) {
+		func(arr, maxElem);
+		return;
 	}
+	std::vector<TSymbol> alphabet(arr, arr + size);
+	std::sort(alphabet.begin(), alphabet.end());
+	alphabet.erase(std::unique(alphabet.begin(), alphabet.end()), alphabet.end());
+	size_t distinct = alphabet.size();
+	auto remap = [&] (auto symbolTag) {
+		using TCompact = decltype(symbolTag);
+		std::vector<TCompact> compact(size);
+		for (size_t i = 0; i < size; ++i)
+			compact[i] = std::lower_bound(alphabet.begin(), alphabet.end(), arr[i]) - alphabet.begin();
+		std::vector<TSymbol>().swap(alphabet);
+		func(compact.data(), distinct - 1);
+	};
+	if (distinct <= std::numeric_limits<uint16_t>::max())
+		remap(uint16_t());
+	else if (distinct <= std::numeric_limits<uint32_t>::max())
+		remap(uint32_t());
+	else
+		remap(uint64_t());
+}
 
-	std::vector<T> arr;
-	try {
-		arr = PyListToVector<T>(pyArr);
-	} catch (const TPyErr&) {
+// Returns new reference to `out` (or to a new array.array of `size` TIndex zeros) viewed by outView
+template <class TIndex>
+PyObject* PrepareOutput(PyObject* pyOut, size_t size, TBufferView& outView) {
+	if (pyOut) {
+		if (!outView.Acquire(pyOut, true))
+			return nullptr;
+		if (outView.Size < size)
+			return PyErr_Format(PyExc_ValueError, "out buffer is too small: %zu < %zu", outView.Size, size);
+		Py_INCREF(pyOut);
+		return pyOut;
+	}
+	PyObject* result = NewTypedArray<TIndex>(size);
+	if (!result || !outView.Acquire(result, true)) {
+		Py_XDECREF(result);
 		return nullptr;
 	}
+	return result;
+}
+
+// Item size of `out` if it's given, otherwise the smallest one that fits. Returns 0 and sets error on failure
+size_t ChooseIndexSize(PyObject* pyOut, size_t size, size_t maxElem) {
+	if (!pyOut)
+		return FitsIndex<uint32_t>(size, maxElem) ? sizeof(uint32_t) : sizeof(uint64_t);
+	TBufferView outView;
+	if (!outView.Acquire(pyOut, true))
+		return 0;
+	if ((outView.ItemSize == sizeof(uint32_t) && FitsIndex<uint32_t>(size, maxElem)) || outView.ItemSize == sizeof(uint64_t))
+		return outView.ItemSize;
+	PyErr_Format(PyExc_ValueError, "out buffer item size %zu can't hold indexes of array of size %zu", outView.ItemSize, size);
+	return 0;
+}
 
-	T maxElem = *std::max_element(arr.begin(), arr.end());
+// Calls func with a value of the index type of given size
+template <class TFunc>
+void VisitIndexSize(size_t indexSize, TFunc&& func) {
+	if (indexSize == sizeof(uint32_t))
+		func(uint32_t());
+	else
+		func(uint64_t());
+}
 
-	std::vector<T> result;
-	Py_BEGIN_ALLOW_THREADS
-	result = SuffixArrayKS(arr, maxElem);
-	Py_END_ALLOW_THREADS
+// Lists are still accepted, but have to be unboxed element by element.
+// Returns new reference to a buffer object.
+PyObject* ListToBuffer(PyObject* pyArr) {
+	if (!PyList_Check(pyArr)) {
+		Py_INCREF(pyArr);
+		return pyArr;
+	}
+	PyObject* pyBuffer = NewTypedArray<uint64_t>(PyList_Size(pyArr));
+	if (!pyBuffer)
+		return nullptr;
+	TBufferView listView;
+	if (!listView.Acquire(pyBuffer, true)) {
+		Py_DECREF(pyBuffer);
+		return nullptr;
+	}
+	uint64_t* data = static_cast<uint64_t*>(listView.Data);
+	for (size_t i = 0; i < listView.Size; ++i) {
+		data[i] = PyInt_AsUnsignedLongLongMask(PyList_GET_ITEM(pyArr, i));
+		if (data[i] == (unsigned long long)-1 && PyErr_Occurred()) {
+			Py_DECREF(pyBuffer);
+			return nullptr;
+		}
+	}
+	return pyBuffer;
+}
+
+template <class TAlgorithm>
+PyObject* SuffixArrayToBuffer(PyObject* pyBuffer, PyObject* pyOut) {
+	TBufferView input;
+	if (!input.Acquire(pyBuffer, false))
+		return nullptr;
+	size_t maxElem;
+	VisitSymbols(input, [&] (auto arr) {
+		maxElem = MaxElement(arr, input.Size);
+	});
+	size_t indexSize = ChooseIndexSize(pyOut, input.Size, CompactMaxElement(input.Size, maxElem));
+	if (!indexSize)
+		return nullptr;
 
-	return SequenceToPyList(result.size(), [&] (size_t pos) {
-		return PyInt_FromSize_t(result[pos]);
+	PyObject* result = nullptr;
+	VisitIndexSize(indexSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		TBufferView outView;
+		result = PrepareOutput<TIndex>(pyOut, input.Size, outView);
+		if (!result)
+			return;
+		TIndex* out = static_cast<TIndex*>(outView.Data);
+		Py_BEGIN_ALLOW_THREADS
+		VisitSymbols(input, [&] (auto arr) {
+			WithCompactAlphabet(arr, input.Size, maxElem, [&] (auto symbols, size_t symbolsMaxElem) {
+				TAlgorithm::Run(symbols, input.Size, symbolsMaxElem, out);
+			});
+		});
+		Py_END_ALLOW_THREADS
 	});
+	return result;
 }
 
-PyObject* py_suffix_array_ks_helper_choose(PyObject* m, PyObject* pyArr) {
-	if (!PyList_Check(pyArr)) {
-		return PyErr_Format(PyExc_TypeError, "arr must be of type list");
+template <class TAlgorithm>
+PyObject* py_suffix_array_helper(PyObject* m, PyObject* args, PyObject* kwargs) {
+	static const char* kwlist[] = {"arr", "out", nullptr};
+	PyObject* pyArr;
+	PyObject* pyOut = nullptr;
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|O", const_cast<char**>(kwlist), &pyArr, &pyOut))
+		return nullptr;
+	if (pyOut == Py_None)
+		pyOut = nullptr;
+
+	PyObject* pyBuffer = ListToBuffer(pyArr);
+	if (!pyBuffer)
+		return nullptr;
+	PyObject* result = SuffixArrayToBuffer<TAlgorithm>(pyBuffer, pyOut);
+	Py_DECREF(pyBuffer);
+	return result;
+}
+
+/*
+LCP array: lcp[rank] is the length of the longest common prefix
+of suffixes sa[rank] and sa[rank + 1], so it has size - 1 elements.
+Both algorithms return false if sa is not a permutation.
+*/
+
+// Kasai et al.: lcp of a suffix and its successor in sa drops at most by one
+// when we move to the next text position. Needs inverse suffix array.
+template <class TIndex, class TSymbol, class TSAIndex>
+bool LcpKasai(const TSymbol* arr, const TSAIndex* sa, size_t size, TIndex* lcp) {
+	const size_t empty = std::numeric_limits<size_t>::max();
+	std::vector<TIndex> rank(size, std::numeric_limits<TIndex>::max());
+	for (size_t i = 0; i < size; ++i) {
+		if (sa[i] >= size || rank[sa[i]] != std::numeric_limits<TIndex>::max())
+			return false;
+		rank[sa[i]] = i;
+	}
+	size_t common = 0;
+	for (size_t pos = 0; pos < size; ++pos) {
+		size_t next = rank[pos] + 1 < size ? sa[rank[pos] + 1] : empty;
+		if (next == empty) {
+			common = 0;
+			continue;
+		}
+		while (pos + common < size && next + common < size && arr[pos + common] == arr[next + common])
+			++common;
+		lcp[rank[pos]] = common;
+		if (common)
+			--common;
 	}
-	// Reserve one more position for dollar
-	size_t size = PyList_Size(pyArr) + 1;
-	if (size < std::numeric_limits<uint16_t>::max())
-		return py_suffix_array_ks_helper<uint16_t>(m, pyArr);
-	else if (size < std::numeric_limits<uint32_t>::max())
-		return py_suffix_array_ks_helper<uint32_t>(m, pyArr);
-	return py_suffix_array_ks_helper<uint64_t>(m, pyArr);
+	return true;
 }
 
-PyObject* py_bwt_pixels(PyObject* m, PyObject* pyArr) {
-	if (!PyList_Check(pyArr)) {
-		return PyErr_Format(PyExc_TypeError, "arr must be of type list");
+// Karkkainen, Manzini, Puglisi: compute lcp in text order (PLCP) using
+// phi[pos] = successor of pos in sa, then permute it into rank order.
+// phi, PLCP and the permutation all live in the output array, which has one
+// slot less than the text: the last suffix in sa has no successor and is skipped.
+// The only extra memory is a bitmap of size bits.
+template <class TIndex, class TSymbol, class TSAIndex>
+bool LcpPhi(const TSymbol* arr, const TSAIndex* sa, size_t size, TIndex* lcp) {
+	std::vector<bool> seen(size, false);
+	for (size_t i = 0; i < size; ++i) {
+		if (sa[i] >= size || seen[sa[i]])
+			return false;
+		seen[sa[i]] = true;
 	}
+	if (size < 2)
+		return true;
 
-	std::vector<uint32_t> arr;
-	try {
-		arr = PyListToVector<uint32_t>(pyArr);
-	} catch (const TPyErr&) {
+	size_t last = sa[size - 1];
+	auto slot = [last] (size_t pos) {
+		return pos < last ? pos : pos - 1;
+	};
+	for (size_t i = 0; i + 1 < size; ++i)
+		lcp[slot(sa[i])] = sa[i + 1];
+
+	size_t common = 0;
+	for (size_t pos = 0; pos < size; ++pos) {
+		if (pos == last) {
+			common = 0;
+			continue;
+		}
+		size_t next = lcp[slot(pos)];
+		while (pos + common < size && next + common < size && arr[pos + common] == arr[next + common])
+			++common;
+		lcp[slot(pos)] = common;
+		if (common)
+			--common;
+	}
+
+	// lcp[rank] = plcp[slot(sa[rank])], follow permutation cycles
+	std::fill(seen.begin(), seen.end(), false);
+	for (size_t start = 0; start + 1 < size; ++start) {
+		if (seen[start])
+			continue;
+		TIndex saved = lcp[start];
+		for (size_t rank = start; ; ) {
+			seen[rank] = true;
+			size_t from = slot(sa[rank]);
+			if (from == start) {
+				lcp[rank] = saved;
+				break;
+			}
+			lcp[rank] = lcp[from];
+			rank = from;
+		}
+	}
+	return true;
+}
+
+struct TKasaiAlgorithm {
+	template <class TIndex, class TSymbol, class TSAIndex>
+	static bool Run(const TSymbol* arr, const TSAIndex* sa, size_t size, TIndex* lcp) {
+		return LcpKasai(arr, sa, size, lcp);
+	}
+};
+
+struct TPhiAlgorithm {
+	template <class TIndex, class TSymbol, class TSAIndex>
+	static bool Run(const TSymbol* arr, const TSAIndex* sa, size_t size, TIndex* lcp) {
+		return LcpPhi(arr, sa, size, lcp);
+	}
+};
+
+template <class TAlgorithm>
+PyObject* py_lcp_helper(PyObject* m, PyObject* args, PyObject* kwargs) {
+	static const char* kwlist[] = {"arr", "suf_arr", "out", nullptr};
+	PyObject* pyArr;
+	PyObject* pySufArr;
+	PyObject* pyOut = nullptr;
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "OO|O", const_cast<char**>(kwlist), &pyArr, &pySufArr, &pyOut))
 		return nullptr;
+	if (pyOut == Py_None)
+		pyOut = nullptr;
+
+	TBufferView input, sufArr;
+	if (!input.Acquire(pyArr, false) || !sufArr.Acquire(pySufArr, false))
+		return nullptr;
+	if (input.Size != sufArr.Size)
+		return PyErr_Format(PyExc_ValueError, "suf_arr size %zu doesn't match arr size %zu", sufArr.Size, input.Size);
+	size_t lcpSize = input.Size ? input.Size - 1 : 0;
+	size_t indexSize = ChooseIndexSize(pyOut, input.Size, 0);
+	if (!indexSize)
+		return nullptr;
+
+	PyObject* result = nullptr;
+	VisitIndexSize(indexSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		TBufferView outView;
+		result = PrepareOutput<TIndex>(pyOut, lcpSize, outView);
+		if (!result)
+			return;
+		TIndex* out = static_cast<TIndex*>(outView.Data);
+		bool ok;
+		Py_BEGIN_ALLOW_THREADS
+		VisitSymbols(input, [&] (auto arr) {
+			VisitSymbols(sufArr, [&] (auto sa) {
+				ok = TAlgorithm::Run(arr, sa, input.Size, out);
+			});
+		});
+		Py_END_ALLOW_THREADS
+		if (!ok) {
+			Py_CLEAR(result);
+			PyErr_Format(PyExc_ValueError, "suf_arr is not a permutation");
+		}
+	});
+	return result;
+}
+
+// Calls func with a pointer to a temporary suffix array of the smallest sufficient index type
+template <class TFunc>
+void WithSuffixArrayBuffer(size_t size, size_t maxElem, TFunc&& func) {
+	if (FitsIndex<uint32_t>(size, maxElem)) {
+		std::vector<uint32_t> suffixArray(size);
+		func(suffixArray.data());
+	} else {
+		std::vector<uint64_t> suffixArray(size);
+		func(suffixArray.data());
+	}
+}
+
+// BWT of data followed by a virtual end marker which is larger than all bytes.
+// The marker itself is not stored: out gets size bytes and its index in the transform is returned.
+template <class TIndex>
+size_t BwtWithEndMarker(const uint8_t* data, size_t size, TIndex* suffixArray, uint8_t* out) {
+	SuffixArraySAIS(data, size, std::numeric_limits<uint8_t>::max(), suffixArray);
+	size_t primary = 0;
+	size_t written = 0;
+	for (size_t i = 0; i < size; ++i) {
+		if (suffixArray[i] == 0)
+			primary = i;
+		else
+			out[written++] = data[suffixArray[i] - 1];
 	}
+	// Rotation starting with the end marker is the largest one
+	if (size)
+		out[written++] = data[size - 1];
+	return primary;
+}
 
-	std::vector<uint32_t> suffixArray;
-	Py_BEGIN_ALLOW_THREADS
-	for (size_t i = 0; i < arr.size(); ++i) {
-		if (arr[i] == 255)
-			arr[i] = 254;
+bool AcquireBytes(TBufferView& input, PyObject* pyData) {
+	if (!input.Acquire(pyData, false))
+		return false;
+	if (input.ItemSize != 1) {
+		PyErr_Format(PyExc_TypeError, "data must be a buffer of bytes");
+		return false;
 	}
-	arr.back() = 255;
+	return true;
+}
 
-	suffixArray = SuffixArrayKS(arr, 255u);
+PyObject* py_bwt_bytes(PyObject* m, PyObject* pyData) {
+	TBufferView input;
+	if (!AcquireBytes(input, pyData))
+		return nullptr;
+
+	PyObject* result = PyString_FromStringAndSize(nullptr, input.Size);
+	if (!result)
+		return nullptr;
+
+	const uint8_t* data = static_cast<const uint8_t*>(input.Data);
+	uint8_t* out = reinterpret_cast<uint8_t*>(PyString_AS_STRING(result));
+	size_t size = input.Size;
+	Py_BEGIN_ALLOW_THREADS
+	WithSuffixArrayBuffer(size, std::numeric_limits<uint8_t>::max(), [data, out, size] (auto* suffixArray) {
+		SuffixArraySAIS(data, size, std::numeric_limits<uint8_t>::max(), suffixArray);
+		for (size_t i = 0; i < size; ++i)
+			out[i] = data[(suffixArray[i] + size - 1) % size];
+	});
 	Py_END_ALLOW_THREADS
 
-	return SequenceToPyList(arr.size(), [&] (size_t pos) {
-		return PyInt_FromSize_t(
-			arr[(suffixArray[pos] + suffixArray.size() - 1) % suffixArray.size()]
-		);
+	return result;
+}
+
+PyObject* py_bwt_block(PyObject* m, PyObject* pyData) {
+	TBufferView input;
+	if (!AcquireBytes(input, pyData))
+		return nullptr;
+
+	PyObject* transformed = PyString_FromStringAndSize(nullptr, input.Size);
+	if (!transformed)
+		return nullptr;
+
+	const uint8_t* data = static_cast<const uint8_t*>(input.Data);
+	uint8_t* out = reinterpret_cast<uint8_t*>(PyString_AS_STRING(transformed));
+	size_t size = input.Size;
+	size_t primary;
+	Py_BEGIN_ALLOW_THREADS
+	WithSuffixArrayBuffer(size, std::numeric_limits<uint8_t>::max(), [&] (auto* suffixArray) {
+		primary = BwtWithEndMarker(data, size, suffixArray, out);
 	});
+	Py_END_ALLOW_THREADS
+
+	return Py_BuildValue("(Nn)", transformed, (Py_ssize_t)primary);
 }
 
-static PyMethodDef py_suffix_array_ext_methods[] = {
-    {"suffix_array_ks_helper",
-    (PyCFunction)py_suffix_array_ks_helper_choose, METH_O,
-     "suffix_array_ks_helper_choose(arr, max_elem) - Compute a suffix array."},
+// Inverse BWT of a virtual array of `size` symbols in range [0, 256] by walking
+// the LF mapping from `start`, which is the position of the end marker.
+// Text is restored from its end, only the last outSize symbols are stored.
+template <class TIndex, class TGetChar>
+void InverseBwt(TGetChar&& getChar, size_t size, size_t start, uint8_t* out, size_t outSize) {
+	std::array<size_t, 258> firstPosition{};
+	for (size_t i = 0; i < size; ++i)
+		++firstPosition[getChar(i) + 1];
+	for (size_t c = 1; c < firstPosition.size(); ++c)
+		firstPosition[c] += firstPosition[c - 1];
+	// lf[i] - position of symbol i in the sorted array
+	std::vector<TIndex> lf(size);
+	for (size_t i = 0; i < size; ++i)
+		lf[i] = firstPosition[getChar(i)]++;
 
-    {"suffix_array_ks_helper",
-    (PyCFunction)py_suffix_array_ks_helper<size_t>, METH_O,
-     "suffix_array_ks_helper(arr, max_elem) - Compute a suffix array."},
+	size_t current = start;
+	for (size_t writerPos = size; writerPos-- > 0;) {
+		if (writerPos < outSize)
+			out[writerPos] = getChar(current);
+		current = lf[current];
+	}
+}
 
-    {"bwt_pixels",
-    (PyCFunction)py_bwt_pixels, METH_O,
-     "bwt_pixels(arr) - Compute BWT transform of [0-255] values array."},
+template <class TGetChar>
+PyObject* InverseBwtToString(TGetChar&& getChar, size_t size, size_t start, size_t outSize) {
+	PyObject* result = PyString_FromStringAndSize(nullptr, outSize);
+	if (!result)
+		return nullptr;
+	uint8_t* out = reinterpret_cast<uint8_t*>(PyString_AS_STRING(result));
+	Py_BEGIN_ALLOW_THREADS
+	if (FitsIndex<uint32_t>(size, 0))
+		InverseBwt<uint32_t>(getChar, size, start, out, outSize);
+	else
+		InverseBwt<uint64_t>(getChar, size, start, out, outSize);
+	Py_END_ALLOW_THREADS
+	return result;
+}
 
+PyObject* py_ibwt_bytes(PyObject* m, PyObject* args) {
+	PyObject* pyData;
+	char dollarMarker;
+	if (!PyArg_ParseTuple(args, "Oc", &pyData, &dollarMarker))
+		return nullptr;
+	TBufferView input;
+	if (!AcquireBytes(input, pyData))
+		return nullptr;
+	if (!input.Size)
+		return PyString_FromString("");
 
-    {NULL, NULL, 0, NULL}   /* sentinel */
-};
+	const uint8_t* data = static_cast<const uint8_t*>(input.Data);
+	const uint8_t* dollarPos = nullptr;
+	for (size_t i = input.Size; i-- > 0 && !dollarPos;) {
+		if (data[i] == static_cast<uint8_t>(dollarMarker))
+			dollarPos = data + i;
+	}
+	if (!dollarPos)
+		return PyErr_Format(PyExc_ValueError, "No dollar marker found");
 
-PyMODINIT_FUNC
-initsuffix_array_ext(void)
-{
-    PyObject *m;
+	return InverseBwtToString([data] (size_t pos) -> size_t {
+		return data[pos];
+	}, input.Size, dollarPos - data, input.Size);
+}
 
-    m = Py_InitModule("suffix_array_ext", py_suffix_array_ext_methods);
-    if (m == NULL)
-        return;
-    /* additional initialization can happen here */
-}
\ No newline at end of file
+PyObject* py_ibwt_block(PyObject* m, PyObject* args) {
+	PyObject* pyData;
+	Py_ssize_t primary;
+	if (!PyArg_ParseTuple(args, "On", &pyData, &primary))
+		return nullptr;
+	TBufferView input;
+	if (!AcquireBytes(input, pyData))
+		return nullptr;
+	if (primary < 0 || static_cast<size_t>(primary) > input.Size)
+		return PyErr_Format(PyExc_ValueError, "Primary index %zd is out of range", primary);
+
+	// Transform with the end marker (256) inserted at primary
+	const uint8_t* data = static_cast<const uint8_t*>(input.Data);
+	size_t endMarkerPos = primary;
+	return InverseBwtToString([data, endMarkerPos] (size_t pos) -> size_t {
+		if (pos < endMarkerPos)
+			return data[pos];
+		if (pos > endMarkerPos)
+			return data[pos - 1];
+		return std::numeric_limits<uint8_t>::max() + 1;
+	}, input.Size + 1, endMarkerPos, input.Size);
+}
+
+/*
+Move-to-front followed by bzip2-style zero run length coding (RLE0).
+Runs of r zeros are written as bijective base-2 digits of r, least
+significant first: RUNA (0) is digit 1, RUNB (1) is digit 2.
+Other MTF indexes v are written as v + 1, so symbols are in range [0, 256].
+*/
+const uint16_t RUNA = 0;
+const uint16_t RUNB = 1;
+const size_t RLE0_ALPHABET_SIZE = 257;
+
+void WriteZeroRun(size_t run, std::vector<uint16_t>& out) {
+	while (run) {
+		if (run & 1) {
+			out.push_back(RUNA);
+			run = (run - 1) / 2;
+		} else {
+			out.push_back(RUNB);
+			run = (run - 2) / 2;
+		}
+	}
+}
+
+void MoveToFrontRle0Encode(const uint8_t* data, size_t size, std::vector<uint16_t>& out) {
+	std::array<uint8_t, 256> order;
+	for (size_t i = 0; i < order.size(); ++i)
+		order[i] = i;
+	size_t run = 0;
+	for (size_t i = 0; i < size; ++i) {
+		uint8_t c = data[i];
+		if (order[0] == c) {
+			++run;
+			continue;
+		}
+		WriteZeroRun(run, out);
+		run = 0;
+		size_t index = std::find(order.begin(), order.end(), c) - order.begin();
+		std::copy_backward(order.begin(), order.begin() + index, order.begin() + index + 1);
+		order[0] = c;
+		out.push_back(index + 1);
+	}
+	WriteZeroRun(run, out);
+}
+
+// Returns size of decoded data or `empty` if symbols are out of range
+template <class TSymbol>
+size_t Rle0DecodedSize(const TSymbol* symbols, size_t size) {
+	size_t result = 0;
+	size_t weight = 1;
+	for (size_t i = 0; i < size; ++i) {
+		if (symbols[i] >= RLE0_ALPHABET_SIZE)
+			return std::numeric_limits<size_t>::max();
+		if (symbols[i] <= RUNB) {
+			result += (symbols[i] + 1) * weight;
+			weight *= 2;
+		} else {
+			++result;
+			weight = 1;
+		}
+	}
+	return result;
+}
+
+template <class TSymbol>
+void MoveToFrontRle0Decode(const TSymbol* symbols, size_t size, uint8_t* out) {
+	std::array<uint8_t, 256> order;
+	for (size_t i = 0; i < order.size(); ++i)
+		order[i] = i;
+	size_t run = 0;
+	size_t weight = 1;
+	for (size_t i = 0; i < size; ++i) {
+		if (symbols[i] <= RUNB) {
+			run += (symbols[i] + 1) * weight;
+			weight *= 2;
+			continue;
+		}
+		out = std::fill_n(out, run, order[0]);
+		run = 0;
+		weight = 1;
+		size_t index = symbols[i] - 1;
+		uint8_t c = order[index];
+		std::copy_backward(order.begin(), order.begin() + index, order.begin() + index + 1);
+		order[0] = c;
+		*out++ = c;
+	}
+	std::fill_n(out, run, order[0]);
+}
+
+PyObject* py_mtf_rle0_encode(PyObject* m, PyObject* pyData) {
+	TBufferView input;
+	if (!AcquireBytes(input, pyData))
+		return nullptr;
+	std::vector<uint16_t> symbols;
+	Py_BEGIN_ALLOW_THREADS
+	MoveToFrontRle0Encode(static_cast<const uint8_t*>(input.Data), input.Size, symbols);
+	Py_END_ALLOW_THREADS
+
+	PyObject* result = NewTypedArray<uint16_t>(symbols.size());
+	TBufferView outView;
+	if (!result || !outView.Acquire(result, true)) {
+		Py_XDECREF(result);
+		return nullptr;
+	}
+	std::copy(symbols.begin(), symbols.end(), static_cast<uint16_t*>(outView.Data));
+	return result;
+}
+
+PyObject* py_mtf_rle0_decode(PyObject* m, PyObject* pySymbols) {
+	TBufferView input;
+	if (!input.Acquire(pySymbols, false))
+		return nullptr;
+	size_t size;
+	VisitSymbols(input, [&] (auto symbols) {
+		size = Rle0DecodedSize(symbols, input.Size);
+	});
+	if (size == std::numeric_limits<size_t>::max())
+		return PyErr_Format(PyExc_ValueError, "RLE0 symbols must be less than %zu", RLE0_ALPHABET_SIZE);
+
+	PyObject* result = PyString_FromStringAndSize(nullptr, size);
+	if (!result)
+		return nullptr;
+	uint8_t* out = reinterpret_cast<uint8_t*>(PyString_AS_STRING(result));
+	Py_BEGIN_ALLOW_THREADS
+	VisitSymbols(input, [&] (auto symbols) {
+		MoveToFrontRle0Decode(symbols, input.Size, out);
+	});
+	Py_END_ALLOW_THREADS
+	return result;
+}
+
+// LCP-LR arrays of Manber and Myers. Binary search over suffix array ranks (l, r),
+// starting from virtual ranks -1 and size, always probes m = l + (r - l) / 2.
+// For every m: llcp[m] = LCP(suffix l, suffix m), rlcp[m] = LCP(suffix m, suffix r),
+// zero when l or r is virtual. Returns LCP(suffix l, suffix r).
+template <class TIndex, class TLcp>
+TIndex FillLcpLr(const TLcp* lcp, Py_ssize_t size, Py_ssize_t l, Py_ssize_t r, TIndex* llcp, TIndex* rlcp) {
+	if (r - l == 1)
+		return l >= 0 && r < size ? lcp[l] : 0;
+	Py_ssize_t m = l + (r - l) / 2;
+	TIndex left = FillLcpLr(lcp, size, l, m, llcp, rlcp);
+	TIndex right = FillLcpLr(lcp, size, m, r, llcp, rlcp);
+	llcp[m] = left;
+	rlcp[m] = right;
+	return std::min(left, right);
+}
+
+PyObject* py_lcp_lr(PyObject* m, PyObject* pyLcp) {
+	TBufferView lcpView;
+	if (!lcpView.Acquire(pyLcp, false))
+		return nullptr;
+	size_t size = lcpView.Size + 1;
+	size_t indexSize = FitsIndex<uint32_t>(size, 0) ? sizeof(uint32_t) : sizeof(uint64_t);
+	PyObject* result = nullptr;
+	VisitIndexSize(indexSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		TBufferView llcpView, rlcpView;
+		PyObject* llcp = PrepareOutput<TIndex>(nullptr, size, llcpView);
+		PyObject* rlcp = llcp ? PrepareOutput<TIndex>(nullptr, size, rlcpView) : nullptr;
+		if (!rlcp) {
+			Py_XDECREF(llcp);
+			return;
+		}
+		TIndex* llcpData = static_cast<TIndex*>(llcpView.Data);
+		TIndex* rlcpData = static_cast<TIndex*>(rlcpView.Data);
+		Py_BEGIN_ALLOW_THREADS
+		VisitSymbols(lcpView, [&] (auto lcp) {
+			FillLcpLr(lcp, size, -1, size, llcpData, rlcpData);
+		});
+		Py_END_ALLOW_THREADS
+		result = Py_BuildValue("(NN)", llcp, rlcp);
+	});
+	return result;
+}
+
+// Step of the search: ranks l and r and LCP of the pattern with their suffixes
+struct TLcpLrState {
+	Py_ssize_t L;
+	Py_ssize_t R;
+	size_t Lp;
+	size_t Rp;
+};
+
+// Finds the first rank whose suffix is not less than the pattern in O(|pattern| + log(size)).
+// With `upper` set, suffixes starting with the pattern are considered less than it.
+// End of text is larger than all symbols.
+// `path` holds the steps of the previous search, `shared` is the length of the common
+// prefix of both patterns. Steps whose suffixes differ from the previous pattern before
+// `shared` compare the same way with this one, so the search resumes from the last of them.
+// On return `path` holds the steps of this search.
+template <class TSymbol, class TIndex>
+size_t SearchLcpLr(
+	const TSymbol* text, size_t textSize, const TIndex* suffixArray, const TIndex* llcp, const TIndex* rlcp,
+	const uint64_t* pattern, size_t patternSize, bool upper, std::vector<TLcpLrState>& path, size_t shared
+) {
+	// Lp and Rp never decrease during the search, so valid steps are a prefix of path
+	size_t keep = 0;
+	while (keep < path.size() && std::max(path[keep].Lp, path[keep].Rp) < shared)
+		++keep;
+	TLcpLrState state = keep ? path[keep - 1] : TLcpLrState{-1, Py_ssize_t(textSize), 0, 0};
+	path.resize(keep ? keep - 1 : 0);
+	Py_ssize_t l = state.L;
+	Py_ssize_t r = state.R;
+	// LCP of the pattern and suffixes l and r
+	size_t lp = state.Lp;
+	size_t rp = state.Rp;
+	while (r - l > 1) {
+		path.push_back({l, r, lp, rp});
+		Py_ssize_t m = l + (r - l) / 2;
+		size_t matched;
+		if (lp >= rp) {
+			if (llcp[m] > lp) {
+				l = m;
+				continue;
+			}
+			if (llcp[m] < lp) {
+				r = m;
+				rp = llcp[m];
+				continue;
+			}
+			matched = lp;
+		} else {
+			if (rlcp[m] > rp) {
+				r = m;
+				continue;
+			}
+			if (rlcp[m] < rp) {
+				l = m;
+				lp = rlcp[m];
+				continue;
+			}
+			matched = rp;
+		}
+		size_t pos = suffixArray[m];
+		while (matched < patternSize && pos + matched < textSize && text[pos + matched] == pattern[matched])
+			++matched;
+		bool less;
+		if (matched == patternSize)
+			less = upper;
+		else if (pos + matched == textSize)
+			less = false;
+		else
+			less = text[pos + matched] < pattern[matched];
+		if (less) {
+			l = m;
+			lp = matched;
+		} else {
+			r = m;
+			rp = matched;
+		}
+	}
+	return r;
+}
+
+PyObject* py_find_all(PyObject* m, PyObject* args) {
+	PyObject* pyText;
+	PyObject* pySufArr;
+	PyObject* pyLlcp;
+	PyObject* pyRlcp;
+	PyObject* pyPatterns;
+	if (!PyArg_ParseTuple(args, "OOOOO", &pyText, &pySufArr, &pyLlcp, &pyRlcp, &pyPatterns))
+		return nullptr;
+	TBufferView text, sufArr, llcp, rlcp;
+	if (!text.Acquire(pyText, false) || !sufArr.Acquire(pySufArr, false) || !llcp.Acquire(pyLlcp, false) || !rlcp.Acquire(pyRlcp, false))
+		return nullptr;
+	if (sufArr.Size != text.Size || llcp.Size != text.Size || rlcp.Size != text.Size)
+		return PyErr_Format(PyExc_ValueError, "suf_arr, llcp and rlcp must have len(text) elements");
+	if (sufArr.ItemSize != llcp.ItemSize || llcp.ItemSize != rlcp.ItemSize || sufArr.ItemSize < sizeof(uint32_t))
+		return PyErr_Format(PyExc_ValueError, "suf_arr, llcp and rlcp must have the same item size of 4 or 8 bytes");
+
+	PyObject* patterns = PySequence_Fast(pyPatterns, "patterns must be a sequence");
+	if (!patterns)
+		return nullptr;
+	size_t count = PySequence_Fast_GET_SIZE(patterns);
+	std::vector<uint64_t> symbols;
+	std::vector<size_t> offsets(1, 0);
+	for (size_t i = 0; i < count; ++i) {
+		TBufferView pattern;
+		if (!pattern.Acquire(PySequence_Fast_GET_ITEM(patterns, i), false)) {
+			Py_DECREF(patterns);
+			return nullptr;
+		}
+		VisitSymbols(pattern, [&] (auto data) {
+			symbols.insert(symbols.end(), data, data + pattern.Size);
+		});
+		offsets.push_back(symbols.size());
+	}
+	Py_DECREF(patterns);
+
+	PyObject* result = NewTypedArray<uint64_t>(2 * count);
+	TBufferView resultView;
+	if (!result || !resultView.Acquire(result, true)) {
+		Py_XDECREF(result);
+		return nullptr;
+	}
+	uint64_t* out = static_cast<uint64_t*>(resultView.Data);
+	Py_BEGIN_ALLOW_THREADS
+	// Sorted patterns are searched in order, each one resumes the search of the previous one
+	// from the last step which doesn't depend on symbols after their common prefix.
+	// Equal patterns are searched once.
+	std::vector<size_t> order(count);
+	for (size_t i = 0; i < count; ++i)
+		order[i] = i;
+	auto begin = [&] (size_t i) { return symbols.data() + offsets[i]; };
+	auto end = [&] (size_t i) { return symbols.data() + offsets[i + 1]; };
+	std::sort(order.begin(), order.end(), [&] (size_t a, size_t b) {
+		return std::lexicographical_compare(begin(a), end(a), begin(b), end(b));
+	});
+	VisitIndexSize(sufArr.ItemSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		const TIndex* sa = static_cast<const TIndex*>(sufArr.Data);
+		const TIndex* llcpData = static_cast<const TIndex*>(llcp.Data);
+		const TIndex* rlcpData = static_cast<const TIndex*>(rlcp.Data);
+		VisitSymbols(text, [&] (auto textData) {
+			std::vector<TLcpLrState> lowerPath, upperPath;
+			for (size_t k = 0; k < count; ++k) {
+				size_t i = order[k];
+				size_t patternSize = offsets[i + 1] - offsets[i];
+				size_t shared = 0;
+				if (k) {
+					size_t prev = order[k - 1];
+					size_t prevSize = offsets[prev + 1] - offsets[prev];
+					shared = std::mismatch(begin(prev), begin(prev) + std::min(prevSize, patternSize), begin(i)).first - begin(prev);
+					if (shared == patternSize && shared == prevSize) {
+						out[2 * i] = out[2 * prev];
+						out[2 * i + 1] = out[2 * prev + 1];
+						continue;
+					}
+				}
+				out[2 * i] = SearchLcpLr(textData, text.Size, sa, llcpData, rlcpData, begin(i), patternSize, false, lowerPath, shared);
+				// Both searches take the same steps until a suffix matches the whole pattern
+				upperPath = lowerPath;
+				out[2 * i + 1] = SearchLcpLr(textData, text.Size, sa, llcpData, rlcpData, begin(i), patternSize, true, upperPath, patternSize);
+			}
+		});
+	});
+	Py_END_ALLOW_THREADS
+	return result;
+}
+
+// Inverse of a suffix array: rank[suf_arr[i]] = i. Returns false if it's not a permutation.
+template <class TIndex, class TSA>
+bool InversePermutation(const TSA* suffixArray, size_t size, TIndex* rank) {
+	std::vector<bool> seen(size);
+	for (size_t i = 0; i < size; ++i) {
+		size_t pos = suffixArray[i];
+		if (pos >= size || seen[pos])
+			return false;
+		seen[pos] = true;
+		rank[pos] = i;
+	}
+	return true;
+}
+
+PyObject* py_inverse_suffix_array(PyObject* m, PyObject* pySufArr) {
+	TBufferView sufArr;
+	if (!sufArr.Acquire(pySufArr, false))
+		return nullptr;
+	size_t indexSize = FitsIndex<uint32_t>(sufArr.Size, 0) ? sizeof(uint32_t) : sizeof(uint64_t);
+	PyObject* result = nullptr;
+	VisitIndexSize(indexSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		TBufferView outView;
+		result = PrepareOutput<TIndex>(nullptr, sufArr.Size, outView);
+		if (!result)
+			return;
+		TIndex* rank = static_cast<TIndex*>(outView.Data);
+		bool ok;
+		Py_BEGIN_ALLOW_THREADS
+		VisitSymbols(sufArr, [&] (auto sa) {
+			ok = InversePermutation(sa, sufArr.Size, rank);
+		});
+		Py_END_ALLOW_THREADS
+		if (!ok) {
+			Py_CLEAR(result);
+			PyErr_Format(PyExc_ValueError, "suf_arr is not a permutation");
+		}
+	});
+	return result;
+}
+
+size_t FloorLog2(size_t value) {
+	size_t result = 0;
+	while (value >>= 1)
+		++result;
+	return result;
+}
+
+// Number of sparse table levels over `blocks` items: levels k with 2^k <= blocks
+size_t SparseTableLevels(size_t blocks) {
+	return blocks ? FloorLog2(blocks) + 1 : 0;
+}
+
+// Sparse table over minima of blocks of `blockSize` values (the last block may be shorter).
+// Level k is table[k * blocks, (k + 1) * blocks), its item i is the minimum of blocks [i, i + 2^k),
+// items past blocks - 2^k are left zero.
+template <class T>
+void FillSparseTable(const T* values, size_t size, size_t blockSize, T* table) {
+	size_t blocks = (size + blockSize - 1) / blockSize;
+	for (size_t i = 0; i < blocks; ++i)
+		table[i] = *std::min_element(values + i * blockSize, values + std::min(size, (i + 1) * blockSize));
+	for (size_t k = 1; k < SparseTableLevels(blocks); ++k) {
+		const T* prev = table + (k - 1) * blocks;
+		T* level = table + k * blocks;
+		size_t half = size_t(1) << (k - 1);
+		for (size_t i = 0; i + 2 * half <= blocks; ++i)
+			level[i] = std::min(prev[i], prev[i + half]);
+	}
+}
+
+// Largest block size of block masks, one bit per value of a block
+const size_t MaxMaskedBlockSize = 32;
+
+// Bit s of masks[j] is set if values[start + s] is less than every value after it up to j,
+// where start is the beginning of the block of j: the stack of minima of a left to right scan.
+// The lowest bit of masks[j] >> (i - start) is the offset of min(values[i, j]) from i.
+template <class T>
+void FillBlockMasks(const T* values, size_t size, size_t blockSize, uint32_t* masks) {
+	for (size_t start = 0; start < size; start += blockSize) {
+		uint32_t stack = 0;
+		for (size_t j = start; j < std::min(size, start + blockSize); ++j) {
+			while (stack) {
+				size_t top = 31 - __builtin_clz(stack);
+				if (values[start + top] < values[j])
+					break;
+				stack ^= uint32_t(1) << top;
+			}
+			stack |= uint32_t(1) << (j - start);
+			masks[j] = stack;
+		}
+	}
+}
+
+// min(values[begin, end)) for begin < end: full blocks from the table, the rest is scanned,
+// or looked up in O(1) when block masks are given
+template <class T>
+T RangeMin(const T* values, size_t size, const T* table, size_t blockSize, size_t begin, size_t end, const uint32_t* masks = nullptr) {
+	size_t blocks = (size + blockSize - 1) / blockSize;
+	if (masks) {
+		// min(values[i, j]) for i and j in the same block
+		auto inBlock = [values, masks, blockSize] (size_t i, size_t j) {
+			return values[i + __builtin_ctz(masks[j] >> (i % blockSize))];
+		};
+		size_t firstBlock = begin / blockSize;
+		size_t lastBlock = (end - 1) / blockSize;
+		if (firstBlock == lastBlock)
+			return inBlock(begin, end - 1);
+		T result = std::min(inBlock(begin, firstBlock * blockSize + blockSize - 1), inBlock(lastBlock * blockSize, end - 1));
+		if (lastBlock - firstBlock > 1) {
+			size_t k = FloorLog2(lastBlock - firstBlock - 1);
+			const T* level = table + k * blocks;
+			result = std::min({result, level[firstBlock + 1], level[lastBlock - (size_t(1) << k)]});
+		}
+		return result;
+	}
+	size_t first = (begin + blockSize - 1) / blockSize;
+	size_t last = end / blockSize;
+	if (first >= last)
+		return *std::min_element(values + begin, values + end);
+	size_t k = FloorLog2(last - first);
+	const T* level = table + k * blocks;
+	T result = std::min(level[first], level[last - (size_t(1) << k)]);
+	if (begin < first * blockSize)
+		result = std::min(result, *std::min_element(values + begin, values + first * blockSize));
+	if (last * blockSize < end)
+		result = std::min(result, *std::min_element(values + last * blockSize, values + end));
+	return result;
+}
+
+PyObject* py_sparse_table(PyObject* m, PyObject* args, PyObject* kwargs) {
+	static const char* kwlist[] = {"values", "block_size", nullptr};
+	PyObject* pyValues;
+	Py_ssize_t blockSize = 1;
+	if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|n", const_cast<char**>(kwlist), &pyValues, &blockSize))
+		return nullptr;
+	if (blockSize < 1)
+		return PyErr_Format(PyExc_ValueError, "block_size must be positive");
+	TBufferView values;
+	if (!values.Acquire(pyValues, false))
+		return nullptr;
+	size_t blocks = (values.Size + blockSize - 1) / blockSize;
+	PyObject* result = nullptr;
+	VisitSymbols(values, [&] (auto data) {
+		using T = std::remove_const_t<std::remove_pointer_t<decltype(data)>>;
+		TBufferView tableView;
+		result = PrepareOutput<T>(nullptr, SparseTableLevels(blocks) * blocks, tableView);
+		if (!result)
+			return;
+		T* table = static_cast<T*>(tableView.Data);
+		Py_BEGIN_ALLOW_THREADS
+		FillSparseTable(data, values.Size, blockSize, table);
+		Py_END_ALLOW_THREADS
+	});
+	return result;
+}
+
+PyObject* py_block_masks(PyObject* m, PyObject* args) {
+	PyObject* pyValues;
+	Py_ssize_t blockSize;
+	if (!PyArg_ParseTuple(args, "On", &pyValues, &blockSize))
+		return nullptr;
+	if (blockSize < 1 || size_t(blockSize) > MaxMaskedBlockSize)
+		return PyErr_Format(PyExc_ValueError, "block_size must be from 1 to %zu", MaxMaskedBlockSize);
+	TBufferView values;
+	if (!values.Acquire(pyValues, false))
+		return nullptr;
+	PyObject* result = NewTypedArray<uint32_t>(values.Size);
+	TBufferView resultView;
+	if (!result || !resultView.Acquire(result, true)) {
+		Py_XDECREF(result);
+		return nullptr;
+	}
+	uint32_t* masks = static_cast<uint32_t*>(resultView.Data);
+	Py_BEGIN_ALLOW_THREADS
+	VisitSymbols(values, [&] (auto data) {
+		FillBlockMasks(data, values.Size, blockSize, masks);
+	});
+	Py_END_ALLOW_THREADS
+	return result;
+}
+
+PyObject* py_lce_many(PyObject* m, PyObject* args) {
+	PyObject* pyRank;
+	PyObject* pyLcp;
+	PyObject* pyTable;
+	Py_ssize_t blockSize;
+	PyObject* pyPairs;
+	PyObject* pyMasks = Py_None;
+	if (!PyArg_ParseTuple(args, "OOOnO|O", &pyRank, &pyLcp, &pyTable, &blockSize, &pyPairs, &pyMasks))
+		return nullptr;
+	TBufferView rank, lcp, table, pairs, masks;
+	if (!rank.Acquire(pyRank, false) || !lcp.Acquire(pyLcp, false) || !table.Acquire(pyTable, false) || !pairs.Acquire(pyPairs, false))
+		return nullptr;
+	if (pyMasks != Py_None) {
+		if (!masks.Acquire(pyMasks, false))
+			return nullptr;
+		if (masks.ItemSize != sizeof(uint32_t) || masks.Size != lcp.Size || size_t(blockSize) > MaxMaskedBlockSize)
+			return PyErr_Format(PyExc_ValueError, "masks don't match lcp and block_size");
+	}
+	if (blockSize < 1)
+		return PyErr_Format(PyExc_ValueError, "block_size must be positive");
+	size_t size = rank.Size;
+	if (lcp.Size != (size ? size - 1 : 0))
+		return PyErr_Format(PyExc_ValueError, "lcp must have len(rank) - 1 elements");
+	size_t blocks = (lcp.Size + blockSize - 1) / blockSize;
+	if (table.ItemSize != lcp.ItemSize || table.Size != SparseTableLevels(blocks) * blocks)
+		return PyErr_Format(PyExc_ValueError, "table doesn't match lcp and block_size");
+	if (rank.ItemSize < sizeof(uint32_t))
+		return PyErr_Format(PyExc_ValueError, "rank must have item size of 4 or 8 bytes");
+	if (pairs.Size % 2)
+		return PyErr_Format(PyExc_ValueError, "pairs must have even number of positions");
+
+	size_t count = pairs.Size / 2;
+	PyObject* result = NewTypedArray<uint64_t>(count);
+	TBufferView resultView;
+	if (!result || !resultView.Acquire(result, true)) {
+		Py_XDECREF(result);
+		return nullptr;
+	}
+	uint64_t* out = static_cast<uint64_t*>(resultView.Data);
+	const uint32_t* masksData = static_cast<const uint32_t*>(masks.Data);
+	bool ok = true;
+	Py_BEGIN_ALLOW_THREADS
+	VisitIndexSize(rank.ItemSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		const TIndex* rankData = static_cast<const TIndex*>(rank.Data);
+		VisitSymbols(lcp, [&] (auto lcpData) {
+			using T = std::remove_const_t<std::remove_pointer_t<decltype(lcpData)>>;
+			const T* tableData = static_cast<const T*>(table.Data);
+			VisitSymbols(pairs, [&] (auto pairsData) {
+				for (size_t q = 0; q < count && ok; ++q) {
+					size_t i = pairsData[2 * q];
+					size_t j = pairsData[2 * q + 1];
+					if (i >= size || j >= size) {
+						ok = false;
+					} else if (i == j) {
+						out[q] = size - i;
+					} else {
+						size_t r1 = rankData[i];
+						size_t r2 = rankData[j];
+						out[q] = RangeMin(lcpData, lcp.Size, tableData, blockSize, std::min(r1, r2), std::max(r1, r2), masksData);
+					}
+				}
+			});
+		});
+	});
+	Py_END_ALLOW_THREADS
+	if (!ok) {
+		Py_DECREF(result);
+		return PyErr_Format(PyExc_IndexError, "position out of range");
+	}
+	return result;
+}
+
+// Text of a generalized suffix array: documents of bytes, each followed by its own
+// terminator 256 + document index. Terminators are larger than all bytes, so
+// suffixes of every document are ordered as if it was alone.
+const size_t DOCUMENT_TERMINATOR = 256;
+
+template <class TIndex>
+void GeneralizedSuffixArray(const uint32_t* text, size_t size, const TIndex* starts, size_t documents, TIndex* suffixArray, TIndex* documentArray) {
+	SuffixArraySAIS(text, size, DOCUMENT_TERMINATOR + documents - 1, suffixArray);
+	for (size_t rank = 0; rank < size; ++rank)
+		documentArray[rank] = std::upper_bound(starts, starts + documents + 1, suffixArray[rank]) - starts - 1;
+}
+
+PyObject* py_generalized_suffix_array(PyObject* m, PyObject* pyDocuments) {
+	PyObject* documents = PySequence_Fast(pyDocuments, "documents must be a sequence");
+	if (!documents)
+		return nullptr;
+	size_t count = PySequence_Fast_GET_SIZE(documents);
+	PyObject** items = PySequence_Fast_ITEMS(documents);
+	size_t size = count;
+	for (size_t i = 0; i < count; ++i) {
+		TBufferView view;
+		if (!AcquireBytes(view, items[i])) {
+			Py_DECREF(documents);
+			return nullptr;
+		}
+		size += view.Size;
+	}
+	size_t maxElem = DOCUMENT_TERMINATOR + count;
+
+	PyObject* result = nullptr;
+	PyObject* text = NewTypedArray<uint32_t>(size);
+	TBufferView textView;
+	if (text && textView.Acquire(text, true)) {
+		VisitIndexSize(FitsIndex<uint32_t>(size, maxElem) ? sizeof(uint32_t) : sizeof(uint64_t), [&] (auto indexTag) {
+			using TIndex = decltype(indexTag);
+			PyObject* starts = NewTypedArray<TIndex>(count + 1);
+			PyObject* suffixArray = NewTypedArray<TIndex>(size);
+			PyObject* documentArray = NewTypedArray<TIndex>(size);
+			TBufferView startsView, suffixArrayView, documentArrayView;
+			if (
+				!starts || !suffixArray || !documentArray ||
+				!startsView.Acquire(starts, true) ||
+				!suffixArrayView.Acquire(suffixArray, true) ||
+				!documentArrayView.Acquire(documentArray, true)
+			) {
+				Py_XDECREF(starts);
+				Py_XDECREF(suffixArray);
+				Py_XDECREF(documentArray);
+				return;
+			}
+
+			uint32_t* out = static_cast<uint32_t*>(textView.Data);
+			TIndex* startsData = static_cast<TIndex*>(startsView.Data);
+			size_t pos = 0;
+			for (size_t i = 0; i < count; ++i) {
+				TBufferView view;
+				AcquireBytes(view, items[i]);
+				startsData[i] = pos;
+				const uint8_t* data = static_cast<const uint8_t*>(view.Data);
+				out = std::copy(data, data + view.Size, out);
+				*out++ = DOCUMENT_TERMINATOR + i;
+				pos += view.Size + 1;
+			}
+			startsData[count] = pos;
+
+			const uint32_t* textData = static_cast<const uint32_t*>(textView.Data);
+			TIndex* suffixArrayData = static_cast<TIndex*>(suffixArrayView.Data);
+			TIndex* documentArrayData = static_cast<TIndex*>(documentArrayView.Data);
+			Py_BEGIN_ALLOW_THREADS
+			GeneralizedSuffixArray(textData, size, startsData, count, suffixArrayData, documentArrayData);
+			Py_END_ALLOW_THREADS
+			Py_INCREF(text);
+			result = Py_BuildValue("(NNNN)", text, starts, suffixArray, documentArray);
+		});
+	}
+	Py_XDECREF(text);
+	Py_DECREF(documents);
+	return result;
+}
+
+template <>
+struct TTypeCode<int32_t> {
+	static_assert(sizeof(int) == 4, "array typecode 'i' must be 32-bit");
+	static constexpr const char* Value = "i";
+};
+
+template <>
+struct TTypeCode<int64_t> {
+	static_assert(sizeof(long) == 8, "array typecode 'l' must be 64-bit");
+	static constexpr const char* Value = "l";
+};
+
+// Suffix tree in parallel arrays, the same layout as algolib.suffix_tree.CompactSuffixTree.
+// Nodes are indexes, root is 0, -1 marks missing child/sibling/parent.
+// Siblings are sorted by the first symbol of their edges.
+template <class TIndex>
+struct TSuffixTreeArrays {
+	enum {
+		EdgeStart,
+		EdgeEnd,
+		FirstChild,
+		NextSibling,
+		Link,
+		Parent,
+		Count
+	};
+	std::array<TIndex*, Count> Arrays;
+
+	TIndex* operator[](size_t i) const {
+		return Arrays[i];
+	}
+};
+
+// Ukkonen online construction. Arrays must have room for 2 * size + 1 nodes,
+// first_child, next_sibling and parent filled with -1, link with 0.
+// Returns the number of nodes.
+template <class TIndex, class TSymbol>
+size_t BuildSuffixTree(const TSymbol* s, size_t size, const TSuffixTreeArrays<TIndex>& tree) {
+	using TArrays = TSuffixTreeArrays<TIndex>;
+	TIndex* edgeStart = tree[TArrays::EdgeStart];
+	TIndex* edgeEnd = tree[TArrays::EdgeEnd];
+	TIndex* firstChild = tree[TArrays::FirstChild];
+	TIndex* nextSibling = tree[TArrays::NextSibling];
+	TIndex* link = tree[TArrays::Link];
+	TIndex* parent = tree[TArrays::Parent];
+	TIndex n = size;
+	TIndex nodeCount = 1;
+
+	// Children are kept sorted by the first symbol of their edges
+	auto newNode = [&] (TIndex parentNode, TIndex start, TIndex end) {
+		TIndex node = nodeCount++;
+		edgeStart[node] = start;
+		edgeEnd[node] = end;
+		parent[node] = parentNode;
+		TIndex prev = -1;
+		TIndex next = firstChild[parentNode];
+		while (next != -1 && s[edgeStart[next]] < s[start]) {
+			prev = next;
+			next = nextSibling[next];
+		}
+		nextSibling[node] = next;
+		if (prev == -1)
+			firstChild[parentNode] = node;
+		else
+			nextSibling[prev] = node;
+		return node;
+	};
+
+	// Active point: node, position of the first symbol of active edge and
+	// how many symbols of the edge are matched
+	TIndex activeNode = 0;
+	TIndex activeEdge = 0;
+	TIndex activeLength = 0;
+	TIndex remainder = 0;
+	for (TIndex i = 0; i < n; ++i) {
+		TSymbol c = s[i];
+		++remainder;
+		// Internal node which needs suffix link to the next node we stop at
+		TIndex waitingForLink = -1;
+		while (remainder) {
+			if (!activeLength)
+				activeEdge = i;
+			TSymbol first = s[activeEdge];
+			TIndex child = firstChild[activeNode];
+			while (child != -1 && s[edgeStart[child]] != first)
+				child = nextSibling[child];
+
+			if (child == -1) {
+				newNode(activeNode, i, n);
+				if (waitingForLink > 0)
+					link[waitingForLink] = activeNode;
+				waitingForLink = activeNode;
+			} else {
+				TIndex edgeLength = std::min(edgeEnd[child], i + 1) - edgeStart[child];
+				if (activeLength >= edgeLength) {
+					// Skip/count trick
+					activeEdge += edgeLength;
+					activeLength -= edgeLength;
+					activeNode = child;
+					continue;
+				}
+				if (s[edgeStart[child] + activeLength] == c) {
+					++activeLength;
+					if (waitingForLink > 0)
+						link[waitingForLink] = activeNode;
+					break;
+				}
+
+				// Split edge into activeNode -> middle -> child
+				TIndex splitAt = edgeStart[child] + activeLength;
+				TIndex middle = nodeCount++;
+				edgeStart[middle] = edgeStart[child];
+				edgeEnd[middle] = splitAt;
+				parent[middle] = activeNode;
+				nextSibling[middle] = nextSibling[child];
+				if (firstChild[activeNode] == child) {
+					firstChild[activeNode] = middle;
+				} else {
+					TIndex prev = firstChild[activeNode];
+					while (nextSibling[prev] != child)
+						prev = nextSibling[prev];
+					nextSibling[prev] = middle;
+				}
+				edgeStart[child] = splitAt;
+				parent[child] = middle;
+				nextSibling[child] = -1;
+				firstChild[middle] = child;
+				newNode(middle, i, n);
+
+				if (waitingForLink > 0)
+					link[waitingForLink] = middle;
+				waitingForLink = middle;
+			}
+
+			--remainder;
+			if (activeNode == 0 && activeLength) {
+				--activeLength;
+				activeEdge = i - remainder + 1;
+			} else {
+				activeNode = link[activeNode];
+			}
+		}
+	}
+	return nodeCount;
+}
+
+template <class TIndex>
+PyObject* SuffixTreeToArrays(const TBufferView& input) {
+	using TArrays = TSuffixTreeArrays<TIndex>;
+	size_t capacity = 2 * input.Size + 1;
+	const TIndex initial[TArrays::Count] = {0, 0, -1, -1, 0, -1};
+
+	PyObject* result = PyTuple_New(TArrays::Count);
+	if (!result)
+		return nullptr;
+	TArrays tree;
+	std::array<TBufferView, TArrays::Count> views;
+	for (size_t i = 0; i < TArrays::Count; ++i) {
+		PyObject* arr = NewTypedArray<TIndex>(capacity);
+		if (!arr || !views[i].Acquire(arr, true)) {
+			Py_XDECREF(arr);
+			Py_DECREF(result);
+			return nullptr;
+		}
+		PyTuple_SET_ITEM(result, i, arr);
+		tree.Arrays[i] = static_cast<TIndex*>(views[i].Data);
+		std::fill_n(tree.Arrays[i], capacity, initial[i]);
+	}
+
+	size_t nodeCount;
+	Py_BEGIN_ALLOW_THREADS
+	VisitSymbols(input, [&] (auto s) {
+		nodeCount = BuildSuffixTree(s, input.Size, tree);
+	});
+	Py_END_ALLOW_THREADS
+
+	// Arrays can't be resized while their buffers are exported
+	for (auto& view : views)
+		view.Release();
+	for (size_t i = 0; i < TArrays::Count; ++i) {
+		if (PySequence_DelSlice(PyTuple_GET_ITEM(result, i), nodeCount, capacity) != 0) {
+			Py_DECREF(result);
+			return nullptr;
+		}
+	}
+	return result;
+}
+
+PyObject* py_suffix_tree_build(PyObject* m, PyObject* pyArr) {
+	PyObject* pyBuffer = ListToBuffer(pyArr);
+	if (!pyBuffer)
+		return nullptr;
+	TBufferView input;
+	PyObject* result = nullptr;
+	if (input.Acquire(pyBuffer, false)) {
+		if (FitsIndex<int32_t>(2 * input.Size + 1, 0))
+			result = SuffixTreeToArrays<int32_t>(input);
+		else
+			result = SuffixTreeToArrays<int64_t>(input);
+	}
+	Py_DECREF(pyBuffer);
+	return result;
+}
+
+PyObject* py_bwt_pixels(PyObject* m, PyObject* pyArr) {
+	if (!PyList_Check(pyArr)) {
+		return PyErr_Format(PyExc_TypeError, "arr must be of type list");
+	}
+
+	std::vector<uint32_t> arr;
+	try {
+		arr = PyListToVector<uint32_t>(pyArr);
+	} catch (const TPyErr&) {
+		return nullptr;
+	}
+
+	std::vector<uint32_t> suffixArray;
+	Py_BEGIN_ALLOW_THREADS
+	for (size_t i = 0; i < arr.size(); ++i) {
+		if (arr[i] == 255)
+			arr[i] = 254;
+	}
+	arr.back() = 255;
+
+	suffixArray = SuffixArrayKS(arr, 255u);
+	Py_END_ALLOW_THREADS
+
+	return SequenceToPyList(arr.size(), [&] (size_t pos) {
+		return PyInt_FromSize_t(
+			arr[(suffixArray[pos] + suffixArray.size() - 1) % suffixArray.size()]
+		);
+	});
+}
+
+// Manacher algorithm over both kinds of centers: s[i - odd[i], i + odd[i]] and
+// s[i - even[i], i + even[i]) are the maximal palindromes centered at i and between i - 1 and i
+template <class TSymbol, class TIndex>
+void PalindromeRadii(const TSymbol* s, Py_ssize_t size, TIndex* odd, TIndex* even) {
+	// Rightmost palindrome found so far is s[l, r]
+	Py_ssize_t l = 0, r = -1;
+	for (Py_ssize_t i = 0; i < size; ++i) {
+		Py_ssize_t k = i > r ? 0 : std::min<Py_ssize_t>(odd[l + r - i], r - i);
+		while (i - k - 1 >= 0 && i + k + 1 < size && s[i - k - 1] == s[i + k + 1])
+			++k;
+		odd[i] = k;
+		if (i + k > r) {
+			l = i - k;
+			r = i + k;
+		}
+	}
+	l = 0;
+	r = -1;
+	for (Py_ssize_t i = 0; i < size; ++i) {
+		Py_ssize_t k = i > r ? 0 : std::min<Py_ssize_t>(even[l + r - i + 1], r - i + 1);
+		while (i - k - 1 >= 0 && i + k < size && s[i - k - 1] == s[i + k])
+			++k;
+		even[i] = k;
+		if (i + k - 1 > r) {
+			l = i - k;
+			r = i + k - 1;
+		}
+	}
+}
+
+PyObject* py_palindrome_radii(PyObject* m, PyObject* pyArr) {
+	TBufferView input;
+	if (!input.Acquire(pyArr, false))
+		return nullptr;
+	size_t indexSize = FitsIndex<uint32_t>(input.Size, 0) ? sizeof(uint32_t) : sizeof(uint64_t);
+	PyObject* result = nullptr;
+	VisitIndexSize(indexSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		TBufferView oddView, evenView;
+		PyObject* odd = PrepareOutput<TIndex>(nullptr, input.Size, oddView);
+		PyObject* even = odd ? PrepareOutput<TIndex>(nullptr, input.Size, evenView) : nullptr;
+		if (!even) {
+			Py_XDECREF(odd);
+			return;
+		}
+		Py_BEGIN_ALLOW_THREADS
+		VisitSymbols(input, [&] (auto s) {
+			PalindromeRadii(s, input.Size, static_cast<TIndex*>(oddView.Data), static_cast<TIndex*>(evenView.Data));
+		});
+		Py_END_ALLOW_THREADS
+		result = Py_BuildValue("(NN)", odd, even);
+	});
+	return result;
+}
+
+// Whether arr[l, r) is a palindrome, given radii from PalindromeRadii
+template <class TIndex>
+bool IsPalindrome(const TIndex* odd, const TIndex* even, size_t l, size_t r) {
+	size_t length = r - l;
+	if (length % 2)
+		return odd[(l + r) / 2] >= length / 2;
+	return !length || even[(l + r) / 2] >= length / 2;
+}
+
+// Ranges of queries as a flat buffer l0, r0, l1, r1, ... Returns false and sets error if it's invalid
+bool CheckRanges(const TBufferView& ranges, size_t size) {
+	if (ranges.Size % 2) {
+		PyErr_Format(PyExc_ValueError, "ranges must have even number of positions");
+		return false;
+	}
+	bool ok = true;
+	VisitSymbols(ranges, [&] (auto data) {
+		for (size_t q = 0; q < ranges.Size && ok; q += 2)
+			ok = data[q] <= data[q + 1] && data[q + 1] <= size;
+	});
+	if (!ok)
+		PyErr_Format(PyExc_IndexError, "invalid range");
+	return ok;
+}
+
+PyObject* py_palindrome_many(PyObject* m, PyObject* args) {
+	PyObject* pyOdd;
+	PyObject* pyEven;
+	PyObject* pyRanges;
+	if (!PyArg_ParseTuple(args, "OOO", &pyOdd, &pyEven, &pyRanges))
+		return nullptr;
+	TBufferView odd, even, ranges;
+	if (!odd.Acquire(pyOdd, false) || !even.Acquire(pyEven, false) || !ranges.Acquire(pyRanges, false))
+		return nullptr;
+	if (odd.Size != even.Size || odd.ItemSize != even.ItemSize || odd.ItemSize < sizeof(uint32_t))
+		return PyErr_Format(PyExc_ValueError, "odd and even must be radii from palindrome_radii");
+	if (!CheckRanges(ranges, odd.Size))
+		return nullptr;
+
+	size_t count = ranges.Size / 2;
+	TBufferView resultView;
+	PyObject* result = PrepareOutput<uint8_t>(nullptr, count, resultView);
+	if (!result)
+		return nullptr;
+	uint8_t* out = static_cast<uint8_t*>(resultView.Data);
+	Py_BEGIN_ALLOW_THREADS
+	VisitIndexSize(odd.ItemSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		const TIndex* oddData = static_cast<const TIndex*>(odd.Data);
+		const TIndex* evenData = static_cast<const TIndex*>(even.Data);
+		VisitSymbols(ranges, [&] (auto rangesData) {
+			for (size_t q = 0; q < count; ++q)
+				out[q] = IsPalindrome(oddData, evenData, rangesData[2 * q], rangesData[2 * q + 1]);
+		});
+	});
+	Py_END_ALLOW_THREADS
+	return result;
+}
+
+// Sparse table over keys (size - radius) * (size + 1) + center, see algolib.manacher.PalyndromeQueries
+struct TRadiusMaxima {
+	const uint64_t* Keys;
+	const uint64_t* Table;
+	size_t Size;
+	size_t BlockSize;
+
+	// Largest radius k in [minRadius, maxRadius] of a palindrome inside [l, r) with center in
+	// [l + k, r - k + lastCenterOffset). Returns false if there is none.
+	bool Widest(size_t l, size_t r, size_t minRadius, size_t maxRadius, size_t lastCenterOffset, size_t& center, size_t& radius) const {
+		bool found = false;
+		while (minRadius <= maxRadius) {
+			size_t k = minRadius + (maxRadius - minRadius) / 2;
+			uint64_t key = RangeMin(Keys, Size, Table, BlockSize, l + k, r - k + lastCenterOffset);
+			if (Size - key / (Size + 1) >= k) {
+				found = true;
+				center = key % (Size + 1);
+				radius = k;
+				minRadius = k + 1;
+			} else {
+				if (!k)
+					break;
+				maxRadius = k - 1;
+			}
+		}
+		return found;
+	}
+};
+
+PyObject* py_longest_palindrome_many(PyObject* m, PyObject* args) {
+	PyObject* pyOdd;
+	PyObject* pyEven;
+	PyObject* pyOddKeys;
+	PyObject* pyOddTable;
+	PyObject* pyEvenKeys;
+	PyObject* pyEvenTable;
+	Py_ssize_t blockSize;
+	PyObject* pyRanges;
+	if (!PyArg_ParseTuple(args, "OOOOOOnO", &pyOdd, &pyEven, &pyOddKeys, &pyOddTable, &pyEvenKeys, &pyEvenTable, &blockSize, &pyRanges))
+		return nullptr;
+	TBufferView odd, even, oddKeys, oddTable, evenKeys, evenTable, ranges;
+	if (
+		!odd.Acquire(pyOdd, false) || !even.Acquire(pyEven, false) || !oddKeys.Acquire(pyOddKeys, false)
+		|| !oddTable.Acquire(pyOddTable, false) || !evenKeys.Acquire(pyEvenKeys, false)
+		|| !evenTable.Acquire(pyEvenTable, false) || !ranges.Acquire(pyRanges, false)
+	)
+		return nullptr;
+	if (blockSize < 1)
+		return PyErr_Format(PyExc_ValueError, "block_size must be positive");
+	size_t size = odd.Size;
+	size_t blocks = (size + blockSize - 1) / blockSize;
+	size_t tableSize = SparseTableLevels(blocks) * blocks;
+	if (
+		even.Size != size || oddKeys.Size != size || evenKeys.Size != size
+		|| oddTable.Size != tableSize || evenTable.Size != tableSize
+		|| oddKeys.ItemSize != sizeof(uint64_t) || evenKeys.ItemSize != sizeof(uint64_t)
+		|| oddTable.ItemSize != sizeof(uint64_t) || evenTable.ItemSize != sizeof(uint64_t)
+	)
+		return PyErr_Format(PyExc_ValueError, "keys and tables don't match radii and block_size");
+	if (!CheckRanges(ranges, size))
+		return nullptr;
+
+	size_t count = ranges.Size / 2;
+	TBufferView resultView;
+	PyObject* result = PrepareOutput<uint64_t>(nullptr, 2 * count, resultView);
+	if (!result)
+		return nullptr;
+	uint64_t* out = static_cast<uint64_t*>(resultView.Data);
+	const TRadiusMaxima oddMaxima{static_cast<const uint64_t*>(oddKeys.Data), static_cast<const uint64_t*>(oddTable.Data), size, size_t(blockSize)};
+	const TRadiusMaxima evenMaxima{static_cast<const uint64_t*>(evenKeys.Data), static_cast<const uint64_t*>(evenTable.Data), size, size_t(blockSize)};
+	Py_BEGIN_ALLOW_THREADS
+	VisitSymbols(ranges, [&] (auto rangesData) {
+		for (size_t q = 0; q < count; ++q) {
+			size_t l = rangesData[2 * q];
+			size_t r = rangesData[2 * q + 1];
+			size_t length = r - l;
+			out[2 * q] = out[2 * q + 1] = l;
+			if (!length)
+				continue;
+			size_t center = l, radius = 0;
+			oddMaxima.Widest(l, r, 0, (length - 1) / 2, 0, center, radius);
+			out[2 * q] = center - radius;
+			out[2 * q + 1] = center + radius + 1;
+			// Even palindrome centered between center - 1 and center
+			if (evenMaxima.Widest(l, r, radius + 1, length / 2, 1, center, radius)) {
+				out[2 * q] = center - radius;
+				out[2 * q + 1] = center + radius;
+			}
+		}
+	});
+	Py_END_ALLOW_THREADS
+	return result;
+}
+
+// Duval algorithm: calls onFactor(start) for every factor of the Lyndon factorization of s
+template <class TSymbol, class TFunc>
+void LyndonFactorization(const TSymbol* s, size_t size, TFunc&& onFactor) {
+	size_t i = 0;
+	while (i < size) {
+		// s[i, j) is a power of Lyndon word of length j - k followed by its prefix
+		size_t j = i + 1;
+		size_t k = i;
+		while (j < size && s[k] <= s[j]) {
+			k = s[k] < s[j] ? i : k + 1;
+			++j;
+		}
+		for (; i <= k; i += j - k)
+			onFactor(i);
+	}
+}
+
+// Start of the lexicographically minimal rotation (the first one if there are several):
+// Duval algorithm over s + s, the last factor which starts in the first half
+template <class TSymbol>
+size_t MinRotation(const TSymbol* s, size_t size) {
+	auto at = [&] (size_t pos) {
+		return s[pos < size ? pos : pos - size];
+	};
+	size_t result = 0;
+	size_t i = 0;
+	while (i < size) {
+		result = i;
+		size_t j = i + 1;
+		size_t k = i;
+		while (j < 2 * size && at(k) <= at(j)) {
+			k = at(k) < at(j) ? i : k + 1;
+			++j;
+		}
+		while (i <= k)
+			i += j - k;
+	}
+	return result;
+}
+
+PyObject* py_lyndon_factorization(PyObject* m, PyObject* pyArr) {
+	TBufferView input;
+	if (!input.Acquire(pyArr, false))
+		return nullptr;
+	// Factor starts are collected first, there are at most len(arr) of them
+	std::vector<uint64_t> starts;
+	Py_BEGIN_ALLOW_THREADS
+	VisitSymbols(input, [&] (auto s) {
+		LyndonFactorization(s, input.Size, [&] (size_t start) {
+			starts.push_back(start);
+		});
+	});
+	Py_END_ALLOW_THREADS
+	size_t indexSize = FitsIndex<uint32_t>(input.Size, 0) ? sizeof(uint32_t) : sizeof(uint64_t);
+	PyObject* result = nullptr;
+	VisitIndexSize(indexSize, [&] (auto indexTag) {
+		using TIndex = decltype(indexTag);
+		TBufferView outView;
+		result = PrepareOutput<TIndex>(nullptr, starts.size(), outView);
+		if (result)
+			std::copy(starts.begin(), starts.end(), static_cast<TIndex*>(outView.Data));
+	});
+	return result;
+}
+
+PyObject* py_min_rotation(PyObject* m, PyObject* pyArr) {
+	TBufferView input;
+	if (!input.Acquire(pyArr, false))
+		return nullptr;
+	size_t result;
+	Py_BEGIN_ALLOW_THREADS
+	VisitSymbols(input, [&] (auto s) {
+		result = MinRotation(s, input.Size);
+	});
+	Py_END_ALLOW_THREADS
+	return PyInt_FromSize_t(result);
+}
+
+// Multiplier of rotation hashes (FNV-1a 64-bit prime), arithmetic is modulo 2 ** 64
+const uint64_t ROTATION_HASH_BASE = 1099511628211ULL;
+
+// Item i of a packed batch is data[offsets[i], offsets[i + 1]).
+// Calls func(data, offsets, run), run(onItem) calls onItem(i, item, begin, size, start) without the GIL
+// for every item, where item points to data[begin] and start is the start of its minimal rotation.
+template <class TFunc>
+bool VisitMinRotations(PyObject* pyData, PyObject* pyOffsets, TFunc&& func) {
+	TBufferView data, offsets;
+	if (!data.Acquire(pyData, false) || !offsets.Acquire(pyOffsets, false))
+		return false;
+	if (!offsets.Size) {
+		PyErr_Format(PyExc_ValueError, "offsets must have len(items) + 1 elements");
+		return false;
+	}
+	bool ok = true;
+	VisitSymbols(offsets, [&] (auto offsetsData) {
+		for (size_t i = 0; i < offsets.Size && ok; ++i)
+			ok = offsetsData[i] <= data.Size && (!i || offsetsData[i - 1] <= offsetsData[i]);
+	});
+	if (!ok) {
+		PyErr_Format(PyExc_ValueError, "offsets must be non-decreasing and not larger than len(data)");
+		return false;
+	}
+	size_t items = offsets.Size - 1;
+	return func(data, offsets, [&] (auto&& onItem) {
+		Py_BEGIN_ALLOW_THREADS
+		VisitSymbols(data, [&] (auto s) {
+			VisitSymbols(offsets, [&] (auto offsetsData) {
+				for (size_t i = 0; i < items; ++i) {
+					size_t begin = offsetsData[i];
+					size_t size = offsetsData[i + 1] - begin;
+					onItem(i, s + begin, begin, size, MinRotation(s + begin, size));
+				}
+			});
+		});
+		Py_END_ALLOW_THREADS
+	});
+}
+
+PyObject* py_min_rotations(PyObject* m, PyObject* args) {
+	PyObject* pyData;
+	PyObject* pyOffsets;
+	if (!PyArg_ParseTuple(args, "OO", &pyData, &pyOffsets))
+		return nullptr;
+	PyObject* result = nullptr;
+	VisitMinRotations(pyData, pyOffsets, [&] (const TBufferView& data, const TBufferView& offsets, auto&& run) {
+		TBufferView outView;
+		result = PrepareOutput<uint64_t>(nullptr, offsets.Size - 1, outView);
+		if (!result)
+			return false;
+		uint64_t* out = static_cast<uint64_t*>(outView.Data);
+		run([&] (size_t i, auto s, size_t begin, size_t size, size_t start) {
+			out[i] = start;
+		});
+		return true;
+	});
+	return result;
+}
+
+PyObject* py_canonical_rotations(PyObject* m, PyObject* args) {
+	PyObject* pyData;
+	PyObject* pyOffsets;
+	if (!PyArg_ParseTuple(args, "OO", &pyData, &pyOffsets))
+		return nullptr;
+	PyObject* result = nullptr;
+	VisitMinRotations(pyData, pyOffsets, [&] (const TBufferView& data, const TBufferView& offsets, auto&& run) {
+		size_t first, last;
+		VisitSymbols(offsets, [&] (auto offsetsData) {
+			first = offsetsData[0];
+			last = offsetsData[offsets.Size - 1];
+		});
+		VisitSymbols(data, [&] (auto dataTag) {
+			using TSymbol = std::remove_const_t<std::remove_pointer_t<decltype(dataTag)>>;
+			TBufferView outView;
+			result = PrepareOutput<TSymbol>(nullptr, last - first, outView);
+			if (!result)
+				return;
+			TSymbol* out = static_cast<TSymbol*>(outView.Data);
+			const TSymbol* symbols = static_cast<const TSymbol*>(data.Data);
+			run([&] (size_t i, auto, size_t begin, size_t size, size_t start) {
+				const TSymbol* item = symbols + begin;
+				TSymbol* dst = std::copy(item + start, item + size, out + begin - first);
+				std::copy(item, item + start, dst);
+			});
+		});
+		return result != nullptr;
+	});
+	return result;
+}
+
+PyObject* py_rotation_hashes(PyObject* m, PyObject* args) {
+	PyObject* pyData;
+	PyObject* pyOffsets;
+	if (!PyArg_ParseTuple(args, "OO", &pyData, &pyOffsets))
+		return nullptr;
+	PyObject* result = nullptr;
+	VisitMinRotations(pyData, pyOffsets, [&] (const TBufferView& data, const TBufferView& offsets, auto&& run) {
+		TBufferView outView;
+		result = PrepareOutput<uint64_t>(nullptr, offsets.Size - 1, outView);
+		if (!result)
+			return false;
+		uint64_t* out = static_cast<uint64_t*>(outView.Data);
+		run([&] (size_t i, auto s, size_t begin, size_t size, size_t start) {
+			// Starts with the size, so sequences of zeros of different sizes differ
+			uint64_t hash = size;
+			for (size_t j = start; j < size; ++j)
+				hash = hash * ROTATION_HASH_BASE + s[j] + 1;
+			for (size_t j = 0; j < start; ++j)
+				hash = hash * ROTATION_HASH_BASE + s[j] + 1;
+			out[i] = hash;
+		});
+		return true;
+	});
+	return result;
+}
+
+static PyMethodDef py_suffix_array_ext_methods[] = {
+    {"suffix_array_ks_helper",
+    (PyCFunction)py_suffix_array_helper<TKSAlgorithm>, METH_VARARGS | METH_KEYWORDS,
+     "suffix_array_ks_helper(arr, out=None) - Compute a suffix array.\n\n"
+     "arr is a list or a buffer of unsigned integers (str, bytearray, memoryview,\n"
+     "array.array, numpy array), buffers are not copied.\n"
+     "Returns array.array('I') (or 'L' for huge inputs) or fills and returns\n"
+     "`out`, a writable buffer of 4 or 8 byte integers."},
+
+    {"suffix_array_sais_helper",
+    (PyCFunction)py_suffix_array_helper<TSAISAlgorithm>, METH_VARARGS | METH_KEYWORDS,
+     "suffix_array_sais_helper(arr, out=None) - Compute a suffix array using SA-IS.\n\n"
+     "Same arguments and result as suffix_array_ks_helper."},
+
+    {"lcp_kasai",
+    (PyCFunction)py_lcp_helper<TKasaiAlgorithm>, METH_VARARGS | METH_KEYWORDS,
+     "lcp_kasai(arr, suf_arr, out=None) - Compute LCP array using Kasai algorithm.\n\n"
+     "arr and suf_arr are buffers of unsigned integers, lcp[rank] is the length\n"
+     "of common prefix of suffixes suf_arr[rank] and suf_arr[rank + 1].\n"
+     "Returns array.array('I') (or 'L' for huge inputs) of len(arr) - 1 elements\n"
+     "or fills and returns `out`."},
+
+    {"lcp_phi",
+    (PyCFunction)py_lcp_helper<TPhiAlgorithm>, METH_VARARGS | METH_KEYWORDS,
+     "lcp_phi(arr, suf_arr, out=None) - Compute LCP array using PLCP (phi) algorithm.\n\n"
+     "Same as lcp_kasai, but needs only the output array and size / 8 bytes."},
+
+    {"bwt_bytes",
+    (PyCFunction)py_bwt_bytes, METH_O,
+     "bwt_bytes(data) - Compute BWT transform of a byte buffer, returns str.\n\n"
+     "Last byte of data is expected to be a unique maximum."},
+
+    {"bwt_block",
+    (PyCFunction)py_bwt_block, METH_O,
+     "bwt_block(data) - Compute BWT transform of a byte buffer followed by end marker.\n\n"
+     "End marker is larger than all bytes and is not stored in the result.\n"
+     "Returns tuple (transformed str of len(data) bytes, index of end marker)."},
+
+    {"ibwt_bytes",
+    (PyCFunction)py_ibwt_bytes, METH_VARARGS,
+     "ibwt_bytes(data, dollar_marker) - Inverse BWT transform of a byte buffer, returns str.\n\n"
+     "Walk starts from the last occurrence of dollar_marker."},
+
+    {"ibwt_block",
+    (PyCFunction)py_ibwt_block, METH_VARARGS,
+     "ibwt_block(data, primary) - Inverse of bwt_block, returns str."},
+
+    {"mtf_rle0_encode",
+    (PyCFunction)py_mtf_rle0_encode, METH_O,
+     "mtf_rle0_encode(data) - Move-to-front and zero run length coding of a byte buffer.\n\n"
+     "Returns array.array('H') of symbols in range [0, 256]."},
+
+    {"mtf_rle0_decode",
+    (PyCFunction)py_mtf_rle0_decode, METH_O,
+     "mtf_rle0_decode(symbols) - Inverse of mtf_rle0_encode, returns str."},
+
+    {"lcp_lr",
+    (PyCFunction)py_lcp_lr, METH_O,
+     "lcp_lr(lcp) - LCP-LR arrays for binary search over the suffix array.\n\n"
+     "Returns tuple (llcp, rlcp) of array.array('I') (or 'L' for huge inputs)\n"
+     "of len(lcp) + 1 elements, see find_all."},
+
+    {"find_all",
+    (PyCFunction)py_find_all, METH_VARARGS,
+     "find_all(text, suf_arr, llcp, rlcp, patterns) - Batch search of patterns.\n\n"
+     "text and patterns are buffers of unsigned integers, llcp and rlcp come from lcp_lr.\n"
+     "Every pattern takes O(len(pattern) + log(len(text))) steps. Patterns are sorted,\n"
+     "the search of every one resumes from the steps of the previous one which only\n"
+     "depend on their common prefix, equal ones are searched once.\n"
+     "Returns array.array('L') of 2 * len(patterns)\n"
+     "items: range [begin, end) of suffix array ranks of every pattern."},
+
+    {"inverse_suffix_array",
+    (PyCFunction)py_inverse_suffix_array, METH_O,
+     "inverse_suffix_array(suf_arr) - Returns rank array: rank[suf_arr[i]] = i.\n\n"
+     "Result is array.array('I') (or 'L' for huge inputs)."},
+
+    {"sparse_table",
+    (PyCFunction)py_sparse_table, METH_VARARGS | METH_KEYWORDS,
+     "sparse_table(values, block_size=1) - Sparse table for range minimum queries.\n\n"
+     "Built over minima of blocks of block_size values. Level k takes items\n"
+     "[k * blocks, (k + 1) * blocks), item i of it is the minimum of blocks [i, i + 2 ** k).\n"
+     "Returns array.array with the item size of values."},
+
+    {"block_masks",
+    (PyCFunction)py_block_masks, METH_VARARGS,
+     "block_masks(values, block_size) - In-block minima of blocks of up to 32 values.\n\n"
+     "Bit s of masks[j] is set if values[start + s] is less than all values after it\n"
+     "up to j, start is the beginning of the block of j. The lowest bit of\n"
+     "masks[j] >> (i - start) is the offset of min(values[i:j + 1]) from i.\n"
+     "Returns array.array('I')."},
+
+    {"lce_many",
+    (PyCFunction)py_lce_many, METH_VARARGS,
+     "lce_many(rank, lcp, table, block_size, pairs, masks=None) - Batch longest common extension.\n\n"
+     "table is sparse_table(lcp, block_size), pairs is a flat buffer of positions\n"
+     "i0, j0, i1, j1, ... masks are block_masks(lcp, block_size), with them partial\n"
+     "blocks are looked up instead of scanned. Returns array.array('L') of lengths\n"
+     "of the longest common prefixes of suffixes i and j."},
+
+    {"generalized_suffix_array",
+    (PyCFunction)py_generalized_suffix_array, METH_O,
+     "generalized_suffix_array(documents) - Suffix array of many byte buffers at once.\n\n"
+     "Documents are concatenated, each followed by its own terminator 256 + index.\n"
+     "Returns tuple (text, starts, suf_arr, doc_arr): text is array.array('I') of the\n"
+     "concatenation, starts[i] is the offset of document i in it (plus total size at\n"
+     "the end), doc_arr[rank] is the document of suffix suf_arr[rank]."},
+
+    {"suffix_tree_build",
+    (PyCFunction)py_suffix_tree_build, METH_O,
+     "suffix_tree_build(arr) - Build suffix tree using Ukkonen algorithm.\n\n"
+     "arr is a list or a buffer of unsigned integers. Returns tuple of arrays\n"
+     "(edge_start, edge_end, first_child, next_sibling, link, parent) indexed by node,\n"
+     "array.array('i') (or 'l' for huge inputs), -1 marks missing nodes.\n"
+     "Children of every node are linked in lexicographic order."},
+
+    {"palindrome_radii",
+    (PyCFunction)py_palindrome_radii, METH_O,
+     "palindrome_radii(arr) - Manacher algorithm over a buffer of unsigned integers.\n\n"
+     "Returns tuple (odd, even) of array.array('I') (or 'L' for huge inputs) of len(arr)\n"
+     "items: arr[i - odd[i]:i + odd[i] + 1] and arr[i - even[i]:i + even[i]] are the\n"
+     "maximal palindromes centered at i and between i - 1 and i."},
+
+    {"palindrome_many",
+    (PyCFunction)py_palindrome_many, METH_VARARGS,
+     "palindrome_many(odd, even, ranges) - Batch palindrome test.\n\n"
+     "odd and even come from palindrome_radii, ranges is a flat buffer l0, r0, l1, r1, ...\n"
+     "Returns array.array('B'), item q is 1 if arr[l_q:r_q] is a palindrome."},
+
+    {"longest_palindrome_many",
+    (PyCFunction)py_longest_palindrome_many, METH_VARARGS,
+     "longest_palindrome_many(odd, even, odd_keys, odd_table, even_keys, even_table, block_size, ranges)\n"
+     "- Batch longest palindrome in ranges.\n\n"
+     "keys are array.array('L') of (len(odd) - radius) * (len(odd) + 1) + center for both\n"
+     "radii arrays, tables are their sparse_table(keys, block_size). Every query takes\n"
+     "O(log(r - l)) range minimum queries. Returns array.array('L') of 2 * len(ranges) / 2\n"
+     "items: range [begin, end) of a longest palindrome inside every [l, r)."},
+
+    {"lyndon_factorization",
+    (PyCFunction)py_lyndon_factorization, METH_O,
+     "lyndon_factorization(arr) - Lyndon factorization of a buffer of unsigned integers.\n\n"
+     "Returns array.array('I') (or 'L' for huge inputs) of starts of all factors."},
+
+    {"min_rotation",
+    (PyCFunction)py_min_rotation, METH_O,
+     "min_rotation(arr) - Start of the lexicographically minimal rotation of a buffer.\n\n"
+     "The smallest one if there are several, 0 for an empty buffer."},
+
+    {"min_rotations",
+    (PyCFunction)py_min_rotations, METH_VARARGS,
+     "min_rotations(data, offsets) - min_rotation of every item of a packed batch.\n\n"
+     "Item i is data[offsets[i]:offsets[i + 1]]. Returns array.array('L') of len(offsets) - 1\n"
+     "starts relative to items."},
+
+    {"canonical_rotations",
+    (PyCFunction)py_canonical_rotations, METH_VARARGS,
+     "canonical_rotations(data, offsets) - Minimal rotations of all items of a packed batch.\n\n"
+     "Returns array.array with the item size of data, rotated data[offsets[0]:offsets[-1]]."},
+
+    {"rotation_hashes",
+    (PyCFunction)py_rotation_hashes, METH_VARARGS,
+     "rotation_hashes(data, offsets) - Hashes of minimal rotations of all items of a packed batch.\n\n"
+     "Hash of symbols c_1 .. c_n is the polynomial n * B ** n + sum((c_i + 1) * B ** (n - i))\n"
+     "modulo 2 ** 64 with B = 1099511628211. Returns array.array('L')."},
+
+    {"bwt_pixels",
+    (PyCFunction)py_bwt_pixels, METH_O,
+     "bwt_pixels(arr) - Compute BWT transform of [0-255] values array."},
+
+
+    {NULL, NULL, 0, NULL}   /* sentinel */
+};
+
+PyMODINIT_FUNC
+initsuffix_array_ext(void)
+{
+    PyObject *m;
+
+    m = Py_InitModule("suffix_array_ext", py_suffix_array_ext_methods);
+    if (m == NULL)
+        return;
+    /* additional initialization can happen here */
+}
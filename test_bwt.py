@@ -11,3 +11,6 @@ def test_ibwt(sample_str):
 	dollar_sign = '\xff'
 	bwt_of_str = bwt(sample_str + dollar_sign)
 	assert ibwt_string(bwt_of_str, dollar_sign) == sample_str + dollar_sign
+
+def test_bwt_string(sample_str):
+	assert bwt_string(sample_str + '\xff') == ''.join(bwt_naive(sample_str + '\xff'))
@@ -19,7 +19,7 @@ def test_b2b_ks(sample_str):
 def test_b2b_ks_ext(sample_str):
 	correct = suffix_array_naive(sample_str)
 	ks_version = suffix_array_ks_ext(sample_str)
-	assert correct == ks_version
+	assert correct == list(ks_version)
 
 
 def common_prefix(s1, s2):
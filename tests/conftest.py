@@ -25,4 +25,29 @@ def gen_fixture_params():
 
 @pytest.fixture(**gen_fixture_params())
 def sample_str(request):
-	return request.param
\ No newline at end of file
+	return request.param
+
+def maybe_ext_fixture(*modules, **kwargs):
+	"""
+	Fixture which runs a test with suffix_array_ext and with it replaced by None
+	in every one of `modules`. numpy=True adds a variant without the extension
+	but with numpy, the python variant then disables numpy as well.
+	"""
+	with_numpy = kwargs.pop('numpy', False)
+	params = ['ext', 'numpy', 'python'] if with_numpy else ['ext', 'python']
+
+	@pytest.fixture(params=params)
+	def maybe_ext(request, monkeypatch):
+		if request.param == 'ext':
+			if modules[0].suffix_array_ext is None:
+				pytest.skip('suffix_array_ext is not available')
+			return
+		for module in modules:
+			monkeypatch.setattr(module, 'suffix_array_ext', None)
+		if request.param == 'numpy':
+			if modules[0].numpy is None:
+				pytest.skip('numpy is not available')
+		elif with_numpy:
+			for module in modules:
+				monkeypatch.setattr(module, 'numpy', None)
+	return maybe_ext
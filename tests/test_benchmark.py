@@ -0,0 +1,116 @@
+import json
+import pytest
+
+from algolib import benchmark as benchmark_module
+from algolib.benchmark import *
+
+def test_parse_size():
+	assert parse_size('1K') == 1024
+	assert parse_size('10m') == 10 << 20
+	assert parse_size('123') == 123
+	assert format_size(100 << 20) == '100M'
+	assert format_size(1500) == '1500'
+
+@pytest.mark.parametrize('corpus', list(CORPORA))
+def test_corpora(corpus):
+	make_corpus = CORPORA[corpus]
+	data = make_corpus(10000)
+	assert isinstance(data, str)
+	assert len(data) == 10000
+	assert make_corpus(10000) == data
+	assert make_corpus(100) == data[:100] or corpus in ('dna', 'repetitive')
+
+def test_corpora_content():
+	assert fibonacci_word(13) == 'abaababaabaab'
+	assert set(random_text(1000, 'acgt')) == set('acgt')
+	assert set(dna_text(10000)) == set('acgt')
+	assert random_text(100, 'ab') != random_text(100, 'ba')
+
+def test_file_corpus(tmpdir):
+	path = tmpdir.join('corpus.txt')
+	path.write('hello ')
+	assert file_corpus(str(path))(15) == 'hello hello hel'
+
+@pytest.mark.parametrize('fork', [True, False])
+def test_run_benchmarks(fork):
+	benchmarks = [BENCHMARKS['suffix_array_ks'], BENCHMARKS['factorize_lyndon'], BENCHMARKS['persistent_linked_list']]
+	corpora = collections.OrderedDict((name, CORPORA[name]) for name in ['random4', 'fibonacci'])
+	lines = []
+	results = run_benchmarks(benchmarks, corpora, [100, 200], fork=fork, log=lines.append)
+	assert [(r['benchmark'], r['corpus'], r['size']) for r in results] == [
+		('persistent_linked_list', NO_CORPUS, 100),
+		('suffix_array_ks', 'random4', 100),
+		('factorize_lyndon', 'random4', 100),
+		('suffix_array_ks', 'fibonacci', 100),
+		('factorize_lyndon', 'fibonacci', 100),
+		('persistent_linked_list', NO_CORPUS, 200),
+		('suffix_array_ks', 'random4', 200),
+		('factorize_lyndon', 'random4', 200),
+		('suffix_array_ks', 'fibonacci', 200),
+		('factorize_lyndon', 'fibonacci', 200),
+	]
+	for result in results:
+		assert result['seconds'] >= 0
+		assert result['peak_rss_mb'] >= 0
+	assert len(lines) == len(results)
+
+@pytest.mark.skipif(not current_rss_mb(), reason='/proc/self/statm is not available')
+def test_peak_rss_excludes_parent():
+	def prepare(data):
+		return lambda: len('x' * (40 << 20))
+	benchmark = Benchmark('allocating', prepare, 1 << 10, 'MB', lambda: True)
+	parent_memory = 'y' * (100 << 20)
+	result = measure_forked(benchmark, 'data', 1)
+	assert 30 < result['peak_rss_mb'] < 80
+	del parent_memory
+
+def test_all_benchmarks(monkeypatch):
+	monkeypatch.setattr(benchmark_module, 'QUERY_COUNT', 10)
+	corpora = {'fibonacci': fibonacci_word}
+	results = run_benchmarks(BENCHMARKS.values(), corpora, [300], repeat=1, fork=False)
+	assert [r['benchmark'] for r in results if 'error' in r] == []
+	assert set(r['benchmark'] for r in results) == set(b.name for b in BENCHMARKS.itervalues() if b.available())
+
+def test_query_benchmark_operations(monkeypatch):
+	if not BENCHMARKS['fm_index_count'].available():
+		pytest.skip('suffix_array_ext is not available')
+	monkeypatch.setattr(benchmark_module, 'QUERY_COUNT', 7)
+	run, operations = prepare_fm_index_count(fibonacci_word(1000))
+	assert operations == 7
+	run, operations = prepare_fm_index_locate(fibonacci_word(1000))
+	assert operations >= 7
+
+def test_run_benchmarks_skips_large_sizes():
+	benchmark = BENCHMARKS['suffix_array_ks']._replace(max_size=100)
+	assert len(run_benchmarks([benchmark], {'fibonacci': fibonacci_word}, [100, 200], fork=False)) == 1
+
+def test_failed_benchmark():
+	def prepare(data):
+		def run():
+			raise MemoryError()
+		return run
+	benchmark = Benchmark('failing', prepare, 1 << 10, 'MB', lambda: True)
+	results = run_benchmarks([benchmark], {'fibonacci': fibonacci_word}, [10])
+	assert results[0]['error'] == 'MemoryError'
+	assert 'FAILED' in format_result(results[0])
+
+def test_compare_results(tmpdir):
+	base = [
+		{'benchmark': 'a', 'corpus': 'c', 'size': 10, 'seconds': 1.0, 'peak_rss_mb': 10.0},
+		{'benchmark': 'b', 'corpus': 'c', 'size': 10, 'seconds': 1.0, 'peak_rss_mb': 10.0},
+		{'benchmark': 'c', 'corpus': 'c', 'size': 10, 'seconds': 1.0, 'peak_rss_mb': 10.0},
+	]
+	new = [
+		{'benchmark': 'a', 'corpus': 'c', 'size': 10, 'seconds': 1.05, 'peak_rss_mb': 10.0},
+		{'benchmark': 'b', 'corpus': 'c', 'size': 10, 'seconds': 1.5, 'peak_rss_mb': 20.0},
+		{'benchmark': 'c', 'corpus': 'c', 'size': 10, 'error': 'MemoryError'},
+		{'benchmark': 'd', 'corpus': 'c', 'size': 10, 'seconds': 1.0, 'peak_rss_mb': 10.0},
+	]
+	path = str(tmpdir.join('results.json'))
+	save_results(path, base)
+	assert load_results(path) == base
+	assert json.load(open(path))['environment']['python']
+	comparison = compare_results(load_results(path), new)
+	assert [flags for (key, old, result, flags) in comparison] == [[], ['time', 'memory'], ['error']]
+	assert 'REGRESSION: time, memory' in format_comparison(comparison[1])
+	assert compare_results(base, new, threshold=1.0)[1][3] == []
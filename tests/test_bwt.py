@@ -0,0 +1,134 @@
+import random
+import StringIO
+import pytest
+from conftest import maybe_ext_fixture
+
+from algolib import bwt as bwt_module
+from algolib.bwt import *
+from algolib.compression import default_stages
+
+maybe_ext = maybe_ext_fixture(bwt_module, numpy=True)
+
+def test_bwt_block(sample_str, maybe_ext):
+	data, primary = bwt_block(sample_str)
+	assert len(data) == len(sample_str)
+	full = bwt_naive(sample_str + '\xff')
+	# Largest end marker works like '\xff' if it's not met in the string
+	assert data == ''.join(full[:primary] + full[primary + 1:])
+	assert full[primary] == '\xff'
+
+def test_ibwt_block(sample_str, maybe_ext):
+	data, primary = bwt_block(sample_str)
+	assert ibwt_block(data, primary) == sample_str
+
+def test_bwt_string(sample_str, maybe_ext):
+	text = sample_str + '\xff'
+	assert bwt_string(text) == ''.join(bwt_naive(text))
+	assert bwt_string('') == ''
+
+def test_ibwt_string(sample_str, maybe_ext):
+	dollar_sign = '\xff'
+	bwt_of_str = ''.join(bwt_naive(sample_str + dollar_sign))
+	assert ibwt_string(bwt_of_str, dollar_sign) == sample_str + dollar_sign
+	with pytest.raises(ValueError):
+		ibwt_string('abc', dollar_sign)
+
+def test_ibwt_block_primary_out_of_range(maybe_ext):
+	with pytest.raises(ValueError):
+		ibwt_block('abc', 4)
+
+def test_ibwt_block_binary(maybe_ext):
+	rnd = random.Random(0)
+	block = ''.join(chr(rnd.choice([0, 1, 254, 255])) for _ in xrange(300))
+	assert ibwt_block(*bwt_block(block)) == block
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, 7, 1000])
+def test_stream_roundtrip(block_size, maybe_ext):
+	rnd = random.Random(block_size)
+	data = ''.join(chr(rnd.randrange(256)) for _ in xrange(100)) + 'abacaba' * 10
+	compressed = StringIO.StringIO()
+	compress_stream(StringIO.StringIO(data), compressed, block_size)
+	stream = StringIO.StringIO(compressed.getvalue())
+	assert read_stream_header(stream) == []
+	frames = list(read_frames(stream))
+	assert len(frames) == (len(data) + block_size - 1) // block_size
+	assert len(compressed.getvalue()) == len(MAGIC) + 1 + len(data) + len(frames) * BLOCK_HEADER.size
+	output = StringIO.StringIO()
+	decompress_stream(StringIO.StringIO(compressed.getvalue()), output)
+	assert output.getvalue() == data
+
+def test_stream_compressed():
+	data = 'abracadabra' * 1000 + ''.join(map(chr, xrange(256)))
+	compressed = StringIO.StringIO()
+	compress_stream(StringIO.StringIO(data), compressed, 4096, default_stages())
+	assert len(compressed.getvalue()) < len(data) // 4
+	output = StringIO.StringIO()
+	decompress_stream(StringIO.StringIO(compressed.getvalue()), output)
+	assert output.getvalue() == data
+
+def test_stream_empty():
+	compressed = StringIO.StringIO()
+	compress_stream(StringIO.StringIO(''), compressed)
+	assert compressed.getvalue() == MAGIC + '\x00'
+	output = StringIO.StringIO()
+	decompress_stream(StringIO.StringIO(compressed.getvalue()), output)
+	assert output.getvalue() == ''
+
+def test_stream_errors():
+	with pytest.raises(ValueError):
+		decompress_stream(StringIO.StringIO('not a stream'), StringIO.StringIO())
+	with pytest.raises(ValueError):
+		decompress_stream(StringIO.StringIO(MAGIC), StringIO.StringIO())
+	with pytest.raises(ValueError):
+		decompress_stream(StringIO.StringIO(MAGIC + '\x02\x03'), StringIO.StringIO())
+	with pytest.raises(ValueError):
+		decompress_stream(StringIO.StringIO(MAGIC + '\x01\xff'), StringIO.StringIO())
+	compressed = StringIO.StringIO()
+	compress_stream(StringIO.StringIO('abacaba'), compressed)
+	with pytest.raises(ValueError):
+		decompress_stream(StringIO.StringIO(compressed.getvalue()[:-1]), StringIO.StringIO())
+	with pytest.raises(ValueError):
+		decompress_stream(StringIO.StringIO(compressed.getvalue()[:len(MAGIC) + 4]), StringIO.StringIO())
+	with pytest.raises(ValueError):
+		compress_stream(StringIO.StringIO('abacaba'), StringIO.StringIO(), block_size=0)
+
+class RecordingStream(object):
+	"""Output stream that remembers how far input was read at each write"""
+	def __init__(self, input_stream):
+		self.input_stream = input_stream
+		self.read_positions = []
+		self.output = StringIO.StringIO()
+
+	def write(self, data):
+		self.read_positions.append(self.input_stream.tell())
+		self.output.write(data)
+
+@pytest.mark.parametrize('stages', [(), default_stages()], ids=['plain', 'compressed'])
+@pytest.mark.parametrize('threads', [1, 4])
+@pytest.mark.parametrize('block_size', [1, 5, 64])
+def test_block_compressor(threads, block_size, stages, maybe_ext):
+	rnd = random.Random(block_size)
+	data = ''.join(chr(rnd.randrange(256)) for _ in xrange(200)) + 'abracadabra' * 20
+	compressor = BlockCompressor(block_size, threads=threads, stages=stages)
+
+	compressed = StringIO.StringIO()
+	compressor.compress(StringIO.StringIO(data), compressed)
+	# Same as sequential version
+	expected = StringIO.StringIO()
+	compress_stream(StringIO.StringIO(data), expected, block_size, stages)
+	assert compressed.getvalue() == expected.getvalue()
+
+	output = StringIO.StringIO()
+	compressor.decompress(StringIO.StringIO(compressed.getvalue()), output)
+	assert output.getvalue() == data
+
+def test_block_compressor_back_pressure():
+	block_size = 10
+	max_pending = 3
+	input_stream = StringIO.StringIO('x' * block_size * 50)
+	output = RecordingStream(input_stream)
+	BlockCompressor(block_size, threads=2, max_pending=max_pending).compress(input_stream, output)
+	# Header and frame headers are also writes
+	frame_writes = output.read_positions[1::2]
+	for written, read_position in enumerate(frame_writes):
+		assert read_position <= (written + max_pending + 1) * block_size
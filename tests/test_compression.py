@@ -0,0 +1,97 @@
+import array
+import random
+import pytest
+from conftest import maybe_ext_fixture
+
+from algolib import compression
+from algolib.compression import *
+
+maybe_ext = maybe_ext_fixture(compression)
+
+def sample_blocks():
+	rnd = random.Random(0)
+	return [
+		'',
+		'a',
+		'\x00',
+		'\x00' * 1000,
+		'abracadabra',
+		'\xff\x00' * 50,
+		''.join(map(chr, xrange(256))),
+		''.join(chr(rnd.choice([0, 0, 0, 1, 200])) for _ in xrange(500)),
+		''.join(chr(rnd.randrange(256)) for _ in xrange(1000)),
+	]
+
+@pytest.mark.parametrize('block', sample_blocks())
+def test_move_to_front(block):
+	encoded = MoveToFront().encode(block)
+	assert len(encoded) == len(block)
+	assert MoveToFront().decode(encoded) == block
+
+def test_move_to_front_encode():
+	assert MoveToFront().encode('aaab') == '\x61\x00\x00\x62'
+	assert MoveToFront().encode('abab') == '\x61\x62\x01\x01'
+
+@pytest.mark.parametrize('run', range(10))
+def test_zero_run_length(run):
+	encoded = ZeroRunLength().encode('\x00' * run + '\x05')
+	assert encoded[-1] == 6
+	digits = encoded[:-1]
+	assert all(digit in (ZeroRunLength.RUNA, ZeroRunLength.RUNB) for digit in digits)
+	assert sum((digit + 1) << i for i, digit in enumerate(digits)) == run
+	assert ZeroRunLength().decode(encoded) == '\x00' * run + '\x05'
+
+def test_zero_run_length_errors():
+	with pytest.raises(ValueError):
+		ZeroRunLength().decode(array.array('H', [257]))
+
+@pytest.mark.parametrize('block', sample_blocks())
+def test_move_to_front_run_length(block, maybe_ext):
+	stage = MoveToFrontRunLength()
+	encoded = stage.encode(block)
+	assert list(encoded) == list(ZeroRunLength().encode(MoveToFront().encode(block)))
+	assert stage.decode(encoded) == block
+	assert stage.decode(list(encoded)) == block
+
+@pytest.mark.parametrize('block', sample_blocks())
+def test_huffman(block):
+	coder = HuffmanCoder()
+	assert coder.decode(coder.encode(block)) == block
+
+def test_huffman_large_alphabet():
+	block = array.array('H', [0, 1, 256, 256, 300, 1, 1])
+	coder = HuffmanCoder()
+	assert coder.decode(coder.encode(block)) == block
+
+def test_huffman_code_lengths():
+	assert huffman_code_lengths([]) == []
+	assert huffman_code_lengths([0, 5, 0]) == [0, 1, 0]
+	assert huffman_code_lengths([1, 1, 2]) == [2, 2, 1]
+	codes = canonical_huffman_codes([2, 2, 1])
+	assert codes == ['10', '11', '0']
+
+def test_huffman_errors():
+	coder = HuffmanCoder()
+	with pytest.raises(ValueError):
+		coder.decode('')
+	encoded = coder.encode('abracadabra')
+	with pytest.raises(ValueError):
+		coder.decode(encoded[:-1])
+
+@pytest.mark.parametrize('block', sample_blocks())
+def test_pipeline(block, maybe_ext):
+	stages = default_stages()
+	encoded = encode_stages(block, stages)
+	assert isinstance(encoded, str)
+	assert decode_stages(encoded, stages) == block
+
+def test_pipeline_compresses():
+	# Long runs are typical for BWT output
+	block = 'r' * 300 + 'd' * 100 + 'a' * 500 + 'c' * 100 + 'b' * 200
+	assert len(encode_stages(block, default_stages())) < len(block) // 4
+
+def test_stages_from_ids():
+	ids = [stage.stage_id for stage in default_stages()]
+	assert [type(stage) for stage in stages_from_ids(ids)] == map(type, default_stages())
+	with pytest.raises(ValueError):
+		stages_from_ids([0])
@@ -0,0 +1,53 @@
+import collections
+import random
+import pytest
+
+from algolib.eertree import *
+
+def naive_palyndromes(s):
+	counts = collections.Counter(
+		s[i:j] for i in xrange(len(s)) for j in xrange(i + 1, len(s) + 1) if s[i:j] == s[i:j][::-1]
+	)
+	return counts
+
+def naive_longest_suffix(s):
+	return next(i for i in xrange(len(s) + 1) if s[i:] == s[i:][::-1])
+
+def check_tree(s):
+	tree = Eertree()
+	for i, c in enumerate(s):
+		node = tree.append(c)
+		prefix = s[:i + 1]
+		assert tree.longest_suffix() == (naive_longest_suffix(prefix), i + 1)
+		assert ''.join(tree.palyndrome(node)) == prefix[naive_longest_suffix(prefix):]
+	expected = naive_palyndromes(s)
+	assert len(tree) == len(s)
+	assert tree.distinct_count() == len(expected)
+	found = {s[begin:end]: count for (begin, end, count) in tree.palyndromes()}
+	assert found == expected
+	for begin, end, _ in tree.palyndromes():
+		assert s.find(s[begin:end]) == begin
+
+def test_eertree(sample_str):
+	check_tree(sample_str)
+
+def test_eertree_random():
+	rnd = random.Random(0)
+	for size in xrange(1, 80):
+		check_tree(''.join(rnd.choice('ab' if size % 2 else 'abc') for _ in xrange(size)))
+
+def test_eertree_structure():
+	tree = Eertree('eertree')
+	palyndromes = [''.join(tree.palyndrome(node)) for node in xrange(2, len(tree.length))]
+	assert palyndromes == ['e', 'ee', 'r', 't', 'rtr', 'ertre', 'eertree']
+	links = [''.join(tree.palyndrome(tree.link[node])) for node in xrange(2, len(tree.length))]
+	assert links == ['', 'e', '', '', 'r', 'e', 'ee']
+	assert tree.length[IMAGINARY] == -1 and tree.length[EMPTY] == 0
+	assert tree.occurrences()[2] == 4
+
+def test_eertree_sequences():
+	tree = Eertree([10 ** 12, 5, 10 ** 12])
+	tree.extend([5])
+	assert tree.distinct_count() == 4
+	assert tree.palyndrome(tree.last) == [5, 10 ** 12, 5]
+	assert Eertree().longest_suffix() == (0, 0)
@@ -0,0 +1,74 @@
+import random
+import pytest
+from conftest import maybe_ext_fixture
+
+from algolib import fm_index as fm_index_module
+from algolib import suffix_array as sa_module
+from algolib.fm_index import FMIndex, SortedSamples
+
+maybe_ext = maybe_ext_fixture(fm_index_module, numpy=True)
+
+def naive_locate(text, pattern):
+	return [i for i in xrange(len(text) + 1) if text[i:i + len(pattern)] == pattern]
+
+def all_substrings(s):
+	return set(s[i:j] for i in xrange(len(s) + 1) for j in xrange(i, len(s) + 1))
+
+@pytest.mark.parametrize('sa_sample_rate, occ_sample_rate', [(1, 1), (3, 2), (32, 64)])
+def test_fm_index(sample_str, sa_sample_rate, occ_sample_rate):
+	index = FMIndex(sample_str, sa_sample_rate, occ_sample_rate)
+	assert len(index) == len(sample_str)
+	for pattern in all_substrings(sample_str) | {'z', 'ba' * 10, sample_str + 'a'}:
+		expected = naive_locate(sample_str, pattern)
+		assert index.count(pattern) == len(expected)
+		assert index.locate(pattern) == expected
+
+@pytest.mark.parametrize('text', ['abracadabra', [5, 1000, 5, 3, 1000] * 3 + range(300)])
+def test_fm_index_transform(text, maybe_ext):
+	index = FMIndex(text, sa_sample_rate=2, occ_sample_rate=3)
+	codes = [index.codes[c] for c in text] + [len(index.alphabet)]
+	rows = sorted(xrange(len(codes)), key=lambda pos: codes[pos:])
+	assert [index.code_at(row) for row in xrange(len(rows))] == [codes[pos - 1] for pos in rows]
+	assert index.locate(text[3:5]) == naive_locate(text, text[3:5])
+
+def test_fm_index_pure_python(monkeypatch):
+	monkeypatch.setattr(sa_module, 'suffix_array_ext', None)
+	index = FMIndex('mississippi', sa_sample_rate=4)
+	assert index.count('ssi') == 2
+	assert index.locate('ssi') == [2, 5]
+	assert index.locate('i') == [1, 4, 7, 10]
+
+def test_fm_index_binary():
+	rnd = random.Random(0)
+	text = ''.join(chr(rnd.randrange(256)) for _ in xrange(3000)) + '\x00\xff' * 10
+	index = FMIndex(text, sa_sample_rate=5, occ_sample_rate=7)
+	for pattern in ['\x00\xff', '\xff\x00\xff', text[100:103], text[-5:], text[:4]]:
+		assert index.locate(pattern) == naive_locate(text, pattern)
+
+def test_fm_index_sequence():
+	rnd = random.Random(1)
+	text = [rnd.randrange(1000) for _ in xrange(500)] + [7, 8, 7, 8]
+	index = FMIndex(text, sa_sample_rate=3, occ_sample_rate=5)
+	for pattern in [[7, 8], [7, 8, 7], text[10:12], [1001]]:
+		assert index.locate(pattern) == naive_locate(text, pattern)
+
+def test_fm_index_precomputed_suffix_array():
+	text = 'abracadabra'
+	index = FMIndex(text, suf_arr=sa_module.suffix_array_naive(text))
+	assert index.locate('abra') == [0, 7]
+
+def test_fm_index_samples():
+	index = FMIndex('mississippi', sa_sample_rate=3)
+	suf_arr = list(sa_module.suffix_array('mississippi')) + [11]
+	assert isinstance(index.samples, SortedSamples)
+	assert list(index.samples.rows) == sorted(index.samples.rows)
+	assert dict(index.samples.iteritems()) == {
+		row: pos for (row, pos) in enumerate(suf_arr) if pos % 3 == 0
+	}
+	assert index.samples.get(1) is None
+
+def test_fm_index_errors():
+	with pytest.raises(ValueError):
+		FMIndex('abc', sa_sample_rate=0)
+	with pytest.raises(ValueError):
+		FMIndex('abc', occ_sample_rate=0)
@@ -0,0 +1,88 @@
+import random
+import pytest
+from conftest import maybe_ext_fixture
+
+from algolib import generalized_suffix_array as gsa_module
+from algolib import suffix_array as sa_module
+from algolib.generalized_suffix_array import *
+
+maybe_ext = maybe_ext_fixture(gsa_module, sa_module)
+
+def sample_documents():
+	rnd = random.Random(0)
+	return [
+		[],
+		[''],
+		['abacaba'],
+		['abacaba', 'cabal', 'bacab', ''],
+		['aaaa', 'aaa', 'aa', 'a'],
+		[''.join(rnd.choice('ab') for _ in xrange(rnd.randrange(15))) for _ in xrange(30)],
+		['\x00\xff\x01', '\xff\xff', '\x00'],
+	]
+
+def naive_suffixes(documents):
+	"""Suffixes with their (document, offset), end of a document is larger than all symbols"""
+	suffixes = []
+	for i, document in enumerate(documents):
+		for offset in xrange(len(document) + 1):
+			suffixes.append((map(ord, document[offset:]) + [256 + i], (i, offset)))
+	return sorted(suffixes)
+
+@pytest.mark.parametrize('documents', sample_documents())
+def test_generalized_suffix_array(documents, maybe_ext):
+	gsa = GeneralizedSuffixArray(documents)
+	assert len(gsa) == len(documents)
+	expected = [position for (suffix, position) in naive_suffixes(documents)]
+	got = [gsa.document_position(pos) for pos in gsa.suffix_array]
+	assert got == expected
+	assert list(gsa.document_array) == [document for (document, offset) in expected]
+	for i, document in enumerate(documents):
+		assert list(gsa.text[gsa.starts[i]:gsa.starts[i + 1] - 1]) == map(ord, document)
+
+@pytest.mark.parametrize('documents', sample_documents()[2:])
+def test_queries(documents, maybe_ext):
+	gsa = GeneralizedSuffixArray(documents)
+	patterns = set(d[i:j] for d in documents for i in xrange(len(d)) for j in xrange(i + 1, len(d) + 1))
+	for pattern in patterns | {'zz', 'abacabaa'}:
+		expected = [
+			(i, offset) for (i, document) in enumerate(documents)
+			for offset in xrange(len(document)) if document.startswith(pattern, offset)
+		]
+		assert gsa.locate(pattern) == expected
+		counts = {}
+		for i, offset in expected:
+			counts[i] = counts.get(i, 0) + 1
+		assert gsa.count_by_document(pattern) == counts
+		assert gsa.documents_containing(pattern) == sorted(counts)
+
+def naive_lcs(documents, min_documents):
+	best = ''
+	for document in documents:
+		for i in xrange(len(document)):
+			for j in xrange(i + 1, len(document) + 1):
+				candidate = document[i:j]
+				if sum(candidate in d for d in documents) >= min_documents:
+					if (len(candidate), best) > (len(best), candidate):
+						best = candidate
+	return best
+
+@pytest.mark.parametrize('documents', sample_documents()[1:])
+def test_longest_common_substring(documents, maybe_ext):
+	gsa = GeneralizedSuffixArray(documents)
+	for min_documents in xrange(1, len(documents) + 1):
+		assert gsa.longest_common_substring(min_documents) == naive_lcs(documents, min_documents)
+	with pytest.raises(ValueError):
+		gsa.longest_common_substring(len(documents) + 1)
+
+def test_longest_common_substring_examples(maybe_ext):
+	gsa = GeneralizedSuffixArray(['xabcdey', 'zzbcdabc', 'abcdbcd'])
+	assert gsa.longest_common_substring() == 'abc'
+	assert gsa.longest_common_substring(2) == 'abcd'
+
+def test_sequences(maybe_ext):
+	documents = [[3, 1, 4, 1, 5], [1, 4, 1, 3], [(1, 2)] * 0 + [4, 1, 5, 9]]
+	gsa = GeneralizedSuffixArray(documents)
+	assert gsa.locate([1, 4]) == [(0, 1), (1, 0)]
+	assert gsa.locate([2]) == []
+	assert gsa.longest_common_substring() == [4, 1]
+	assert gsa.longest_common_substring(2) == [1, 4, 1]
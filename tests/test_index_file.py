@@ -0,0 +1,142 @@
+import array
+import random
+import pytest
+
+from algolib.bwt import bwt_block
+from algolib.fm_index import FMIndex
+from algolib.index_file import *
+from algolib.lce import LCE
+from algolib.suffix_array import inverse_suffix_array, lcp_kasai, numpy, suffix_array, suffix_array_ext
+from algolib.text_index import TextIndex, find_all
+
+@pytest.fixture
+def path(tmpdir):
+	return str(tmpdir.join('index'))
+
+def test_suffix_array_file(sample_str, path):
+	suf_arr = suffix_array(sample_str)
+	save_suffix_array(path, suf_arr)
+	loaded = load_suffix_array(path)
+	assert len(loaded) == len(suf_arr)
+	assert list(loaded) == list(suf_arr)
+	assert [loaded[i] for i in xrange(-len(suf_arr), len(suf_arr))] == list(suf_arr) * 2
+	assert list(loaded[1:3]) == list(suf_arr[1:3])
+
+def test_lcp_file(sample_str, path):
+	lcp = lcp_kasai(sample_str, suffix_array(sample_str))
+	save_lcp(path, lcp)
+	assert load_lcp(path).tolist() == list(lcp)
+
+def test_bwt_file(sample_str, path):
+	data, primary = bwt_block(sample_str)
+	save_bwt(path, data, primary)
+	assert load_bwt(path) == (data, primary)
+
+@pytest.mark.parametrize('values, typecode', [
+	([], 'B'),
+	([0, 255], 'B'),
+	([256], 'H'),
+	([1 << 16], 'I'),
+	([1 << 40], 'Q'),
+	([-1, 5], 'q'),
+	(array.array('H', [1, 2]), 'H'),
+	('bytes', 'c'),
+])
+def test_section_typecodes(values, typecode, path):
+	write_index_file(path, 'test', [('values', values), ('other', [1, 2, 3])])
+	with IndexFile(path, 'test') as index_file:
+		assert index_file.kind == 'test'
+		assert index_file['values'].typecode == typecode
+		assert list(index_file['values']) == list(values)
+		assert list(index_file['other']) == [1, 2, 3]
+		assert index_file['values'].offset % ALIGNMENT == 0
+		assert index_file['other'].offset % ALIGNMENT == 0
+
+def test_index_file_errors(path):
+	with open(path, 'wb') as f:
+		f.write('not an index file at all')
+	with pytest.raises(ValueError):
+		IndexFile(path)
+	save_suffix_array(path, [2, 1, 0])
+	with pytest.raises(ValueError):
+		load_lcp(path)
+	with pytest.raises(IndexError):
+		load_suffix_array(path)[3]
+	data = open(path, 'rb').read()
+	with open(path, 'wb') as f:
+		f.write(data[:len(MAGIC)] + '\xff' + data[len(MAGIC) + 1:])
+	with pytest.raises(ValueError):
+		IndexFile(path)
+	with open(path, 'wb') as f:
+		f.write(data[:-1])
+	with pytest.raises(ValueError):
+		IndexFile(path)
+
+def check_same_index(loaded, index, text, patterns):
+	assert len(loaded) == len(index)
+	for pattern in patterns:
+		assert loaded.count(pattern) == index.count(pattern)
+		assert loaded.locate(pattern) == index.locate(pattern)
+
+def test_fm_index_file(sample_str, path):
+	index = FMIndex(sample_str, sa_sample_rate=3, occ_sample_rate=2)
+	save_fm_index(path, index)
+	loaded = load_fm_index(path)
+	patterns = [sample_str[i:j] for i in xrange(len(sample_str) + 1) for j in xrange(i, len(sample_str) + 1)]
+	check_same_index(loaded, index, sample_str, patterns + ['z'])
+	# Loaded index can be saved again
+	save_fm_index(path + '2', loaded)
+	check_same_index(load_fm_index(path + '2'), index, sample_str, patterns)
+
+def test_fm_index_file_is_mapped(path):
+	save_fm_index(path, FMIndex('mississippi', sa_sample_rate=4, occ_sample_rate=3))
+	loaded = load_fm_index(path)
+	# The transform is read from the mapping, not copied
+	assert isinstance(loaded.bwt, MappedArray)
+	assert loaded.locate('ssi') == [2, 5]
+	assert loaded.count('i') == 4
+
+def test_fm_index_file_large_alphabet(path):
+	rnd = random.Random(0)
+	text = [rnd.randrange(1000) for _ in xrange(2000)]
+	index = FMIndex(text, sa_sample_rate=4, occ_sample_rate=8)
+	save_fm_index(path, index)
+	check_same_index(load_fm_index(path), index, text, [text[i:i + 2] for i in xrange(0, 2000, 50)])
+
+def test_fm_index_file_unsupported_alphabet(path):
+	with pytest.raises(TypeError):
+		save_fm_index(path, FMIndex([(1, 2), (3, 4)]))
+
+def test_mapped_buffer(path):
+	suf_arr = suffix_array('abracadabra')
+	save_suffix_array(path, suf_arr)
+	loaded = load_suffix_array(path)
+	view = loaded.buffer()
+	if numpy is None:
+		assert view is None
+		return
+	assert list(view) == list(suf_arr)
+	assert not view.flags.writeable
+	save_bwt(path, 'abc', 1)
+	with IndexFile(path, 'bwt') as index_file:
+		assert str(index_file['bwt'].buffer()) == 'abc'
+
+def test_mapped_arrays_are_not_copied(path, monkeypatch):
+	if suffix_array_ext is None or numpy is None:
+		pytest.skip('suffix_array_ext and numpy are required')
+	text = 'abracadabra' * 10
+	suf_arr = suffix_array(text)
+	lcp = lcp_kasai(text, suf_arr)
+	save_suffix_array(path, suf_arr)
+	save_lcp(path + '.lcp', lcp)
+	loaded_sa, loaded_lcp = load_suffix_array(path), load_lcp(path + '.lcp')
+	# Native paths get buffer() views, reading items one by one would fail
+	def fail(*args):
+		raise AssertionError('MappedArray items were read')
+	for name in ('__iter__', '__getitem__', 'slice'):
+		monkeypatch.setattr(MappedArray, name, fail)
+	assert list(inverse_suffix_array(loaded_sa)) == list(inverse_suffix_array(suf_arr))
+	assert list(lcp_kasai(text, loaded_sa)) == list(lcp)
+	assert list(LCE(text, loaded_sa, loaded_lcp).lce_many([(0, 7), (1, 8), (3, 5)])) == [4, 3, 1]
+	index = TextIndex(text, loaded_sa, loaded_lcp)
+	assert find_all(index, ['abra', 'cad', 'x']) == find_all(TextIndex(text), ['abra', 'cad', 'x'])
@@ -0,0 +1,110 @@
+import array
+import random
+import pytest
+from conftest import maybe_ext_fixture
+
+from algolib import lce as lce_module
+from algolib import suffix_array as sa_module
+from algolib.lce import *
+
+maybe_ext = maybe_ext_fixture(lce_module, sa_module)
+
+def naive_lce(s, i, j):
+	k = 0
+	while i + k < len(s) and j + k < len(s) and s[i + k] == s[j + k]:
+		k += 1
+	return k
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, 8])
+def test_range_min(block_size, maybe_ext):
+	rnd = random.Random(block_size)
+	for size in [1, 2, 5, 16, 17, 100]:
+		values = array.array('I', (rnd.randrange(50) for _ in xrange(size)))
+		rmq = SparseTable(values, block_size)
+		for begin in xrange(size):
+			for end in xrange(begin + 1, size + 1):
+				assert rmq.query(begin, end) == min(values[begin:end])
+	with pytest.raises(IndexError):
+		rmq.query(3, 3)
+	with pytest.raises(IndexError):
+		rmq.query(0, size + 1)
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, 8, 32])
+def test_block_range_min(block_size, maybe_ext):
+	rnd = random.Random(block_size)
+	for size in [1, 2, 5, 16, 17, 100]:
+		values = array.array('I', (rnd.randrange(50) for _ in xrange(size)))
+		rmq = BlockSparseTable(values, block_size)
+		assert len(rmq.masks) == size
+		for begin in xrange(size):
+			for end in xrange(begin + 1, size + 1):
+				assert rmq.query(begin, end) == min(values[begin:end])
+	with pytest.raises(IndexError):
+		rmq.query(0, 0)
+
+def test_block_masks(maybe_ext):
+	values = array.array('I', [5, 3, 4, 1, 2, 2])
+	# Stacks of minima: [5], [3], [3, 4], [1] | [2], [2]
+	assert list(block_masks(values, 4)) == [0b1, 0b10, 0b110, 0b1000, 0b1, 0b10]
+	assert list(block_masks([3, 1, 2], 32)) == [0b1, 0b10, 0b110]
+	for block_size in [0, 33]:
+		with pytest.raises(ValueError):
+			block_masks(values, block_size)
+
+def test_sparse_table_layout(maybe_ext):
+	values = array.array('I', [5, 3, 4, 1, 2])
+	assert list(sparse_table(values)) == [5, 3, 4, 1, 2, 3, 3, 1, 1, 0, 1, 1, 0, 0, 0]
+	assert list(sparse_table(values, 2)) == [3, 1, 2, 1, 1, 0]
+	assert list(sparse_table(array.array('I'))) == []
+	with pytest.raises(ValueError):
+		sparse_table(values, 0)
+
+def test_sparse_table_list():
+	assert list(sparse_table([3, 1, 2])) == [3, 1, 2, 1, 1, 0]
+
+@pytest.mark.parametrize('block_size', [None, 1, 4])
+def test_lce(sample_str, block_size, maybe_ext):
+	index = LCE(sample_str, block_size=block_size)
+	assert len(index) == len(sample_str)
+	pairs = [(i, j) for i in xrange(len(sample_str)) for j in xrange(len(sample_str))]
+	expected = [naive_lce(sample_str, i, j) for (i, j) in pairs]
+	assert [index.lce(i, j) for (i, j) in pairs] == expected
+	assert list(index.lce_many(pairs)) == expected
+	flat = array.array('I', [i for pair in pairs for i in pair])
+	assert list(index.lce_many(flat)) == expected
+
+def test_lce_random(maybe_ext):
+	rnd = random.Random(0)
+	text = ''.join(rnd.choice('ab') for _ in xrange(1000))
+	pairs = [(rnd.randrange(1000), rnd.randrange(1000)) for _ in xrange(500)]
+	expected = [naive_lce(text, i, j) for (i, j) in pairs]
+	for block_size in [None, 32]:
+		assert list(LCE(text, block_size=block_size).lce_many(pairs)) == expected
+
+def test_lce_sequence(maybe_ext):
+	text = [10 ** 9, 1, 10 ** 9, 1, 10 ** 9]
+	index = LCE(text, block_size=2)
+	assert index.lce(0, 2) == 3
+	assert list(index.lce_many([(1, 3), (0, 1)])) == [2, 0]
+
+def test_lce_errors(maybe_ext):
+	index = LCE('abcab')
+	with pytest.raises(IndexError):
+		index.lce(0, 5)
+	with pytest.raises(IndexError):
+		index.lce_many([(0, 1), (5, 0)])
+	with pytest.raises(ValueError):
+		index.lce_many(array.array('I', [0, 1, 2]))
+
+def test_inverse_suffix_array(sample_str, maybe_ext):
+	suf_arr = sa_module.suffix_array(sample_str)
+	rank = sa_module.inverse_suffix_array(suf_arr)
+	assert [rank[pos] for pos in suf_arr] == range(len(sample_str))
+
+def test_inverse_suffix_array_errors():
+	if sa_module.suffix_array_ext is None:
+		pytest.skip('suffix_array_ext is not available')
+	with pytest.raises(ValueError):
+		sa_module.inverse_suffix_array(array.array('I', [0, 0]))
+	with pytest.raises(ValueError):
+		sa_module.inverse_suffix_array(array.array('I', [2, 0]))
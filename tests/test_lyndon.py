@@ -1,13 +1,110 @@
 
+import array
+import random
+import pytest
+from multiprocessing.pool import ThreadPool
+from conftest import maybe_ext_fixture
+
+from algolib import lyndon as lyndon_module
 from algolib.lyndon import *
 
+maybe_ext = maybe_ext_fixture(lyndon_module)
+
 def test_factorize_lyndon_b2b(sample_str):
     correct = list(factorize_lyndon_naive(sample_str))
     got = list(factorize_lyndon(sample_str))
     assert correct == got
 
-def test_lex_min_rotation(sample_str):
+def test_lex_min_rotation(sample_str, maybe_ext):
 	assert lex_min_rotation_naive(sample_str) == lex_min_rotation(sample_str)
 
 def test_lex_min_rotation_suffix_array(sample_str):
 	assert lex_min_rotation_naive(sample_str) == lex_min_rotation_suf_arr(sample_str)
+
+def test_lyndon_factorization(sample_str, maybe_ext):
+	assert list(lyndon_factorization(sample_str)) == list(factorize_lyndon_naive(sample_str))
+
+def random_words(rnd):
+	for size in xrange(1, 40):
+		for alphabet in ['ab', 'abc']:
+			yield ''.join(rnd.choice(alphabet) for _ in xrange(size))
+	yield 'ab' * 10
+	yield 'abcaabaab'
+
+def test_lyndon_random(maybe_ext):
+	rnd = random.Random(0)
+	for word in random_words(rnd):
+		assert list(lyndon_factorization(word)) == list(factorize_lyndon(word))
+		assert lex_min_rotation(word) == lex_min_rotation_naive(word)
+
+def test_lyndon_buffers(maybe_ext):
+	arr = array.array('L', [5, 1 << 40, 5, 3, 1 << 40])
+	assert list(lyndon_factorization(arr)) == [0, 2, 3]
+	assert lex_min_rotation(arr) == 3
+	assert lex_min_rotation(bytearray('ddddddaaaaaada')) == 6
+	assert list(lyndon_factorization('')) == []
+	assert lex_min_rotation('') == 0
+
+def rotate(s, start):
+	return s[start:] + s[:start]
+
+@pytest.mark.parametrize('threads', [1, 3])
+def test_rotation_batch(threads, maybe_ext, monkeypatch):
+	# Small batches are split into chunks too
+	monkeypatch.setattr(lyndon_module, 'MIN_PARALLEL_SIZE', 0)
+	rnd = random.Random(1)
+	words = list(random_words(rnd)) + ['']
+	starts = min_rotations(words, threads=threads)
+	assert list(starts) == [lex_min_rotation_naive(word) for word in words]
+	rotated, offsets = canonical_rotations(words, threads=threads)
+	assert isinstance(rotated, str)
+	assert [rotated[offsets[i]:offsets[i + 1]] for i in xrange(len(words))] == [
+		rotate(word, start) for (word, start) in zip(words, starts)
+	]
+	hashes = rotation_hashes(words, threads=threads)
+	assert list(hashes) == [rotation_hash(rotate(word, start)) for (word, start) in zip(words, starts)]
+	# Rotations of a word share the key, different words don't
+	shifted = [rotate(word, len(word) // 3) for word in words]
+	assert rotation_hashes(shifted, threads=threads) == hashes
+	assert len(set(hashes)) == len(set(rotated[offsets[i]:offsets[i + 1]] for i in xrange(len(words))))
+
+def test_rotation_batch_packed(maybe_ext):
+	data, offsets = pack_sequences([[3, 1 << 40, 2], [], [7, 7, 1]])
+	assert list(data) == [3, 1 << 40, 2, 7, 7, 1]
+	assert list(offsets) == [0, 3, 3, 6]
+	assert list(min_rotations(data, offsets)) == [2, 0, 2]
+	rotated, rebased = canonical_rotations(data, [3, 3, 6])
+	assert (list(rotated), list(rebased)) == ([1, 7, 7], [0, 0, 3])
+	assert list(rotation_hashes(data, offsets)) == [
+		rotation_hash([2, 3, 1 << 40]), rotation_hash([]), rotation_hash([1, 7, 7])
+	]
+	assert rotation_hash('ab') == rotation_hash([97, 98]) != rotation_hash('a')
+	assert rotation_hash([0]) != rotation_hash([0, 0])
+
+def test_rotation_batch_errors():
+	if lyndon_module.suffix_array_ext is None:
+		pytest.skip('suffix_array_ext is not available')
+	with pytest.raises(ValueError):
+		min_rotations('abc', [2, 1])
+	with pytest.raises(ValueError):
+		rotation_hashes('abc', [0, 4])
+
+def test_rotation_batch_pool(monkeypatch):
+	if lyndon_module.suffix_array_ext is None:
+		pytest.skip('suffix_array_ext is not available')
+	words = ['ba', 'cab', 'bca']
+	monkeypatch.setattr(lyndon_module, 'ThreadPool', None)
+	# Small batches don't need a pool
+	assert list(min_rotations(words, threads=2)) == [1, 1, 2]
+	monkeypatch.undo()
+	pools = []
+	def thread_pool(threads):
+		pools.append(ThreadPool(threads))
+		return pools[-1]
+	monkeypatch.setattr(lyndon_module, 'ThreadPool', thread_pool)
+	monkeypatch.setattr(lyndon_module, 'MIN_PARALLEL_SIZE', 0)
+	assert list(min_rotations(words, threads=2)) == [1, 1, 2]
+	assert list(rotation_hashes(words, threads=2)) == list(rotation_hashes(words, threads=1))
+	# Every call shuts its pool down
+	assert len(pools) == 2
+	assert all(not worker.is_alive() for pool in pools for worker in pool._pool)
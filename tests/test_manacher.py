@@ -1,6 +1,102 @@
 
+import array
+import random
 import pytest
+from conftest import maybe_ext_fixture
+
+from algolib import manacher as manacher_module
 from algolib.manacher import *
 
-def test_manacher(sample_str):
+maybe_ext = maybe_ext_fixture(manacher_module)
+
+def test_manacher(sample_str, maybe_ext):
 	assert list(find_all_palyndromes_slow(sample_str)) == list(find_all_palyndromes_manacher(sample_str))
+
+def test_odd_palyndromes(sample_str, maybe_ext):
+	expected = list(find_odd_palyndromes_simple(sample_str))
+	assert list(find_odd_palyndromes_caching(sample_str)) == expected
+	assert list(find_odd_palyndromes_rightmost(sample_str)) == expected
+	assert list(find_odd_palyndromes_manacher(sample_str)) == expected
+
+def naive_radii(s):
+	def expand(l, r):
+		while l > 0 and r < len(s) and s[l - 1] == s[r]:
+			l, r = l - 1, r + 1
+		return l
+	return [i - expand(i, i + 1) for i in xrange(len(s))], [i - expand(i, i) for i in xrange(len(s))]
+
+@pytest.mark.parametrize('s', [
+	'',
+	'a',
+	'aa',
+	'a$a$$a',
+	'abacabadabacaba',
+	array.array('H', [1000, 2, 1000, 2, 2]),
+	[u'x', u'y', u'x'],
+	[10 ** 12, 1, 10 ** 12],
+])
+def test_palyndrome_radii(s, maybe_ext):
+	odd, even = palyndrome_radii(s)
+	assert (list(odd), list(even)) == naive_radii(s)
+
+def test_palyndrome_radii_random(maybe_ext):
+	rnd = random.Random(0)
+	for size in xrange(1, 60):
+		s = ''.join(rnd.choice('ab') for _ in xrange(size))
+		odd, even = palyndrome_radii(s)
+		assert (list(odd), list(even)) == naive_radii(s)
+		assert (list(odd), list(even)) == palyndrome_radii_py(s)
+
+def test_palyndrome_radii_typecode():
+	if manacher_module.suffix_array_ext is None:
+		pytest.skip('suffix_array_ext is not available')
+	odd, even = palyndrome_radii('abba')
+	assert odd.typecode == even.typecode == 'I'
+
+def naive_longest(s, l, r):
+	for length in xrange(r - l, 0, -1):
+		for begin in xrange(l, r - length + 1):
+			if s[begin:begin + length] == s[begin:begin + length][::-1]:
+				return length
+	return 0
+
+@pytest.mark.parametrize('block_size', [None, 1, 3])
+def test_palyndrome_queries(sample_str, block_size, maybe_ext):
+	queries = PalyndromeQueries(sample_str, block_size)
+	assert len(queries) == len(sample_str)
+	ranges = [(l, r) for l in xrange(len(sample_str) + 1) for r in xrange(l, len(sample_str) + 1)]
+	expected = [sample_str[l:r] == sample_str[l:r][::-1] for (l, r) in ranges]
+	assert [queries.is_palyndrome(l, r) for (l, r) in ranges] == expected
+	assert list(queries.is_palyndrome_many(ranges)) == expected
+	longest = queries.longest_palyndrome_many(ranges)
+	for k, (l, r) in enumerate(ranges):
+		begin, end = queries.longest_palyndrome(l, r)
+		assert (longest[2 * k], longest[2 * k + 1]) == (begin, end)
+		assert l <= begin <= end <= r
+		assert end - begin == naive_longest(sample_str, l, r)
+		assert queries.is_palyndrome(begin, end)
+
+def test_palyndrome_queries_random(maybe_ext):
+	rnd = random.Random(1)
+	s = ''.join(rnd.choice('ab') for _ in xrange(300))
+	queries = PalyndromeQueries(s, block_size=4)
+	ranges = array.array('L')
+	for _ in xrange(300):
+		l = rnd.randrange(len(s))
+		ranges.extend([l, rnd.randrange(l, len(s) + 1)])
+	longest = queries.longest_palyndrome_many(ranges)
+	for k in xrange(0, len(ranges), 2):
+		assert longest[k + 1] - longest[k] == naive_longest(s, ranges[k], ranges[k + 1])
+
+def test_palyndrome_queries_errors(maybe_ext):
+	queries = PalyndromeQueries('abba')
+	with pytest.raises(IndexError):
+		queries.is_palyndrome(3, 2)
+	with pytest.raises(IndexError):
+		queries.longest_palyndrome(0, 5)
+	with pytest.raises(IndexError):
+		queries.is_palyndrome_many([(0, 5)])
+	with pytest.raises(IndexError):
+		queries.longest_palyndrome_many([(3, 2)])
+	with pytest.raises(ValueError):
+		queries.is_palyndrome_many(array.array('L', [1]))
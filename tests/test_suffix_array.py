@@ -0,0 +1,78 @@
+import array
+import random
+import pytest
+
+from algolib import suffix_array as sa_module
+from algolib.suffix_array import *
+
+@pytest.mark.parametrize('algorithm', ['auto', 'naive', 'kmr', 'ks', 'sais', 'numpy'])
+def test_suffix_array(sample_str, algorithm):
+	if algorithm == 'sais' and sa_module.suffix_array_ext is None:
+		pytest.skip('suffix_array_ext is not available')
+	if algorithm == 'numpy' and sa_module.numpy is None:
+		pytest.skip('numpy is not available')
+	assert suffix_array_naive(sample_str) == list(suffix_array(sample_str, algorithm=algorithm))
+
+def test_suffix_array_unknown_algorithm():
+	with pytest.raises(ValueError):
+		suffix_array('abacaba', algorithm='bogus')
+
+def test_suffix_array_pure_python(sample_str, monkeypatch):
+	monkeypatch.setattr(sa_module, 'suffix_array_ext', None)
+	assert suffix_array_naive(sample_str) == suffix_array(sample_str)
+	with pytest.raises(ImportError):
+		suffix_array(sample_str, algorithm='sais')
+
+def test_suffix_array_numpy_inputs():
+	if sa_module.numpy is None:
+		pytest.skip('numpy is not available')
+	rnd = random.Random(0)
+	text = ''.join(rnd.choice('ab') for _ in xrange(2000)) + 'a' * 300
+	assert suffix_array_numpy(text) == suffix_array_ks(text)
+	assert suffix_array_numpy(bytearray(text)) == suffix_array_ks(text)
+	seq = [rnd.randrange(10 ** 12) for _ in xrange(500)]
+	assert suffix_array_numpy(seq) == suffix_array_ks(seq)
+	arr = array.array('H', (rnd.randrange(3) for _ in xrange(500)))
+	assert suffix_array_numpy(arr) == suffix_array_ks(list(arr))
+	assert suffix_array_numpy(sa_module.numpy.array(arr)) == suffix_array_ks(list(arr))
+
+@pytest.mark.parametrize('alphabet_size', [1, 2, 4, 50, 1000])
+def test_suffix_array_ks_random(alphabet_size):
+	rnd = random.Random(alphabet_size)
+	for size in [1, 2, 3, 4, 5, 100, 1000]:
+		arr = [rnd.randrange(alphabet_size) for _ in xrange(size)]
+		# End of string is larger than all symbols
+		expected = sorted(xrange(size), key=lambda i: arr[i:] + [alphabet_size])
+		assert suffix_array_ks(arr) == expected
+
+def test_radix_pass():
+	keys = [3, 1, 2, 1, 0, 3]
+	count = [0] * 5
+	dst = [None] * 4
+	radix_pass([0, 1, 3, 5], dst, keys, 0, 3, count)
+	assert dst == [1, 3, 0, 5]
+	radix_pass([0, 1, 3], dst, keys, 1, 3, count)
+	assert dst[:3] == [3, 0, 1]
+
+def test_suffix_array_auto_without_numpy(sample_str, monkeypatch):
+	monkeypatch.setattr(sa_module, 'suffix_array_ext', None)
+	monkeypatch.setattr(sa_module, 'numpy', None)
+	assert suffix_array_naive(sample_str) == suffix_array(sample_str)
+	with pytest.raises(ImportError):
+		suffix_array(sample_str, algorithm='numpy')
+
+def common_prefix(s1, s2):
+	ans = 0
+	while ans < len(s1) and ans < len(s2) and s1[ans] == s2[ans]:
+		ans += 1
+	return ans
+
+@pytest.mark.parametrize('lcp_func', [lcp_kasai, lcp_kasai_py])
+def test_lcp_kasai(sample_str, lcp_func):
+	suf_arr = suffix_array_ks(sample_str)
+	lcp = lcp_func(sample_str, suf_arr)
+	assert len(lcp) == max(len(sample_str) - 1, 0)
+	for rank in xrange(len(suf_arr) - 1):
+		pos1 = suf_arr[rank]
+		pos2 = suf_arr[rank + 1]
+		assert common_prefix(sample_str[pos1:], sample_str[pos2:]) == lcp[rank]
@@ -0,0 +1,147 @@
+import array
+import random
+import pytest
+
+from algolib.suffix_array import *
+
+suffix_array_ext = pytest.importorskip('suffix_array_ext')
+
+def test_b2b_ks_ext(sample_str):
+	correct = suffix_array_naive(sample_str)
+	ks_version = suffix_array_ks_ext(sample_str)
+	assert isinstance(ks_version, array.array)
+	assert ks_version.itemsize == 4
+	assert correct == list(ks_version)
+
+@pytest.mark.parametrize('convert', [
+	bytearray,
+	memoryview,
+	lambda s: array.array('B', s),
+	lambda s: array.array('H', map(ord, s)),
+	lambda s: array.array('L', map(ord, s)),
+	lambda s: map(ord, s),
+], ids=['bytearray', 'memoryview', 'array_B', 'array_H', 'array_L', 'list'])
+def test_ks_ext_inputs(sample_str, convert):
+	correct = suffix_array_naive(sample_str)
+	assert correct == list(suffix_array_ext.suffix_array_ks_helper(convert(sample_str)))
+
+def test_ks_ext_unicode(sample_str):
+	assert suffix_array_naive(sample_str) == list(suffix_array_ks_ext(sample_str.decode('ascii')))
+
+@pytest.mark.parametrize('typecode', ['I', 'L'])
+def test_ks_ext_out(sample_str, typecode):
+	out = array.array(typecode, [0] * (len(sample_str) + 1))
+	result = suffix_array_ks_ext(sample_str, out=out)
+	assert result is out
+	assert suffix_array_naive(sample_str) == list(out[:len(sample_str)])
+
+def test_ks_ext_small_out():
+	with pytest.raises(ValueError):
+		suffix_array_ks_ext('abacaba', out=array.array('I', [0] * 3))
+
+def sorted_suffixes(arr):
+	# End of string is larger than all symbols
+	return sorted(xrange(len(arr)), key=lambda i: list(arr[i:]) + [float('inf')])
+
+@pytest.mark.parametrize('helper', ['suffix_array_ks_helper', 'suffix_array_sais_helper'])
+def test_ext_sparse_alphabet(helper):
+	helper = getattr(suffix_array_ext, helper)
+	assert list(helper(array.array('L', [1 << 40, 0]))) == [1, 0]
+	assert list(helper([1 << 63, 5, 1 << 63, 5])) == [1, 3, 0, 2]
+	rnd = random.Random(0)
+	for alphabet_size in [3, 100, 70000]:
+		alphabet = [rnd.randrange(1 << 64) for _ in xrange(alphabet_size)]
+		arr = array.array('L', (rnd.choice(alphabet) for _ in xrange(1000)))
+		result = helper(arr)
+		assert result.itemsize == 4
+		assert list(result) == sorted_suffixes(arr)
+
+def test_ext_word_ids():
+	rnd = random.Random(1)
+	# 60k word ids over a short text don't fit 16 bit symbols, but indexes do fit 32 bits
+	words = [rnd.randrange(60000) for _ in xrange(200)] + [59999, 7, 59999, 7]
+	expected = sorted_suffixes(words)
+	assert list(suffix_array_ks_ext(words)) == expected
+	assert list(suffix_array_sais_ext(words)) == expected
+	assert list(suffix_array_sais_ext(array.array('I', words))) == expected
+	assert lcp_kasai_ext(words, expected) == lcp_kasai_ext(array.array('H', words), expected)
+	assert as_symbol_buffer(words) == array.array('L', words)
+	assert as_symbol_buffer([-1, 2]) == array.array('I', [0, 1])
+	assert as_symbol_buffer(['b', 'a']) == array.array('I', [1, 0])
+
+@pytest.mark.parametrize('typecode', ['b', 'h', 'i', 'l'])
+def test_ext_signed_symbols(typecode):
+	arr = array.array(typecode, [-1, 0, 5, -1, -2, 0])
+	expected = sorted_suffixes(arr)
+	assert list(suffix_array_ks_ext(arr)) == expected
+	assert list(suffix_array_sais_ext(arr)) == expected
+	assert list(suffix_array(arr)) == expected
+	assert list(lcp_kasai_ext(arr, expected)) == lcp_kasai_py(list(arr), expected)
+	for helper in [suffix_array_ext.suffix_array_ks_helper, suffix_array_ext.suffix_array_sais_helper]:
+		with pytest.raises(TypeError):
+			helper(arr)
+	# Non-negative signed symbols are passed as is
+	assert as_symbol_buffer(array.array(typecode, [1, 0])) == array.array(typecode, [1, 0])
+	assert list(suffix_array_ext.suffix_array_ks_helper(array.array(typecode, [1, 0, 1]))) == [1, 0, 2]
+
+def test_ks_ext_floats():
+	with pytest.raises(TypeError):
+		suffix_array_ext.suffix_array_ks_helper(array.array('d', [1.0, 0.0]))
+
+def test_bwt_bytes(sample_str):
+	s = sample_str + '\xff'
+	rotations = sorted(s[i:] + s[:i] for i in xrange(len(s)))
+	assert suffix_array_ext.bwt_bytes(s) == ''.join(r[-1] for r in rotations)
+	assert suffix_array_ext.bwt_bytes(bytearray(s)) == ''.join(r[-1] for r in rotations)
+
+def test_b2b_sais_ext(sample_str):
+	assert suffix_array_naive(sample_str) == list(suffix_array_sais_ext(sample_str))
+
+def test_b2b_sais_random():
+	rnd = random.Random(0)
+	for _ in xrange(500):
+		s = ''.join(rnd.choice('ab' if rnd.random() < 0.5 else 'abcd') for _ in xrange(rnd.randrange(60)))
+		correct = suffix_array_naive(s)
+		assert correct == list(suffix_array_sais_ext(s))
+		assert correct == list(suffix_array_sais_ext(map(ord, s)))
+		assert correct == list(suffix_array_ks_ext(s))
+
+@pytest.mark.parametrize('typecode', ['I', 'L'])
+def test_sais_ext_out(sample_str, typecode):
+	out = array.array(typecode, [0] * len(sample_str))
+	assert suffix_array_sais_ext(sample_str, out=out) is out
+	assert suffix_array_naive(sample_str) == list(out)
+
+def common_prefix(s1, s2):
+	ans = 0
+	while ans < len(s1) and ans < len(s2) and s1[ans] == s2[ans]:
+		ans += 1
+	return ans
+
+def lcp_naive(s, suf_arr):
+	return [common_prefix(s[suf_arr[rank]:], s[suf_arr[rank + 1]:]) for rank in xrange(len(s) - 1)]
+
+@pytest.mark.parametrize('lcp_func', [lcp_kasai_ext, lcp_phi_ext], ids=['kasai', 'phi'])
+def test_lcp_ext(sample_str, lcp_func):
+	suf_arr = suffix_array_sais_ext(sample_str)
+	lcp = lcp_func(sample_str, suf_arr)
+	assert isinstance(lcp, array.array)
+	assert lcp_naive(sample_str, suf_arr) == list(lcp)
+	assert lcp_naive(sample_str, suf_arr) == list(lcp_func(sample_str, list(suf_arr)))
+
+@pytest.mark.parametrize('lcp_func', [lcp_kasai_ext, lcp_phi_ext], ids=['kasai', 'phi'])
+def test_lcp_ext_random(lcp_func):
+	rnd = random.Random(0)
+	for _ in xrange(300):
+		s = ''.join(rnd.choice('abc'[:rnd.randrange(1, 4)]) for _ in xrange(rnd.randrange(50)))
+		suf_arr = suffix_array_naive(s)
+		assert lcp_naive(s, suf_arr) == list(lcp_func(s, suf_arr))
+
+@pytest.mark.parametrize('lcp_func', [lcp_kasai_ext, lcp_phi_ext], ids=['kasai', 'phi'])
+def test_lcp_ext_not_permutation(lcp_func):
+	with pytest.raises(ValueError):
+		lcp_func('abc', [0, 0, 1])
+	with pytest.raises(ValueError):
+		lcp_func('abc', [0, 1, 3])
+	with pytest.raises(ValueError):
+		lcp_func('abc', [0, 1])
@@ -1,8 +1,14 @@
 
+import array
+import random
 import pytest
+from conftest import maybe_ext_fixture
+from algolib import suffix_tree as suffix_tree_module
 from algolib.suffix_tree import *
 import algolib.suffix_array
 
+maybe_ext = maybe_ext_fixture(suffix_tree_module)
+
 def test_find():
     s = "A quick brown fox jumps over a lazy dog$"
     tree = build(s)
@@ -48,4 +54,152 @@ def test_b2b_suffix_array(sample_str):
     sample_str += dollar_sign
     correct = algolib.suffix_array.suffix_array_ks(sample_str)
     got = convert_to_suffix_array(build(sample_str), dollar_sign)
-    assert correct == got
\ No newline at end of file
+    assert correct == got
+def node_to_dict(node):
+    return {str(edge.label): node_to_dict(edge.node) for edge in node.edges.itervalues()}
+
+def compact_to_dict(tree, node):
+    return {''.join(tree.edge_label(child)): compact_to_dict(tree, child) for child in tree.children(node)}
+
+@pytest.mark.parametrize('insert_dollar', [False, True], ids=['', 'with_dollar'])
+def test_compact_b2b_naive_implementation(sample_str, insert_dollar, maybe_ext):
+    if insert_dollar:
+        sample_str += '$'
+    tree = build(sample_str, compact=True)
+    assert compact_to_dict(tree, tree.root) == node_to_dict(build_naive(sample_str))
+
+def test_compact_structure(sample_str, maybe_ext):
+    s = sample_str + '$'
+    tree = build(s, compact=True)
+    # One leaf per suffix
+    assert sum(tree.is_leaf(node) for node in xrange(1, len(tree))) == len(s)
+    assert tree.parent(tree.root) is None
+    for node in xrange(1, len(tree)):
+        assert node in tree.children(tree.parent(node))
+        start, end = tree.edge_label_range(node)
+        assert tree.child(tree.parent(node), s[start]) == node
+        if not tree.is_leaf(node) and tree.parent(node) is not None:
+            path = ''.join(tree.path_labels(node))
+            assert ''.join(tree.path_labels(tree.suffix_link(node))) == path[1:]
+
+def test_compact_find(maybe_ext):
+    s = "A quick brown fox jumps over a lazy dog$"
+    tree = build(s, compact=True)
+    assert traverse(tree.root_position(), 'a l') is not None
+    assert traverse(tree.root_position(), 'f n') is None
+    position = traverse(tree.root_position(), 'qu')
+    assert position.edge is not None and position.offset == 2
+    assert traverse(position, 'ick') is not None
+    assert traverse(position, 'ack') is None
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_lrs_small(compact, maybe_ext):
+    assert find_longest_repeating_substring('abracadabra', compact=compact) == 'abra'
+    assert find_longest_repeating_substring('abcd', compact=compact) == ''
+    assert find_longest_repeating_substring('aaaa', compact=compact) == 'aaa'
+
+def test_compact_b2b_suffix_array(sample_str, maybe_ext):
+    dollar_sign = '\xff'
+    sample_str += dollar_sign
+    correct = algolib.suffix_array.suffix_array_ks(sample_str)
+    assert convert_to_suffix_array(build(sample_str, compact=True), dollar_sign) == correct
+
+def test_compact_native_same_as_python(sample_str, monkeypatch):
+    if suffix_tree_module.suffix_array_ext is None:
+        pytest.skip('suffix_array_ext is not available')
+    native = CompactSuffixTree(sample_str + '$')
+    monkeypatch.setattr(suffix_tree_module, 'suffix_array_ext', None)
+    python = CompactSuffixTree(sample_str + '$')
+    for name in ('edge_start', 'edge_end', 'first_child', 'next_sibling', 'link', 'parents'):
+        assert list(getattr(native, name)) == list(getattr(python, name))
+
+def test_compact_sequence(maybe_ext):
+    s = [10 ** 9, 5, 10 ** 9, 5, 7, -1]
+    tree = build(s, compact=True)
+    assert traverse(tree.root_position(), [5, 10 ** 9, 5]) is not None
+    assert traverse(tree.root_position(), [5, 5]) is None
+
+def test_cursor(maybe_ext):
+    s = 'abcabx$'
+    tree = build(s, compact=True)
+    root = tree.cursor()
+    assert root.parent() is None
+    assert root.root() == root
+    ab = root.child('a')
+    assert ab.edge_label() == 'ab'
+    assert ab.edge_label_range() == (0, 2)
+    assert not ab.is_leaf()
+    assert ab.parent() == root
+    assert ab.suffix_link() == root.child('b')
+    assert root.child('b').suffix_link() == root
+    assert sorted(child.edge_label() for child in ab.children()) == ['cabx$', 'x$']
+    assert ab.child('x').is_leaf()
+    assert root.child('z') is None
+    assert traverse(ab.position(), 'cab') is not None
+    assert len(set(root.children())) == len(root.children()) == 5
+
+def naive_occurrences(s, t):
+    return sum(s.startswith(t, i) for i in xrange(len(s)))
+
+def test_stats(sample_str, maybe_ext):
+    s = sample_str + '\x00'
+    tree = build(s, compact=True)
+    stats = SuffixTreeStats(tree)
+    suf_arr = algolib.suffix_array.suffix_array_naive(s)
+    assert list(stats.suffix_array) == suf_arr
+    assert list(stats.lcp) == algolib.suffix_array.lcp_kasai_py(s, suf_arr)
+    for node in xrange(1, len(tree)):
+        path = ''.join(tree.path_labels(node))
+        assert stats.depth[node] == len(path)
+        assert stats.leaf_count[node] == naive_occurrences(s, path)
+        assert stats.leftmost[node] == s.find(path)
+    substrings = set(sample_str[i:j] for i in xrange(len(sample_str)) for j in xrange(i + 1, len(sample_str) + 1))
+    assert stats.distinct_substrings() == len(substrings) == count_distinct_substrings(sample_str)
+
+def test_lrs_deep_tree(maybe_ext):
+    assert find_longest_repeating_substring('a' * 100000) == 'a' * 99999
+    assert find_longest_repeating_substring('ab' * 1000, compact=False) == 'ab' * 999
+
+def test_lrs_leftmost(maybe_ext):
+    assert find_longest_repeating_substring('xyzxyabcab') == 'xy'
+
+def test_most_frequent_substrings(maybe_ext):
+    assert most_frequent_substrings('aaaa', 2) == [('a', 4), ('aa', 3)]
+    assert most_frequent_substrings('abcabcab', 3) == [('ab', 3), ('b', 3), ('abcab', 2)]
+    assert most_frequent_substrings('abcabcab', 1, min_length=3) == [('abcab', 2)]
+    assert most_frequent_substrings('abcd', 3) == []
+
+def test_incremental(sample_str):
+    tree = IncrementalSuffixTree()
+    for i, c in enumerate(sample_str + '$'):
+        tree.extend(c)
+        prefix = (sample_str + '$')[:i + 1]
+        assert compact_to_dict(tree, tree.root) == node_to_dict(build_naive(prefix))
+        for j in xrange(len(prefix)):
+            assert traverse(tree.root_position(), prefix[j:]) is not None
+        assert traverse(tree.root_position(), prefix + 'z') is None
+
+def test_incremental_open_end():
+    tree = IncrementalSuffixTree('ab')
+    typecode = tree.edge_end.typecode
+    # The largest value which fits edge_end on this platform
+    array.array(typecode, [tree.OPEN_END])
+    with pytest.raises(OverflowError):
+        array.array(typecode, [tree.OPEN_END + 1])
+    assert tree.edge_end[tree.child(tree.root, 'a')] == tree.OPEN_END
+
+@pytest.mark.parametrize('chunk', [1, 3, 100])
+def test_incremental_chunks(chunk):
+    rnd = random.Random(chunk)
+    s = ''.join(rnd.choice('abc') for _ in xrange(300)) + '$'
+    tree = IncrementalSuffixTree()
+    for i in xrange(0, len(s), chunk):
+        tree.extend(s[i:i + chunk])
+        position = traverse(tree.root_position(), s[i // 2:i + 1])
+        assert position is not None
+    stats = SuffixTreeStats(tree)
+    assert list(stats.suffix_array) == algolib.suffix_array.suffix_array_naive(s)
+    snapshot = tree.snapshot()
+    tree.extend('abc')
+    assert len(snapshot.s) == len(s)
+    assert ''.join(snapshot.edge_label(snapshot.child(snapshot.root, '$'))) == '$'
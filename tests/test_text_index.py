@@ -0,0 +1,95 @@
+import random
+import pytest
+from conftest import maybe_ext_fixture
+
+from algolib import suffix_array as sa_module
+from algolib import text_index as text_index_module
+from algolib.text_index import *
+
+maybe_ext = maybe_ext_fixture(text_index_module, sa_module)
+
+def naive_locate(text, pattern):
+	return [i for i in xrange(len(text)) if text[i:i + len(pattern)] == pattern]
+
+def test_lcp_lr(sample_str, maybe_ext):
+	index = TextIndex(sample_str)
+	size = len(sample_str)
+	suf_arr = sa_module.suffix_array_naive(sample_str)
+	assert list(index.suffix_array) == suf_arr
+
+	def common_prefix(l, r):
+		if l < 0 or r >= size:
+			return 0
+		s1, s2 = sample_str[suf_arr[l]:], sample_str[suf_arr[r]:]
+		k = 0
+		while k < min(len(s1), len(s2)) and s1[k] == s2[k]:
+			k += 1
+		return k
+
+	stack = [(-1, size)]
+	while stack:
+		l, r = stack.pop()
+		if r - l <= 1:
+			continue
+		m = l + (r - l) // 2
+		assert index.llcp[m] == common_prefix(l, m)
+		assert index.rlcp[m] == common_prefix(m, r)
+		stack.extend([(l, m), (m, r)])
+
+def test_find_all(sample_str, maybe_ext):
+	index = TextIndex(sample_str)
+	patterns = [sample_str[i:j] for i in xrange(len(sample_str)) for j in xrange(i + 1, len(sample_str) + 1)]
+	patterns += ['z', 'ab' * 10, sample_str + 'a', '']
+	ranges = find_all(index, patterns)
+	assert len(ranges) == len(patterns)
+	for pattern, (begin, end) in zip(patterns, ranges):
+		if pattern:
+			assert sorted(index.suffix_array[begin:end]) == naive_locate(sample_str, pattern)
+			assert index.locate(pattern) == naive_locate(sample_str, pattern)
+		else:
+			assert (begin, end) == (0, len(sample_str))
+
+def test_find_all_random(maybe_ext):
+	rnd = random.Random(0)
+	text = ''.join(rnd.choice('abc') for _ in xrange(2000))
+	index = TextIndex(text)
+	patterns = [text[i:i + rnd.randrange(1, 8)] for i in (rnd.randrange(len(text)) for _ in xrange(200))]
+	patterns += [''.join(rnd.choice('abcd') for _ in xrange(5)) for _ in xrange(100)]
+	for pattern, (begin, end) in zip(patterns, find_all(index, patterns)):
+		assert sorted(index.suffix_array[begin:end]) == naive_locate(text, pattern)
+
+def test_find_all_sequences(maybe_ext):
+	text = [10 ** 9, 7, 10 ** 9, 7, 3]
+	index = TextIndex(text)
+	assert find_all(index, [[10 ** 9, 7], [7], [5], [3, 7]]) == [(3, 5), (1, 3), (0, 0), (0, 0)]
+	assert index.locate([7, 10 ** 9]) == [1]
+
+def test_find_all_buffers(maybe_ext):
+	text = array.array('H', [5, 1, 5, 1, 5, 2])
+	index = TextIndex(text)
+	assert index.locate([5, 1]) == [0, 2]
+	assert index.locate(array.array('B', [1, 5])) == [1, 3]
+	assert index.locate([2, 5]) == []
+
+def test_search_lcp_lr_resume():
+	rnd = random.Random(1)
+	text = ''.join(rnd.choice('ab') for _ in xrange(500))
+	index = TextIndex(text)
+	args = (index.symbols, index.suffix_array, index.llcp, index.rlcp)
+	patterns = sorted(set(text[i:i + rnd.randrange(1, 12)] for i in xrange(0, 490, 7)))
+	for upper in [False, True]:
+		path = []
+		prev = ''
+		for pattern in patterns:
+			shared = 0
+			while shared < min(len(prev), len(pattern)) and prev[shared] == pattern[shared]:
+				shared += 1
+			prev_path = path[:]
+			found = search_lcp_lr(*(args + (pattern, upper, path, shared)))
+			fresh_path = []
+			assert found == search_lcp_lr(*(args + (pattern, upper, fresh_path)))
+			# Resumed search takes the same steps as the fresh one
+			assert path == fresh_path
+			if shared >= 4:
+				assert path[:2] == prev_path[:2]
+			prev = pattern